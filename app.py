@@ -1,5 +1,7 @@
 import streamlit as st
 import pandas as pd
+import altair as alt
+from collections import deque
 from datetime import datetime
 import io
 import time
@@ -14,9 +16,7 @@ from bot.constants import (
 )
 from bot.manager import GlobalManager
 from bot.jsf import form_verilerini_topla
-from bot.scheduler import safe_run
-from bot.auth import login, fetch_accounts_backend, switch_account_backend
-from bot.drafts import veriyi_dataframe_yap
+from bot.auth import fetch_accounts_backend, switch_account_backend
 
 
 
@@ -45,10 +45,108 @@ except:
 @st.fragment(run_every=2)
 def canli_loglari_goster(manager):
     st.info("⚡ Canlı Log Akışı (Otomatik Yenilenir)")
+    level_col, tag_col = st.columns(2)
+    with level_col:
+        seviyeler = st.multiselect("Seviye", ["info", "success", "warning", "error"], key="log_levels", placeholder="Tümü")
+    with tag_col:
+        taslak = st.selectbox("Taslak", ["Tümü"] + manager.logs.tags(), key="log_tag")
+
+    # Her sekme kendi imlecini tutar: sadece son çalışmadan beri gelen kayıtlar formatlanır
+    filtre = (manager.email, tuple(seviyeler), taslak)
+    view = st.session_state.get("log_view")
+    if view is None or view["filtre"] != filtre:
+        view = {"filtre": filtre, "cursor": 0, "lines": deque(maxlen=manager.logs.capacity)}
+        st.session_state.log_view = view
+    yeni, view["cursor"] = manager.logs.tail(
+        view["cursor"], levels=seviyeler or None, tag=None if taslak == "Tümü" else taslak
+    )
+    view["lines"].extend(entry.format() for entry in yeni)
+
     log_container = st.container(height=400)
     with log_container:
-        for log in manager.logs:
-            st.text(log)
+        # Tek bir metin bloğu: kayıt başına widget oluşturulmaz
+        st.text("\n".join(reversed(view["lines"])))
+
+
+def metrikleri_goster(manager):
+    metrics = manager.http_metrics
+    rows = metrics.summary()
+    st.caption(f"Ölçüm başlangıcı: {datetime.fromtimestamp(metrics.started_at).strftime('%d.%m %H:%M:%S')}")
+    if not rows:
+        st.info("Henüz HTTP isteği yok.")
+        return
+
+    st.dataframe(
+        pd.DataFrame(rows),
+        column_config={
+            "endpoint": "Endpoint",
+            "method": "Metod",
+            "count": "İstek",
+            "errors": "Hata",
+            "retries": "Tekrar",
+            "statuses": "Durum Kodları",
+            "p50_ms": st.column_config.NumberColumn("p50 (ms)"),
+            "p95_ms": st.column_config.NumberColumn("p95 (ms)"),
+            "p99_ms": st.column_config.NumberColumn("p99 (ms)"),
+            "total_s": st.column_config.NumberColumn("Toplam (sn)"),
+            "kb_out": st.column_config.NumberColumn("Giden KB"),
+            "kb_in": st.column_config.NumberColumn("Gelen KB"),
+        },
+        hide_index=True,
+        width="stretch"
+    )
+
+    export_col, reset_col = st.columns(2)
+    with export_col:
+        st.download_button(
+            "⬇️ Prometheus Formatında İndir",
+            metrics.to_prometheus(labels={"user": manager.email}),
+            file_name="twd_http_metrics.prom",
+            mime="text/plain"
+        )
+    with reset_col:
+        if st.button("Metrikleri Sıfırla"):
+            metrics.reset()
+            st.rerun()
+
+
+def waterfall_goster(manager):
+    tracer = manager.tracer
+    cycles = tracer.cycles()
+    if not cycles:
+        st.info("Henüz izlenen bir kontrol yok.")
+        return
+
+    cycle_id = st.selectbox(
+        "Kontrol",
+        cycles,
+        format_func=lambda c: datetime.fromtimestamp(c).strftime('%d.%m %H:%M:%S'),
+        key="waterfall_cycle"
+    )
+    rows = tracer.waterfall(cycle_id)
+    if not rows:
+        st.info("Bu kontrolde span yok.")
+        return
+
+    df = pd.DataFrame(rows)
+    df["row"] = [f"{d} · {s}" for d, s in zip(df["draft"], df["span"])]
+    # Aynı taslak + span adı birden fazla olabilir (ör. tekrar eden HTTP çağrıları), sıra numarası ile ayrılır
+    df["row"] = df["row"] + df.groupby("row").cumcount().map(lambda n: f" #{n + 1}" if n else "")
+
+    chart = alt.Chart(df).mark_bar().encode(
+        x=alt.X("start_s:Q", title="Saniye (kontrol başından)"),
+        x2="end_s:Q",
+        y=alt.Y("row:N", sort=list(df["row"]), title=None),
+        color=alt.Color("draft:N", title="Taslak"),
+        opacity=alt.condition(alt.datum.depth == 0, alt.value(0.35), alt.value(1.0)),
+        tooltip=["draft", "span", "duration_ms", "status"],
+    ).properties(height=max(200, 18 * len(df)))
+    st.altair_chart(chart, width="stretch")
+
+    # Fazlara göre toplam süre: önbellek / paralellik adaylarını gösterir
+    phases = df[df["depth"] == 1].groupby(df["span"].str.strip())["duration_ms"].agg(["count", "sum", "max"])
+    st.dataframe(phases.sort_values("sum", ascending=False).rename(
+        columns={"count": "Adet", "sum": "Toplam (ms)", "max": "En uzun (ms)"}), width="stretch")
 
 
 # --- MAIN APPLICATION FLOW ---
@@ -134,6 +232,7 @@ def main():
                         if email_input in BOT_STORE:
                             existing_mgr = BOT_STORE[email_input]
                             existing_mgr.password = pass_input 
+                            existing_mgr.load_state()
                             
                             st.session_state.authenticated = True
                             st.session_state.my_manager = existing_mgr
@@ -144,9 +243,10 @@ def main():
                         # NO: This is a fresh login. Verify credentials first.
                         else:
                             temp_mgr = GlobalManager(email_input, pass_input, TEAMS_WEBHOOK_URL)
-                            success = login(temp_mgr)
+                            success = temp_mgr.broker.ensure()
                             
                             if success:
+                                temp_mgr.load_state()
                                 BOT_STORE[email_input] = temp_mgr
                                 st.session_state.authenticated = True
                                 st.session_state.my_manager = temp_mgr
@@ -179,25 +279,33 @@ def main():
         st.header("⚙️ Ayarlar")
         
         # --- SCHEDULER SETTINGS ---
-        options = ["Dakika Bazlı (Interval)", "Saat Başı ve Buçuk (00, 30)", "Çeyrek Saatler (00, 15, 30, 45)"]
+        options = ["Dakika Bazlı (Interval)", "Saat Başı ve Buçuk (00, 30)", "Çeyrek Saatler (00, 15, 30, 45)", "Uyarlamalı (Taslak Bazlı)", "Sürekli (Kesintisiz)"]
         default_index = 0
         if manager.scheduler_mode == "half_hourly":
             default_index = 1
         elif manager.scheduler_mode == "quarterly":
             default_index = 2
+        elif manager.scheduler_mode == "adaptive":
+            default_index = 3
+        elif manager.scheduler_mode == "continuous":
+            default_index = 4
         
         # 2. Index parametresini ekle (DÜZELTME BURADA)
         mode_label = st.radio(
             "Zamanlama Modu", 
             options,
             index=default_index,  # <--- BU SATIR EKSİKTİ
-            captions=["Belirlediğiniz dakika aralığında çalışır.", "Her saat başı ve buçukta (örn 14:00, 14:30) çalışır.", "Her 15 dakikada bir (örn 14:15, 14:45) çalışır."]
+            captions=["Belirlediğiniz dakika aralığında çalışır.", "Her saat başı ve buçukta (örn 14:00, 14:30) çalışır.", "Her 15 dakikada bir (örn 14:15, 14:45) çalışır.",
+                      "Her taslak kendi aralığıyla kontrol edilir: fırsat çıkan sık, sonuç vermeyen seyrek.",
+                      "Belirli sayıda taslak hep işlemde kalır, biten taslağın yerine en bayat olan başlar."]
         )
         
         # Map label to internal value
         new_mode = "interval"
         if "Saat Başı" in mode_label: new_mode = "half_hourly"
         elif "Çeyrek" in mode_label: new_mode = "quarterly"
+        elif "Uyarlamalı" in mode_label: new_mode = "adaptive"
+        elif "Sürekli" in mode_label: new_mode = "continuous"
         
         # Sadece gerçekten bir değişiklik varsa güncelle
         if new_mode != manager.scheduler_mode:
@@ -222,13 +330,98 @@ def main():
             st.toast(f"✅ Sınır güncellendi: {mile_limit} Mil")
 
         # Min Ayarı
-        if manager.scheduler_mode == "interval":
-            min_limit = st.number_input("Tekrar deneme dakikası", min_value=1, max_value=500, value=manager.mins_threshold, step=5)
+        if manager.scheduler_mode in ("interval", "adaptive"):
+            min_label = "Tekrar deneme dakikası" if manager.scheduler_mode == "interval" else "Başlangıç aralığı (dk)"
+            min_limit = st.number_input(min_label, min_value=1, max_value=500, value=manager.mins_threshold, step=5)
             if min_limit != manager.mins_threshold:
                 manager.mins_threshold = min_limit
                 if manager.is_running: manager.start_bot_process()
                 st.toast("✅ Zamanlayıcı güncellendi")
-            
+
+        if manager.scheduler_mode in ("half_hourly", "quarterly"):
+            window_col, finish_col = st.columns(2)
+            with window_col:
+                stagger_window = st.number_input("Başlangıç penceresi (sn)", min_value=0, max_value=840, value=manager.stagger_window, step=30,
+                                                 help="Kullanıcılar slottan sonra bu pencereye yayılır, herkes aynı saniyede başlamaz. Kaydırma her kullanıcı için sabittir.")
+            with finish_col:
+                finish_by = st.number_input("Bitirme hedefi (dk, 0 = yok)", min_value=0, max_value=30, value=manager.finish_by or 0, step=1,
+                                            help="Tarama slottan sonra bu süre içinde bitecek şekilde başlangıç kaydırması kısaltılır.")
+            warmup_lead = st.number_input("Ön ısıtma (sn, 0 = kapalı)", min_value=0, max_value=600, value=manager.warmup_lead, step=15,
+                                          help="Slottan bu kadar önce oturum yenilenir, ilk hesaba geçilir ve taslak listesi önceden çekilir.")
+            if (stagger_window, finish_by or None, warmup_lead) != (manager.stagger_window, manager.finish_by, manager.warmup_lead):
+                manager.stagger_window = stagger_window
+                manager.finish_by = finish_by or None
+                manager.warmup_lead = warmup_lead
+                if manager.is_running: manager.start_bot_process()
+                st.toast("✅ Zamanlayıcı güncellendi")
+
+        if manager.scheduler_mode == "adaptive":
+            schedule = manager.adaptive
+            min_col, max_col = st.columns(2)
+            with min_col:
+                adaptive_min = st.number_input("En kısa (dk)", min_value=1, max_value=1440, value=int(schedule.min_interval), step=1)
+            with max_col:
+                adaptive_max = st.number_input("En uzun (dk)", min_value=1, max_value=10080, value=int(schedule.max_interval), step=30)
+            adaptive_batch = st.number_input("Tur başına en fazla taslak", min_value=1, max_value=500, value=manager.adaptive_batch, step=1,
+                                             help="Her dakika sırası gelen taslaklardan en fazla bu kadarı planlanır.")
+            if (adaptive_min, adaptive_max, adaptive_batch) != (schedule.min_interval, schedule.max_interval, manager.adaptive_batch):
+                schedule.min_interval, schedule.max_interval = min(adaptive_min, adaptive_max), max(adaptive_min, adaptive_max)
+                manager.adaptive_batch = adaptive_batch
+                st.toast("✅ Zamanlayıcı güncellendi")
+
+        if manager.scheduler_mode == "continuous":
+            inflight_col, gap_col = st.columns(2)
+            with inflight_col:
+                continuous_inflight = st.number_input("Eşzamanlı taslak", min_value=1, max_value=200, value=manager.continuous_inflight, step=1)
+            with gap_col:
+                continuous_min_gap = st.number_input("Tekrar en erken (dk)", min_value=0, max_value=1440, value=manager.continuous_min_gap, step=1,
+                                                     help="Aynı taslak bu süre dolmadan tekrar planlanmaz.")
+            if (continuous_inflight, continuous_min_gap) != (manager.continuous_inflight, manager.continuous_min_gap):
+                manager.continuous_inflight = continuous_inflight
+                manager.continuous_min_gap = continuous_min_gap
+                st.toast("✅ Zamanlayıcı güncellendi")
+
+        # Çalışma Modu (Sıralı / Paralel / Async)
+        execution_modes = {"sequential": "Sıralı", "parallel": "Paralel (Thread)", "async": "Paralel (Async)"}
+        new_execution_mode = st.selectbox(
+            "Çalışma Modu",
+            list(execution_modes),
+            index=list(execution_modes).index(manager.execution_mode),
+            format_func=execution_modes.get,
+            help="Paralel modlarda her hesap kendi oturumuyla çalışır, taslaklar eşzamanlı işlenir. Hesap değiştirme beklemesi olmaz."
+        )
+        if new_execution_mode != manager.execution_mode:
+            manager.execution_mode = new_execution_mode
+            st.toast("✅ Çalışma modu güncellendi")
+
+        if manager.execution_mode != "sequential":
+            if manager.execution_mode == "parallel":
+                max_workers = st.number_input("Toplam eşzamanlı işçi", min_value=1, max_value=32, value=manager.max_workers, step=1)
+                if max_workers != manager.max_workers:
+                    manager.max_workers = max_workers
+            else:
+                max_inflight = st.number_input("Toplam eşzamanlı taslak", min_value=1, max_value=1000, value=manager.async_max_inflight, step=10)
+                if max_inflight != manager.async_max_inflight:
+                    manager.async_max_inflight = max_inflight
+            per_account = st.number_input("Hesap başına eşzamanlı taslak", min_value=1, max_value=8, value=manager.default_account_concurrency, step=1)
+            if per_account != manager.default_account_concurrency:
+                manager.default_account_concurrency = per_account
+
+            if manager.available_accounts:
+                with st.expander("Hesap bazlı eşzamanlılık"):
+                    for acc in manager.available_accounts:
+                        current = manager.get_account_concurrency(acc['id'])
+                        value = st.number_input(acc['name'], min_value=1, max_value=8, value=current, step=1, key=f"conc_{acc['id']}")
+                        if value != current:
+                            manager.account_concurrency[acc['id']] = value
+
+        with st.expander("Log Ayarları"):
+            log_capacity = st.number_input("Log kapasitesi (kayıt)", min_value=100, max_value=100000, value=manager.logs.capacity, step=500)
+            log_max_kb = st.number_input("Log bellek sınırı (KB)", min_value=64, max_value=65536, value=manager.logs.max_bytes // 1024, step=256)
+            if log_capacity != manager.logs.capacity or log_max_kb != manager.logs.max_bytes // 1024:
+                manager.set_log_limits(log_capacity, log_max_kb)
+            st.caption(f"{len(manager.logs)} kayıt, ~{manager.logs.approx_bytes // 1024} KB, {manager.logs.dropped} kayıt düştü")
+
         st.divider()
         st.caption(f"Aktif Mil Sınır: **{manager.mile_threshold} Mil**")
         if manager.scheduler_mode == "interval":
@@ -302,7 +495,7 @@ def main():
                }}
         </style>
         """, unsafe_allow_html=True)
-    tab_selection, tab_dashboard, tab_logs = st.tabs([ "Taslak Seçimi", "Aktif Takip (Dashboard)", "Loglar"])
+    tab_selection, tab_dashboard, tab_logs, tab_metrics = st.tabs([ "Taslak Seçimi", "Aktif Takip (Dashboard)", "Loglar", "Metrikler"])
 
     with tab_dashboard:
         if manager.history:
@@ -324,9 +517,12 @@ def main():
             )
             
             if st.button("Geçmişi Temizle"):
-                manager.history.clear()
+                manager.clear_history()
                 st.rerun()
 
+        with st.expander("⏱️ Son Kontrolün Zaman Çizelgesi"):
+            waterfall_goster(manager)
+
     with tab_selection:
         
 
@@ -334,7 +530,7 @@ def main():
 
         with header_col:
             if st.button("🔄 Taslakları Yenile"):
-                st.cache_data.clear()
+                manager.invalidate_draft_cache()
                 st.rerun()
         with title_col:
             st.subheader("Taslaklar", text_alignment="center")
@@ -350,8 +546,7 @@ def main():
                 # DURUM 1: Henüz hesaplar çekilmediyse "Getir" butonu göster
                 if not manager.available_accounts:
                     with st.spinner("Hesaplar çekiliyor..."):
-                            if not manager.session.cookies: 
-                                login(manager)
+                            manager.broker.ensure()
                             
                             fetch_success = fetch_accounts_backend(manager)
                             
@@ -364,8 +559,7 @@ def main():
                     # FIX: Logic is now INSIDE the button check
                     if st.button("Hesapları Getir", key="fetch_acc_btn", width="stretch"):
                         with st.spinner("Hesaplar çekiliyor..."):
-                            if not manager.session.cookies: 
-                                login(manager)
+                            manager.broker.ensure()
                             
                             fetch_success = fetch_accounts_backend(manager)
                             
@@ -398,7 +592,13 @@ def main():
                                     st.rerun()
                                 else:
                                     st.error("Geçiş başarısız.")
-        df, hata = veriyi_dataframe_yap(manager)
+        df, hata = manager.get_draft_snapshot()
+        snapshot_info = manager.get_draft_snapshot_info()
+        if snapshot_info:
+            durum = " · arka planda yenileniyor..." if snapshot_info["refreshing"] else ""
+            st.caption(f"Son güncelleme: {int(snapshot_info['age'])} sn önce (v{snapshot_info['version']}){durum}")
+            if snapshot_info["error"] and df is not None:
+                st.warning(f"Liste yenilenemedi, son başarılı liste gösteriliyor: {snapshot_info['error']}")
         
         if df is not None and not df.empty:
             desired_order = [
@@ -448,7 +648,7 @@ def main():
                         
                         # Check existence (O(1) speed!)
                         if key_date not in manager.watch_list:
-                            manager.watch_list[key_date] = {
+                            manager.set_watch_item(key_date, {
                                 'account_id': manager.current_account_id,
                                 'account_name': manager.current_account_name,
                                 'name': row['Draft Name'],
@@ -458,7 +658,7 @@ def main():
                                 'max_mile': int(row["Max Mil"]),
                                 'targets': str(row["Hedef Depolar"]),
                                 'found_warehouses': [],
-                            }
+                            })
                             added_count += 1
                     
                     if added_count > 0:
@@ -471,6 +671,9 @@ def main():
     with tab_logs:
         canli_loglari_goster(manager)
 
+    with tab_metrics:
+        metrikleri_goster(manager)
+
     
     # 1. BÖLÜM: TAKİP LİSTESİ YÖNETİMİ
     # We create a layout: [Header Text] --- [Status Text] --- [Start Btn] [Stop Btn]
@@ -501,20 +704,57 @@ def main():
                 manager.start_bot_process()
                 if manager.scheduler_mode == "interval":
                     try:
-                        # Trigger immediate run
-                        manager.scheduler.add_job(safe_run, 'date', run_date=datetime.now(), args=[manager])
+                        # Trigger immediate run (shared execution queue)
+                        manager.run_now()
                         st.toast("Bot başlatıldı, ilk kontrol yapılıyor...")
                     except: pass
                 st.rerun()
             
-    if manager.is_running:
-        job = manager.scheduler.get_job('user_task')
-        if job and job.next_run_time:
-            next_run = job.next_run_time.strftime("%H:%M:%S")
+    if manager.is_running and manager.scheduler_mode == "continuous":
+        stats = manager.pipeline.stats()
+        hiz = f"{stats['drafts_per_hour']:.0f} taslak/saat" if stats['drafts_per_hour'] else "ölçülüyor..."
+        st.info(f"🔁 **Sürekli mod:** {stats['inflight']}/{stats['target']} taslak işlemde · {hiz}")
+    elif manager.is_running:
+        next_run_time = manager.next_run_time()
+        if next_run_time:
+            next_run = next_run_time.strftime("%H:%M:%S")
             st.info(f"⏳ **Sonraki Planlanmış Çalışma:** {next_run}")
         else:
             st.warning("⚠️ Bot çalışıyor ama zamanlayıcı bulunamadı.")
 
+    if manager.scheduler_mode == "continuous" and manager.pipeline.started_at:
+        with st.expander("📈 Kapasite ve Bayatlık"):
+            stats = manager.pipeline.stats()
+            sure = lambda s: f"{s / 60:.1f} dk" if s is not None else "-"
+            c1, c2, c3, c4 = st.columns(4)
+            c1.metric("Taslak / saat", f"{stats['drafts_per_hour']:.0f}" if stats['drafts_per_hour'] else "-")
+            c2.metric("Tam tur süresi", sure(stats['rotation_s']), help="Tüm listenin mevcut hızla bir kez kontrol edilmesi için gereken süre.")
+            c3.metric("Bayatlık (medyan)", sure(stats['staleness_p50_s']))
+            c4.metric("Bayatlık (en fazla)", sure(stats['staleness_max_s']))
+            st.caption(f"Tamamlanan: {stats['completed']} · Hata: {stats['errors']} · "
+                       f"Ortalama taslak süresi: {stats['avg_draft_s'] or 0:.0f} sn")
+            st.dataframe(pd.DataFrame([{
+                "Taslak": row["name"],
+                "Hesap": row["account_name"],
+                "Son Kontrol": datetime.fromtimestamp(row["last_checked"]).strftime("%H:%M") if row["last_checked"] else "-",
+                "Bayatlık (dk)": round(row["staleness_s"] / 60, 1),
+                "İşlemde": row["inflight"],
+            } for row in manager.pipeline.staleness()]), hide_index=True, width="stretch")
+
+    if manager.scheduler_mode == "adaptive":
+        takvim = manager.adaptive.snapshot()
+        if takvim:
+            with st.expander(f"📅 Taslak Bazlı Zamanlama ({len(takvim)})"):
+                isimler = {item.get('draft_id'): item.get('name') for item in list(manager.watch_list.values())}
+                st.dataframe(pd.DataFrame([{
+                    "Taslak": isimler.get(row["draft_id"], row["draft_id"]),
+                    "Sonraki Kontrol": datetime.fromtimestamp(row["next_check"]).strftime("%H:%M") if row["next_check"] else "işleniyor",
+                    "Aralık (dk)": round(row["interval"]),
+                    "En Yakın Yeni Depo (Mil)": row["best_mile"],
+                    "Durum": row["reason"],
+                    "Kontrol": row["checks"],
+                } for row in takvim]), hide_index=True, width="stretch")
+
     # --- DATAFRAME EDITOR ---2026-04-22 18:06:30.122 The fragment with id 1d46e8af4b3881e69a8b99ad1593351b does not exist anymore - it might have been removed during a preceding full-app rerun.
     watch_df = manager.get_watch_list_df()
     print(watch_df)
@@ -0,0 +1,53 @@
+"""
+Compares the draft table parser backends on synthetic draft.jsf pages.
+
+    python -m benchmarks.bench_draft_parser --rows 100 500 2000
+"""
+import argparse
+import time
+from types import SimpleNamespace
+
+import pandas as pd
+
+from benchmarks.synthetic import draft_page
+from bot.drafts import html_tabloyu_parse_et
+from bot.parsers import DRAFT_TABLE_BACKENDS
+
+
+def _best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 500, 2000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    mgr = SimpleNamespace(watch_list={}, parser_backend="auto")
+    backends = sorted(DRAFT_TABLE_BACKENDS)
+
+    print(f"{'rows':>6} {'page KB':>8} " + " ".join(f"{b + ' ms':>10}" for b in backends) + f" {'speedup':>8}")
+    for n in args.rows:
+        page = draft_page(n)
+        frames = {b: html_tabloyu_parse_et(mgr, page, "utf-8", backend=b) for b in backends}
+        reference = frames["bs4"]
+        assert len(reference) == n, f"bs4 parsed {len(reference)} rows, expected {n}"
+        for b, df in frames.items():
+            pd.testing.assert_frame_equal(df, reference, check_exact=True, obj=f"{b} backend")
+
+        timings = {b: _best_of(lambda b=b: html_tabloyu_parse_et(mgr, page, "utf-8", backend=b), args.repeat)
+                   for b in backends}
+        fastest = min(timings.values())
+        print(f"{n:>6} {len(page) / 1024:>8.0f} "
+              + " ".join(f"{timings[b] * 1000:>10.1f}" for b in backends)
+              + f" {timings['bs4'] / fastest:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Parser micro-benchmarks on synthetic pages, with JSON baselines.
+
+Cases: draft table (html_tabloyu_parse_et) on 100 / 1k / 10k rows, form_verilerini_topla and
+extract_viewstate on the same pages, the parsing stage of auto_resolve_jsf_states
+(onay_adimini_bul) on create_plan replies, analizi_yap on 10 / 100 / 1000 plan rows and the
+account table parse of fetch_accounts_backend.
+
+    python -m benchmarks.bench_parsers run --save benchmarks/baselines/parsers.json
+    python -m benchmarks.bench_parsers run --compare benchmarks/baselines/parsers.json
+    python -m benchmarks.bench_parsers compare old.json new.json --threshold 0.15
+"""
+import argparse
+import contextlib
+import io
+import json
+import platform
+import statistics
+import sys
+import time
+from types import SimpleNamespace
+
+from benchmarks.synthetic import (
+    draft_page,
+    draft_detail_page,
+    plan_response,
+    partial_response,
+    account_table_response,
+    account_rows,
+)
+from bot.auth import hesap_tablosunu_parse_et
+from bot.analysis import analizi_yap
+from bot.drafts import html_tabloyu_parse_et
+from bot.jsf import JsfPage, form_verilerini_topla, extract_viewstate, onay_adimini_bul
+
+DRAFT_ROWS = (100, 1000, 10000)
+# plan rows -> (options, rows per option)
+PLAN_ROWS = {10: (2, 5), 100: (5, 20), 1000: (10, 100)}
+ACCOUNTS = (20, 200)
+
+
+def _mgr():
+    return SimpleNamespace(watch_list={}, parser_backend="auto", mile_threshold=250, teams_webhook_url=None,
+                           add_log=lambda message, type="info": None)
+
+
+def _create_plan_reply(confirm, skus=40):
+    form = draft_detail_page("500001", "Draft 1", "Reno, NV", "vs", skus=skus, padding_kb=0).decode("utf-8")
+    updates = [("mainForm", form[form.index("<form id=\"mainForm\""):form.index("</form>") + 7])]
+    if confirm:
+        updates.append(("planWarning", "<div id=\"planWarning\"><button id=\"mainForm:planWarningContinue\" "
+                                       "class=\"ui-button ui-confirmdialog-yes\"><span>Continue</span></button></div>"))
+    return partial_response(updates, "-1:2")
+
+
+def _quiet(fn, *args):
+    # onay_adimini_bul ve analizi_yap ilerlemeyi print eder
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn(*args)
+
+
+def cases():
+    """name -> zero-argument callable. Inputs are built here, outside the timed calls."""
+    mgr = _mgr()
+    out = {}
+    for n in DRAFT_ROWS:
+        page = draft_page(n)
+        out[f"draft_table/{n}"] = lambda page=page: html_tabloyu_parse_et(mgr, JsfPage(page))
+        out[f"form_data/{n}"] = lambda page=page: form_verilerini_topla(page)
+        out[f"viewstate/{n}"] = lambda page=page: extract_viewstate(page)
+
+    for confirm in (False, True):
+        reply = _create_plan_reply(confirm)
+        out[f"auto_resolve/{'confirm' if confirm else 'clean'}"] = lambda reply=reply: _quiet(onay_adimini_bul, JsfPage(reply))
+
+    item = {"name": "d", "max_mile": 400, "targets": "", "found_warehouses": ["ONT8", "PHX7"]}
+    for rows, (options, per_option) in PLAN_ROWS.items():
+        reply = plan_response(options, per_option, bad_every=97)
+        out[f"analizi_yap/{rows}"] = lambda reply=reply: _quiet(analizi_yap, mgr, reply, item)
+
+    for n in ACCOUNTS:
+        reply = account_table_response(account_rows(n), "-1:2")
+        out[f"account_table/{n}"] = lambda reply=reply: hesap_tablosunu_parse_et(reply, "Account 03 LLC")
+    return out
+
+
+def measure(fn, repeat, min_time):
+    """Per-call seconds: `repeat` samples, each looping fn until min_time has passed."""
+    fn()  # ısınma
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or loops >= 1 << 20:
+            break
+        loops *= 2
+    samples = [elapsed / loops]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        samples.append((time.perf_counter() - start) / loops)
+    return samples
+
+
+def run(args):
+    selected = {name: fn for name, fn in cases().items() if not args.filter or any(f in name for f in args.filter)}
+    results = {}
+    print(f"{'case':<24} {'min ms':>10} {'median ms':>10}")
+    for name, fn in selected.items():
+        samples = measure(fn, args.repeat, args.min_time)
+        results[name] = {"min_ms": round(min(samples) * 1000, 4),
+                         "median_ms": round(statistics.median(samples) * 1000, 4),
+                         "repeat": len(samples)}
+        print(f"{name:<24} {results[name]['min_ms']:>10.3f} {results[name]['median_ms']:>10.3f}")
+
+    report = {
+        "meta": {"created_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+                 "machine": f"{platform.system()} {platform.machine()} {platform.processor()}".strip()},
+        "results": results,
+    }
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nKaydedildi: {args.save}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        return compare_reports(baseline, report, args.threshold)
+    return 0
+
+
+def compare_reports(baseline, current, threshold):
+    """Prints the ratio per case; returns 1 if any case got slower than baseline × (1 + threshold)."""
+    if baseline["meta"].get("machine") != current["meta"].get("machine"):
+        print(f"⚠️ Baseline başka bir makinede alınmış: {baseline['meta'].get('machine')}")
+    print(f"\n{'case':<24} {'base ms':>10} {'now ms':>10} {'ratio':>7}")
+    regressions = 0
+    for name, now in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            print(f"{name:<24} {'-':>10} {now['median_ms']:>10.3f} {'new':>7}")
+            continue
+        # Medyan karşılaştırılır; min gürültüye daha az dayanıklı tek bir örnektir
+        ratio = now["median_ms"] / base["median_ms"] if base["median_ms"] else float("inf")
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        elif ratio < 1 - threshold:
+            flag = "  faster"
+        print(f"{name:<24} {base['median_ms']:>10.3f} {now['median_ms']:>10.3f} {ratio:>6.2f}x{flag}")
+    missing = sorted(set(baseline["results"]) - set(current["results"]))
+    if missing:
+        print(f"Ölçülmeyen: {', '.join(missing)}")
+    print(f"\n{regressions} regresyon (eşik %{threshold * 100:.0f})")
+    return 1 if regressions else 0
+
+
+def compare(args):
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.current, encoding="utf-8") as f:
+        current = json.load(f)
+    return compare_reports(baseline, current, args.threshold)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    r = sub.add_parser("run", help="run the benchmarks")
+    r.add_argument("--repeat", type=int, default=7)
+    r.add_argument("--min-time", type=float, default=0.1, help="seconds per sample (small cases loop)")
+    r.add_argument("--filter", nargs="+", help="only cases whose name contains one of these")
+    r.add_argument("--save", help="write the results as a JSON baseline")
+    r.add_argument("--compare", help="compare with a baseline, exit 1 on regressions")
+    r.add_argument("--threshold", type=float, default=0.10)
+    r.set_defaults(func=run)
+
+    c = sub.add_parser("compare", help="compare two saved results")
+    c.add_argument("baseline")
+    c.add_argument("current")
+    c.add_argument("--threshold", type=float, default=0.10)
+    c.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    sys.exit(args.func(args))
+
+
+if __name__ == "__main__":
+    main()
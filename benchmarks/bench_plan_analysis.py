@@ -0,0 +1,114 @@
+"""
+Compares analizi_yap with the original soup-everything row walk on synthetic plan replies.
+
+    python -m benchmarks.bench_plan_analysis --options 5 20 --rows-per-option 20 100
+"""
+import argparse
+import re
+import time
+from types import SimpleNamespace
+
+from bs4 import BeautifulSoup
+
+from benchmarks.synthetic import plan_response
+from bot.analysis import analizi_yap
+
+
+def _mgr():
+    logs = []
+    return SimpleNamespace(mile_threshold=250, teams_webhook_url=None,
+                           add_log=lambda message, type="info": logs.append((message, type)), logs=logs)
+
+
+def analizi_yap_reference(mgr, xml_response, draft_item):
+    """The pre-vectorization implementation (teams calls dropped, they are no-ops here)."""
+    mgr.add_log("📊 Sonuçlar analiz ediliyor...")
+    limit_mile = draft_item.get('max_mile', mgr.mile_threshold)
+    target_warehouses_str = draft_item.get('targets', "")
+    known_warehouses = draft_item.get('found_warehouses', [])
+
+    html_parts = re.findall(r'<!\[CDATA\[(.*?)]]>', xml_response, re.DOTALL)
+    soup = BeautifulSoup("".join(html_parts), 'html.parser')
+    plans_table = soup.find("tbody", id=lambda x: x and "plans" in x)
+    if not plans_table: return False
+
+    current_option = "Bilinmiyor"
+    target_list = [t.strip().upper() for t in target_warehouses_str.split(',') if t.strip()]
+    previously_found = set(k.upper() for k in known_warehouses)
+    bulunan_firsatlar = {}
+    found_new = {"found_new": []}
+
+    for row in plans_table.find_all("tr"):
+        if "ui-rowgroup-header" in row.get("class", []):
+            current_option = row.get_text(strip=True)
+            continue
+        cells = row.find_all("td")
+        if len(cells) > 3:
+            dist_text = cells[3].get_text(strip=True)
+            if "mi" in dist_text:
+                try:
+                    mil_text = dist_text.replace("mi", "").replace(",", "").strip()
+                    mil = int(mil_text)
+                    dest = cells[2].get_text(strip=True).upper().split(":")[0]
+                    if "Amazon Optimized" in current_option: continue
+                    if any(target in dest for target in target_list):
+                        mgr.add_log(f"🎯 HEDEF DEPO BULUNDU! ({dest}) - Takip Bitiyor.", "success")
+                        return {"found_target": [{dest: mil}]}
+                    elif mil < limit_mile:
+                        if dest in previously_found:
+                            print(f"Skipping {dest} (Already copied)")
+                            mgr.add_log(f"Skipping {dest} (Already copied)")
+                            found_new["found_new"].append({dest: mil})
+                            continue
+                        mgr.add_log(f"✅ MESAFE UYGUN: {mil} Mil ({dest})", "success")
+                        bulunan_firsatlar[current_option] = f"{mil} Mil ➡️ {dest}"
+                        found_new["found_new"].append({dest: mil})
+                except ValueError:
+                    # bot/analysis.py ile aynı mesaj (okunamayan mesafe)
+                    mgr.add_log(f"Analiz hatasi: mesafe okunamadı {mil_text!r}")
+    return found_new if bulunan_firsatlar else False
+
+
+SCENARIOS = {
+    "no-target": {"name": "d", "max_mile": 250, "targets": ""},
+    "known": {"name": "d", "max_mile": 400, "targets": "", "found_warehouses": ["ont8", "PHX7"]},
+    "target": {"name": "d", "max_mile": 100, "targets": "zzz, FTW1"},
+}
+
+
+def _best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--options", type=int, nargs="+", default=[5, 20])
+    parser.add_argument("--rows-per-option", type=int, nargs="+", default=[20, 100])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'options':>8} {'rows':>6} {'reply KB':>9} {'scenario':>10} {'ref ms':>9} {'new ms':>9} {'speedup':>8}")
+    for n_options in args.options:
+        for per_option in args.rows_per_option:
+            reply = plan_response(n_options, per_option, bad_every=97)
+            text = reply.decode("utf-8")
+            for name, item in SCENARIOS.items():
+                ref_mgr, new_mgr = _mgr(), _mgr()
+                expected = analizi_yap_reference(ref_mgr, text, item)
+                got = analizi_yap(new_mgr, reply, item)
+                assert got == expected, f"{name}: {got!r} != {expected!r}"
+                assert new_mgr.logs == ref_mgr.logs, f"{name}: logs differ"
+
+                ref = _best_of(lambda: analizi_yap_reference(_mgr(), text, item), args.repeat)
+                new = _best_of(lambda: analizi_yap(_mgr(), reply, item), args.repeat)
+                print(f"{n_options:>8} {n_options * per_option:>6} {len(reply) / 1024:>9.0f} {name:>10} "
+                      f"{ref * 1000:>9.1f} {new * 1000:>9.1f} {ref / new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Offline end-to-end benchmark: replays a recorded 2DWorkflow session (bot/replay.py) through
+veriyi_dataframe_yap, drafti_planla_backend and drafti_kopyala, without touching the live site.
+
+Record a fixture once (needs TWD_EMAIL / TWD_PASSWORD; --copy really copies the draft on the site):
+
+    python -m benchmarks.bench_replay record fixtures/flow.json.gz --draft-id 123456 \\
+        --redact "Babil Design=Account A" --redact "My Draft=Draft 1" --copy
+
+Replay it as often as needed:
+
+    python -m benchmarks.bench_replay run fixtures/flow.json.gz --repeat 5 --latency 0
+"""
+import argparse
+import os
+import statistics
+import time
+
+os.environ.setdefault("TWD_STORE", "none")  # benchmark runs must not touch the real watch list
+
+from bot.drafts import veriyi_dataframe_yap, drafti_planla_backend, drafti_kopyala
+from bot.manager import GlobalManager
+from bot.replay import Recorder, Replayer, Cassette
+
+REPLAY_EMAIL = "user@example.com"
+
+
+def _manager(email, password, transport):
+    mgr = GlobalManager(email, password)
+    mgr.set_transport(transport)
+    return mgr
+
+
+def _digest(result):
+    """Comparable form of a step result (DataFrames by their rows)."""
+    if isinstance(result, tuple):
+        return tuple(_digest(r) for r in result)
+    if hasattr(result, "to_dict"):
+        return result.to_dict("records")
+    return result
+
+
+def run_steps(mgr, steps):
+    """Runs the recorded steps in order. Returns [(step, seconds, result)]."""
+    out = []
+    for step in steps:
+        item = step.get("item")
+        if item is not None:
+            mgr.watch_list[item["draft_id"]] = item
+        start = time.perf_counter()
+        if step["fn"] == "veriyi_dataframe_yap":
+            result = veriyi_dataframe_yap(mgr)
+        elif step["fn"] == "drafti_planla_backend":
+            result = drafti_planla_backend(mgr, item)
+        elif step["fn"] == "drafti_kopyala":
+            result = drafti_kopyala(mgr, step["draft_id"])
+        else:
+            raise ValueError(f"Bilinmeyen adım: {step['fn']}")
+        out.append((step["fn"], time.perf_counter() - start, result))
+    return out
+
+
+def record(args):
+    email, password = os.environ["TWD_EMAIL"], os.environ["TWD_PASSWORD"]
+    redact = {email: REPLAY_EMAIL, password: "***"}
+    redact.update(pair.split("=", 1) for pair in args.redact)
+    recorder = Recorder(redact=redact)
+    mgr = _manager(email, password, recorder)
+
+    df, hata = veriyi_dataframe_yap(mgr)
+    if df is None:
+        raise SystemExit(f"Taslak listesi alınamadı: {hata}")
+    row = df[df["Draft Id"] == args.draft_id]
+    if row.empty:
+        raise SystemExit(f"{args.draft_id} listede yok.")
+    row = row.iloc[0]
+    item = {
+        "name": row["Draft Name"],
+        "draft_id": row["Draft Id"],
+        "date": row["Created"],
+        "loc": row["From"],
+        "max_mile": args.max_mile,
+        "targets": args.targets,
+        "found_warehouses": [],
+    }
+    steps = [{"fn": "veriyi_dataframe_yap"}, {"fn": "drafti_planla_backend", "item": item}]
+    if args.copy:
+        steps.append({"fn": "drafti_kopyala", "draft_id": item["draft_id"], "item": item})
+
+    # Replay needs the whole flow in the fixture, so the list fetch above is recorded again as step 1
+    recorder.clear()
+    mgr = _manager(email, password, recorder)
+    for fn, seconds, _ in run_steps(mgr, steps):
+        print(f"{fn:<24} {seconds:>8.2f} s (canlı)")
+
+    recorder.meta = {"email": REPLAY_EMAIL, "steps": steps, "recorded_at": time.time()}
+    time.sleep(1)  # SSE okuyucusu son olayları yazsın
+    cassette = recorder.save(args.fixture)
+    print(f"{len(cassette.exchanges)} alışveriş kaydedildi -> {args.fixture}")
+
+
+def run(args):
+    cassette = Cassette.load(args.fixture)
+    steps = cassette.meta["steps"]
+    timings = {step["fn"]: [] for step in steps}
+    first = None
+    for i in range(args.repeat):
+        replayer = Replayer(cassette, latency_scale=args.latency, strict=not args.lenient)
+        mgr = _manager(cassette.meta.get("email", REPLAY_EMAIL), "replay", replayer)
+        results = run_steps(mgr, steps)
+        for fn, seconds, _ in results:
+            timings[fn].append(seconds)
+
+        digest = [_digest(result) for _, _, result in results]
+        if first is None:
+            first = digest
+        elif digest != first:
+            print(f"⚠️ Tekrar {i + 1} farklı sonuç üretti.")
+        if replayer.misses or replayer.unused:
+            print(f"⚠️ Tekrar {i + 1}: {len(replayer.misses)} eşleşmeyen istek, {replayer.unused} kullanılmayan kayıt")
+            for key in replayer.misses[:5]:
+                print(f"    {key}")
+
+    print(f"{len(cassette.exchanges)} alışveriş, {args.repeat} tekrar, gecikme ölçeği {args.latency}")
+    print(f"{'step':<24} {'best ms':>9} {'median ms':>10}")
+    for fn, values in timings.items():
+        print(f"{fn:<24} {min(values) * 1000:>9.1f} {statistics.median(values) * 1000:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    rec = sub.add_parser("record", help="record a live session into a fixture")
+    rec.add_argument("fixture")
+    rec.add_argument("--draft-id", required=True)
+    rec.add_argument("--max-mile", type=int, default=300)
+    rec.add_argument("--targets", default="")
+    rec.add_argument("--copy", action="store_true", help="also record drafti_kopyala (creates a real copy)")
+    rec.add_argument("--redact", action="append", default=[], metavar="SECRET=PLACEHOLDER")
+    rec.set_defaults(func=record)
+
+    rep = sub.add_parser("run", help="replay a fixture and time the steps")
+    rep.add_argument("fixture")
+    rep.add_argument("--repeat", type=int, default=5)
+    rep.add_argument("--latency", type=float, default=0.0, help="0: instant, 1: recorded server timing")
+    rep.add_argument("--lenient", action="store_true", help="reuse the last exchange instead of failing on a miss")
+    rep.set_defaults(func=run)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Load test of the scheduler against the local simulator (benchmarks/simulator.py).
+
+Starts the simulator in a subprocess, creates --users GlobalManagers, puts every draft of every
+account on their watch lists and runs gorev() --cycles times. Reports cycle duration,
+drafts/hour, errors and memory per GlobalManager.
+
+    python -m benchmarks.load_test --accounts 20 --drafts 500 --mode parallel --max-workers 16 --cycles 2
+    python -m benchmarks.load_test --url http://127.0.0.1:8765 ...   # already running simulator
+"""
+import argparse
+import gc
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+
+from benchmarks.simulator import add_arguments, config_from_args, sim_argv
+
+
+def _rss_mb():
+    """Current resident set size of this process (Linux)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError):
+        return float("nan")
+
+
+def start_simulator(config):
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.simulator", "--port", "0", *sim_argv(config)],
+        stdout=subprocess.PIPE, text=True,
+    )
+    line = proc.stdout.readline().strip()
+    if not line.startswith("listening on "):
+        proc.kill()
+        raise SystemExit(f"Simülatör başlatılamadı: {line!r}")
+    return proc, line.split("listening on ", 1)[1]
+
+
+def build_manager(args, index):
+    # bot modülleri TWD_BASE_URL set edildikten sonra import edilir (constants import anında okunur)
+    from bot.manager import GlobalManager
+    from bot.auth import switch_account_backend
+    from bot.drafts import veriyi_dataframe_yap
+
+    mgr = GlobalManager(f"load{index}@sim.local", "sim")
+    mgr.execution_mode = args.mode
+    mgr.max_workers = args.max_workers
+    mgr.default_account_concurrency = args.account_concurrency
+    mgr.async_max_inflight = args.async_inflight
+    mgr.plan_job_timeout = args.plan_timeout
+
+    if not mgr.broker.ensure():
+        raise SystemExit("Simülatöre giriş yapılamadı.")
+    for acc in list(mgr.available_accounts):
+        if acc["id"] != mgr.current_account_id and not switch_account_backend(mgr, acc["id"]):
+            raise SystemExit(f"{acc['name']} hesabına geçilemedi.")
+        df, hata = veriyi_dataframe_yap(mgr)
+        if df is None:
+            continue
+        for _, row in df.iterrows():
+            mgr.set_watch_item(row["Draft Id"], {
+                "account_id": mgr.current_account_id,
+                "account_name": mgr.current_account_name,
+                "name": row["Draft Name"],
+                "draft_id": row["Draft Id"],
+                "date": row["Created"],
+                "loc": row["From"],
+                "max_mile": args.max_mile,
+                "targets": "",
+                "found_warehouses": [],
+            })
+    mgr.is_running = True
+    return mgr
+
+
+def run_cycles(mgr, cycles, results):
+    from bot.scheduler import gorev
+
+    for _ in range(cycles):
+        cursor = mgr.logs.last_seq
+        start = time.perf_counter()
+        gorev(mgr)
+        duration = time.perf_counter() - start
+        drafts = sum(1 for row in mgr.tracer.waterfall(mgr.tracer.cycle_id) if row["depth"] == 0)
+        errors, _ = mgr.logs.tail(cursor, levels=("error",))
+        results.append({"user": mgr.email, "duration": duration, "drafts": drafts, "errors": len(errors)})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="use an already running simulator instead of starting one")
+    parser.add_argument("--users", type=int, default=1, help="GlobalManagers running side by side")
+    parser.add_argument("--cycles", type=int, default=2)
+    parser.add_argument("--mode", choices=("sequential", "parallel", "async"), default="parallel")
+    parser.add_argument("--max-workers", type=int, default=16)
+    parser.add_argument("--account-concurrency", type=int, default=1)
+    parser.add_argument("--async-inflight", type=int, default=100)
+    parser.add_argument("--max-drafts", type=int, default=64,
+                        help="drafts in flight across all users (shared execution service, TWD_MAX_DRAFTS)")
+    parser.add_argument("--plan-timeout", type=float, default=60)
+    parser.add_argument("--max-mile", type=int, default=0, help="0: no plan qualifies, no copies")
+    parser.add_argument("--tracemalloc", action="store_true", help="also measure the Python heap (slower)")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    proc = None
+    url = args.url
+    if url is None:
+        proc, url = start_simulator(config_from_args(args))
+    os.environ["TWD_BASE_URL"] = url
+    os.environ.setdefault("TWD_STORE", "none")
+    os.environ["TWD_MAX_DRAFTS"] = str(args.max_drafts)
+    print(f"Simülatör: {url} ({args.accounts} hesap, {args.drafts} taslak / kullanıcı)")
+
+    try:
+        import bot.manager  # noqa: F401  (import maliyeti bellek ölçümüne girmesin)
+        gc.collect()
+        if args.tracemalloc:
+            tracemalloc.start()
+        rss_start = _rss_mb()
+        heap_start = tracemalloc.get_traced_memory()[0] if args.tracemalloc else 0
+
+        setup_start = time.perf_counter()
+        managers = [build_manager(args, i) for i in range(args.users)]
+        setup = time.perf_counter() - setup_start
+        watched = sum(len(m.watch_list) for m in managers)
+        print(f"Kurulum: {setup:.1f} sn, {watched} taslak takipte")
+
+        results = []
+        wall_start = time.perf_counter()
+        threads = [threading.Thread(target=run_cycles, args=(m, args.cycles, results)) for m in managers]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        wall = time.perf_counter() - wall_start
+
+        gc.collect()
+        rss_end = _rss_mb()
+        heap_end = tracemalloc.get_traced_memory()[0] if args.tracemalloc else 0
+
+        print(f"\n{'user':<20} {'cycle s':>8} {'drafts':>7} {'drafts/h':>9} {'errors':>7}")
+        for r in results:
+            rate = r["drafts"] / r["duration"] * 3600 if r["duration"] else 0
+            print(f"{r['user']:<20} {r['duration']:>8.1f} {r['drafts']:>7} {rate:>9.0f} {r['errors']:>7}")
+
+        total_drafts = sum(r["drafts"] for r in results)
+        durations = [r["duration"] for r in results]
+        print(f"\nMod: {args.mode}, {args.users} kullanıcı × {args.cycles} döngü")
+        print(f"Toplam: {total_drafts} taslak, {wall:.1f} sn -> {total_drafts / wall * 3600:.0f} taslak/saat")
+        print(f"Döngü süresi: medyan {statistics.median(durations):.1f} sn, en uzun {max(durations):.1f} sn")
+        print(f"Hata logu: {sum(r['errors'] for r in results)}")
+        print(f"RSS: {rss_start:.0f} -> {rss_end:.0f} MB, GlobalManager başına {(rss_end - rss_start) / args.users:.1f} MB")
+        if args.tracemalloc:
+            print(f"Python heap: GlobalManager başına {(heap_end - heap_start) / args.users / 2 ** 20:.1f} MB")
+
+        print(f"\n{'endpoint':<12} {'method':<6} {'count':>6} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7}")
+        for row in managers[0].http_metrics.summary():
+            print(f"{row['endpoint']:<12} {row['method']:<6} {row['count']:>6} {row['p50_ms'] or 0:>8.1f} "
+                  f"{row['p95_ms'] or 0:>8.1f} {row['errors']:>7}")
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=10)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,561 @@
+"""
+Local stand-in for the 2DWorkflow site, for load and scaling tests of the bot.
+
+Emulates login.jsf, draft.jsf (datatable, copy / confirm / rename, account menu and switching),
+draftplan.jsf (create_plan, optional confirm step, onPlanShippingJobComplete, rename) and the
+/api/sse/jobs/session job-status stream, with configurable latencies and failure rates.
+Every e-mail gets its own generated set of accounts and drafts; any password is accepted.
+
+    python -m benchmarks.simulator --port 8765 --accounts 20 --drafts 500 --latency 0.05 --plan-seconds 3
+    TWD_BASE_URL=http://127.0.0.1:8765 streamlit run app.py
+"""
+import argparse
+import heapq
+import html
+import itertools
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, parse_qsl
+
+from benchmarks.synthetic import (
+    _LOCATIONS,
+    render_draft_page,
+    draft_detail_page,
+    partial_response,
+    account_table_response,
+    account_rows,
+    plan_response,
+)
+
+# (flag, type, default, help); shared with benchmarks/load_test.py
+SIM_OPTIONS = (
+    ("--accounts", int, 20, "accounts per user"),
+    ("--drafts", int, 500, "drafts per user, spread over the accounts"),
+    ("--latency", float, 0.05, "base server time per request (s), jittered ±50%%"),
+    ("--list-latency-per-1k", float, 0.2, "extra time of draft.jsf per 1000 rows (s)"),
+    ("--plan-seconds", float, 3.0, "create_plan job duration until the DONE event (s), jittered ±50%%"),
+    ("--plan-options", int, 4, "plan options in the results table"),
+    ("--plan-rows", int, 10, "rows per plan option"),
+    ("--fail-rate", float, 0.0, "probability of a 503 on any page / ajax request"),
+    ("--job-fail-rate", float, 0.0, "probability that a plan job ends FAILED"),
+    ("--confirm-rate", float, 0.0, "probability that create_plan asks for an extra confirm"),
+    ("--sse-drop-rate", float, 0.0, "probability that the SSE stream is cut after an event"),
+    ("--session-ttl", float, 0.0, "idle seconds until a session expires (0: never)"),
+    ("--padding-kb", int, 64, "inline script padding of full pages"),
+    ("--seed", int, 0, "world generation seed"),
+)
+
+_COPY_SOURCE = re.compile(r"^mainForm:drafts:(\d+):j_idt120$")
+_LIST_NAME_INPUT = re.compile(r"^mainForm:drafts:(\d+):draft_name$")
+_CONFIRM_YES = "mainForm:j_idt207"
+_PLAN_CONFIRM = "mainForm:planWarningContinue"
+_MENU_BUTTON = "formLogo:j_idt12"
+_ACCOUNT_TABLE = "__my_store_form__:__my_stor_table__"
+
+
+class SimConfig:
+    def __init__(self, **options):
+        for flag, _, default, _ in SIM_OPTIONS:
+            key = flag[2:].replace("-", "_")
+            setattr(self, key, options.get(key, default))
+
+
+def add_arguments(parser):
+    for flag, type_, default, help_text in SIM_OPTIONS:
+        parser.add_argument(flag, type=type_, default=default, help=help_text)
+
+
+def config_from_args(args):
+    return SimConfig(**{flag[2:].replace("-", "_"): getattr(args, flag[2:].replace("-", "_")) for flag, *_ in SIM_OPTIONS})
+
+
+def sim_argv(config):
+    """Command line flags that recreate config (to start the simulator in a subprocess)."""
+    argv = []
+    for flag, *_ in SIM_OPTIONS:
+        argv += [flag, str(getattr(config, flag[2:].replace("-", "_")))]
+    return argv
+
+
+class Draft:
+    __slots__ = ("draft_id", "name", "loc", "skus", "units", "created")
+
+    def __init__(self, draft_id, name, loc, skus, units, created):
+        self.draft_id = draft_id
+        self.name = name
+        self.loc = loc
+        self.skus = skus
+        self.units = units
+        self.created = created
+
+
+class World:
+    """Accounts and drafts of one user."""
+
+    def __init__(self, config, seed):
+        rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.accounts = account_rows(config.accounts, seed)
+        self.drafts = {rk: [] for rk, _ in self.accounts}
+        self.by_id = {}
+        self._ids = itertools.count(500000)
+        self._created = datetime(2026, 1, 5, 8, 0)
+        for n in range(config.drafts):
+            rk = self.accounts[n % len(self.accounts)][0]
+            self._add(rk, f"Draft {n}", rng.choice(_LOCATIONS), rng.randint(1, 40), rng.randint(10, 4000))
+
+    def _add(self, rk, name, loc, skus, units):
+        # 'Created' watch_list anahtarıdır, kullanıcı içinde benzersiz olmalı
+        self._created += timedelta(minutes=1)
+        draft = Draft(str(next(self._ids)), name, loc, skus, units, self._created.strftime("%m.%d.%Y %H:%M"))
+        self.drafts[rk].append(draft)
+        self.by_id[draft.draft_id] = (rk, draft)
+        return draft
+
+    def account_name(self, rk):
+        return next((name for key, name in self.accounts if key == rk), "Bilinmiyor")
+
+    def copy(self, draft_id):
+        with self.lock:
+            rk, draft = self.by_id[draft_id]
+            return self._add(rk, f"{draft.name} - copy", draft.loc, draft.skus, draft.units)
+
+
+class Session:
+    def __init__(self, sid, world):
+        self.sid = sid
+        self.world = world
+        self.account = world.accounts[0][0]
+        self.current_draft = None
+        self.pending_copy = None
+        self.last_seen = time.time()
+        self._vs = itertools.count(1)
+        # SSE: (event id, time, text); streams of this session read from here
+        self.events = []
+        self.event_ids = itertools.count(1)
+        self.cond = threading.Condition()
+
+    def viewstate(self):
+        return f"{self.sid[:8]}:{next(self._vs)}"
+
+    def publish(self, payload):
+        with self.cond:
+            self.events.append((next(self.event_ids), time.time(), json.dumps(payload)))
+            if len(self.events) > 1000:
+                del self.events[:500]
+            self.cond.notify_all()
+
+
+class JobRunner:
+    """Publishes the progress events of plan jobs at their due time (one thread for all jobs)."""
+
+    def __init__(self):
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self.stopped = False
+        threading.Thread(target=self._run, name="sim-jobs", daemon=True).start()
+
+    def schedule(self, due, session, payload):
+        with self._cond:
+            heapq.heappush(self._heap, (due, next(self._seq), session, payload))
+            self._cond.notify()
+
+    def stop(self):
+        with self._cond:
+            self.stopped = True
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self.stopped and (not self._heap or self._heap[0][0] > time.time()):
+                    self._cond.wait(self._heap[0][0] - time.time() if self._heap else None)
+                if self.stopped:
+                    return
+                _, _, session, payload = heapq.heappop(self._heap)
+            session.publish(payload)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256  # yük testinde çok sayıda eşzamanlı bağlantı
+
+
+class Simulator:
+    def __init__(self, config=None, host="127.0.0.1", port=0):
+        self.config = config or SimConfig()
+        self.rng = random.Random(self.config.seed)
+        self.rng_lock = threading.Lock()
+        self.worlds = {}
+        self.sessions = {}
+        self.lock = threading.Lock()
+        self.jobs = JobRunner()
+        self.stats = {"requests": 0, "failures": 0, "plans": 0, "copies": 0, "logins": 0}
+        self._stats_lock = threading.Lock()
+        self.server = _Server((host, port), _Handler)
+        self.server.sim = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="simulator", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.jobs.stop()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def count(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def random(self):
+        with self.rng_lock:
+            return self.rng.random()
+
+    def jitter(self, seconds):
+        return seconds * (0.5 + self.random()) if seconds > 0 else 0
+
+    def login(self, email):
+        with self.lock:
+            world = self.worlds.get(email)
+            if world is None:
+                world = self.worlds[email] = World(self.config, f"{self.config.seed}:{email}")
+            sid = uuid.uuid4().hex
+            session = self.sessions[sid] = Session(sid, world)
+        return session
+
+    def session(self, sid):
+        with self.lock:
+            session = self.sessions.get(sid)
+            ttl = self.config.session_ttl
+            if session is not None and ttl and time.time() - session.last_seen > ttl:
+                del self.sessions[sid]
+                return None
+        if session is not None:
+            session.last_seen = time.time()
+        return session
+
+    def start_plan_job(self, session, draft_id):
+        job_id = uuid.uuid4().hex
+        total = 3
+        duration = self.jitter(self.config.plan_seconds)
+        now = time.time()
+        base = {"type": "CREATE_SHIPMENT_PLAN", "jobId": job_id, "draftId": draft_id, "total": total}
+        for done in range(1, total):
+            self.jobs.schedule(now + duration * done / total, session, {**base, "status": "RUNNING", "done": done})
+        if self.random() < self.config.job_fail_rate:
+            final = {**base, "status": "FAILED", "done": total - 1, "errorMessage": "Simulated plan failure"}
+        else:
+            final = {**base, "status": "DONE", "done": total}
+        self.jobs.schedule(now + duration, session, final)
+        self.count("plans")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def sim(self):
+        return self.server.sim
+
+    # --- helpers ---
+    def _session(self):
+        cookie = self.headers.get("Cookie", "")
+        match = re.search(r"JSESSIONID=([0-9a-f]+)", cookie)
+        return self.sim.session(match.group(1)) if match else None
+
+    def _send(self, status, body=b"", content_type="text/html; charset=UTF-8", headers=()):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in headers:
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _redirect(self, location, headers=()):
+        self._send(302, b"", headers=[("Location", location), *headers])
+
+    def _xml(self, body):
+        self._send(200, body, "text/xml; charset=UTF-8")
+
+    def _delay(self, extra=0.0):
+        seconds = self.sim.jitter(self.sim.config.latency) + extra
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def _fail(self):
+        self.sim.count("requests")
+        if self.sim.random() < self.sim.config.fail_rate:
+            self.sim.count("failures")
+            self._send(503, b"<html><body>Service Unavailable</body></html>")
+            return True
+        return False
+
+    def _form(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length).decode("utf-8", "replace") if length else ""
+        return dict(parse_qsl(body, keep_blank_values=True))
+
+    # --- routing ---
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        if parts.path == "/api/sse/jobs/session":
+            return self._sse()
+        if self._fail():
+            return
+        self._delay()
+        if parts.path == "/login.jsf":
+            return self._send(200, _login_page(uuid.uuid4().hex[:12]))
+        session = self._session()
+        if session is None:
+            return self._redirect("/login.jsf")
+        if parts.path == "/draft.jsf":
+            return self._draft_list(session)
+        if parts.path == "/draftplan.jsf":
+            draft_id = parse_qs(parts.query).get("id", [None])[0]
+            return self._draft_detail(session, draft_id)
+        self._send(404, b"<html><body>Not Found</body></html>")
+
+    def do_POST(self):
+        parts = urlsplit(self.path)
+        form = self._form()
+        if self._fail():
+            return
+        self._delay()
+        if parts.path == "/login.jsf":
+            return self._login(form)
+        session = self._session()
+        if session is None:
+            if form.get("javax.faces.partial.ajax"):
+                return self._xml(partial_response(redirect="/login.jsf"))
+            return self._redirect("/login.jsf")
+        if parts.path == "/draft.jsf":
+            return self._draft_ajax(session, form)
+        if parts.path == "/draftplan.jsf":
+            return self._plan_ajax(session, form, parse_qs(parts.query).get("id", [None])[0])
+        self._send(404, b"")
+
+    # --- pages ---
+    def _login(self, form):
+        email = form.get("mainForm:email")
+        if not email or not form.get("mainForm:password"):
+            return self._send(200, _login_page("x", error=True))
+        session = self.sim.login(email)
+        self.sim.count("logins")
+        self._redirect("/draft.jsf", headers=[("Set-Cookie", f"JSESSIONID={session.sid}; Path=/; HttpOnly")])
+
+    def _draft_list(self, session):
+        world = session.world
+        with world.lock:
+            drafts = list(world.drafts[session.account])
+        self._delay(self.sim.config.list_latency_per_1k * len(drafts) / 1000)
+        rows = [{
+            "i": i, "rk": 100000 + i, "draft_id": d.draft_id,
+            "parity": "ui-datatable-even" if i % 2 == 0 else "ui-datatable-odd",
+            "name": html.escape(d.name), "loc": html.escape(d.loc),
+            "skus": d.skus, "units": d.units, "created": d.created,
+        } for i, d in enumerate(drafts)]
+        self._send(200, render_draft_page(rows, session.viewstate(), html.escape(world.account_name(session.account)),
+                                          self.sim.config.padding_kb))
+
+    def _draft_detail(self, session, draft_id):
+        found = session.world.by_id.get(draft_id)
+        if found is None:
+            return self._redirect("/draft.jsf")
+        rk, draft = found
+        session.current_draft = draft_id
+        self._send(200, draft_detail_page(draft.draft_id, html.escape(draft.name), html.escape(draft.loc),
+                                          session.viewstate(), html.escape(session.world.account_name(rk)),
+                                          skus=min(draft.skus, 20), units=draft.units))
+
+    # --- draft.jsf ajax ---
+    def _draft_ajax(self, session, form):
+        world = session.world
+        source = form.get("javax.faces.source", "")
+        event = form.get("javax.faces.behavior.event")
+
+        if source == _MENU_BUTTON:
+            return self._xml(account_table_response(world.accounts, session.viewstate()))
+
+        if source == _ACCOUNT_TABLE and event == "rowSelect":
+            rk = form.get(f"{_ACCOUNT_TABLE}_selection")
+            if rk not in world.drafts:
+                return self._xml(partial_response([("messages", "<div class=\"ui-messages-error\">Unknown account</div>")],
+                                                  session.viewstate()))
+            session.account = rk
+            flag = f"<div id=\"ccFlag\" class=\"flag\"><span> {html.escape(world.account_name(rk))}</span></div>"
+            return self._xml(partial_response([("ccFlag", flag), ("contentPanel", "<div id=\"contentPanel\"></div>")],
+                                              session.viewstate()))
+
+        copy = _COPY_SOURCE.match(source)
+        if copy:
+            with world.lock:
+                drafts = world.drafts[session.account]
+                index = int(copy.group(1))
+                session.pending_copy = drafts[index].draft_id if index < len(drafts) else None
+            dialog = (f"<div id=\"clone_draft_confirm\" class=\"ui-confirm-dialog\"><span>Copy this draft?</span>"
+                      f"<button id=\"{_CONFIRM_YES}\" name=\"{_CONFIRM_YES}\" class=\"ui-button ui-confirmdialog-yes\">"
+                      f"<span class=\"ui-button-text\">Yes</span></button>"
+                      f"<button id=\"mainForm:j_idt208\" class=\"ui-button ui-confirmdialog-no\"><span>No</span></button></div>")
+            return self._xml(partial_response([("clone_draft_confirm", dialog)], session.viewstate()))
+
+        if source == _CONFIRM_YES:
+            if session.pending_copy is None:
+                return self._xml(partial_response([], session.viewstate()))
+            new = world.copy(session.pending_copy)
+            session.pending_copy = None
+            self.sim.count("copies")
+            return self._xml(partial_response(redirect=f"/draftplan.jsf?id={new.draft_id}&from=copy"))
+
+        if event in ("cellEdit", "change"):
+            row = None
+            if event == "cellEdit":
+                row = form.get("mainForm:drafts_cellInfo", "").split(",")[0]
+            else:
+                match = _LIST_NAME_INPUT.match(source)
+                row = match.group(1) if match else None
+            new_name = form.get(f"mainForm:drafts:{row}:draft_name")
+            if row is not None and row.isdigit() and new_name:
+                with world.lock:
+                    drafts = world.drafts[session.account]
+                    if int(row) < len(drafts):
+                        drafts[int(row)].name = new_name
+            return self._xml(partial_response([], session.viewstate()))
+
+        self._xml(partial_response([], session.viewstate()))
+
+    # --- draftplan.jsf ajax ---
+    def _plan_ajax(self, session, form, draft_id):
+        source = form.get("javax.faces.source", "")
+        draft_id = draft_id or session.current_draft
+        found = session.world.by_id.get(draft_id)
+
+        if source == "mainForm:create_plan":
+            if found is None:
+                return self._xml(partial_response(
+                    [("mainForm", "<div class=\"ui-messages-error\">Draft not found</div>")], session.viewstate()))
+            self.sim.start_plan_job(session, draft_id)
+            if self.sim.random() < self.sim.config.confirm_rate:
+                dialog = (f"<div id=\"planWarning\" class=\"ui-confirm-dialog\"><span>Some items need prep.</span>"
+                          f"<button id=\"{_PLAN_CONFIRM}\" class=\"ui-button ui-confirmdialog-yes\">"
+                          f"<span class=\"ui-button-text\">Continue</span></button></div>")
+                return self._xml(partial_response([("planWarning", dialog)], session.viewstate()))
+            return self._xml(partial_response(
+                [("mainForm:planStatus", "<span id=\"mainForm:planStatus\">Planning...</span>")], session.viewstate()))
+
+        if source == _PLAN_CONFIRM:
+            return self._xml(partial_response(
+                [("planWarning", "<div id=\"planWarning\"></div>")], session.viewstate()))
+
+        if source == "mainForm:onPlanShippingJobComplete":
+            if found is None:
+                return self._xml(partial_response([], session.viewstate()))
+            self._delay()  # büyük sonuç tablosu
+            cfg = self.sim.config
+            return self._xml(plan_response(cfg.plan_options, cfg.plan_rows, seed=int(draft_id), padding_kb=cfg.padding_kb))
+
+        if "draft_name" in source and form.get("javax.faces.behavior.event") == "change":
+            new_name = form.get(source)
+            if found is not None and new_name:
+                with session.world.lock:
+                    found[1].name = new_name
+            return self._xml(partial_response([], session.viewstate()))
+
+        self._xml(partial_response([], session.viewstate()))
+
+    # --- SSE ---
+    def _sse(self):
+        session = self._session()
+        if session is None:
+            return self._send(401, b"", "text/plain")
+        last_id = self.headers.get("Last-Event-ID")
+        with session.cond:
+            if last_id and last_id.isdigit():
+                sent = int(last_id)
+            else:
+                # Bağlantıdan hemen önceki olaylar da verilir (bağlanma ile create_plan yarışı)
+                since = time.time() - 10
+                sent = max((e[0] for e in session.events if e[1] < since), default=0)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            self._chunk(": connected\n\n")
+            while not self.sim.jobs.stopped:
+                with session.cond:
+                    if not session.events or session.events[-1][0] <= sent:
+                        session.cond.wait(15)
+                    pending = [e for e in session.events if e[0] > sent]
+                if not pending:
+                    self._chunk(": ping\n\n")
+                    continue
+                for event_id, _, data in pending:
+                    self._chunk(f"id: {event_id}\nevent: job-status-global\ndata: {data}\n\n")
+                    sent = event_id
+                    if self.sim.random() < self.sim.config.sse_drop_rate:
+                        self.close_connection = True
+                        return
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+    def _chunk(self, text):
+        data = text.encode("utf-8")
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+
+def _login_page(viewstate, error=False):
+    message = "<div class=\"ui-messages-error\">Invalid credentials</div>" if error else ""
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<html xmlns="http://www.w3.org/1999/xhtml"><head><title>Login</title></head><body>
+<form id="mainForm" name="mainForm" method="post" action="/login.jsf">{message}
+<input type="hidden" name="mainForm" value="mainForm" />
+<input id="mainForm:email" type="text" name="mainForm:email" value="" />
+<input id="mainForm:password" type="password" name="mainForm:password" value="" />
+<button id="mainForm:j_idt18" name="mainForm:j_idt18" type="submit" class="ui-button"><span>Sign in</span></button>
+<input type="hidden" name="javax.faces.ViewState" id="j_id1:javax.faces.ViewState:0" value="{viewstate}" autocomplete="off" />
+</form></body></html>""".encode("utf-8")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765, help="0: any free port")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    sim = Simulator(config_from_args(args), args.host, args.port).start()
+    # İlk satır load_test tarafından okunur
+    print(f"listening on {sim.url}", flush=True)
+    try:
+        while True:
+            time.sleep(60)
+            print(f"stats {json.dumps(sim.stats)}", flush=True)
+    except KeyboardInterrupt:
+        sim.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Synthetic 2DWorkflow pages for benchmarks.
+The markup mirrors what the bot parses on the live site (PrimeFaces datatable, cell editors, copy icons).
+"""
+import random
+
+_LOCATIONS = ["Austin, TX", "Reno, NV", "Newark, NJ", "Tracy, CA", "Joliet, IL", "Şişli, İstanbul"]
+
+_PAGE_HEAD = """<?xml version="1.0" encoding="UTF-8"?>
+<html xmlns="http://www.w3.org/1999/xhtml"><head>
+<title>Drafts</title>
+<script type="text/javascript">var PrimeFaces = {{}}; /* {padding} */</script>
+<style>.ui-datatable td {{ padding: 2px; }}</style>
+</head><body>
+<form id="formLogo" name="formLogo" method="post" action="/draft.jsf">
+<div id="ccFlag" class="flag"><span> {account}</span></div>
+<a id="formLogo:j_idt12" href="#" onclick="PrimeFaces.ab({{s:'formLogo:j_idt12',u:'__my_store__'}});return false;"><i class="fa fa-amazon"></i></a>
+</form>
+<form id="mainForm" name="mainForm" method="post" action="/draft.jsf" enctype="application/x-www-form-urlencoded">
+<input type="hidden" name="mainForm" value="mainForm" />
+<input id="mainForm:search" type="text" name="mainForm:search" value="" />
+<input type="checkbox" name="mainForm:showArchived" value="on" />
+<select name="mainForm:pageSize"><option value="50">50</option><option value="500" selected="selected">500</option></select>
+<div id="mainForm:drafts" class="ui-datatable ui-widget"><table role="grid">
+<thead><tr role="row"><th>Sel</th><th>Open</th><th>Name</th><th>From</th><th>A</th><th>B</th><th>C</th><th>SKUs</th><th>Units</th><th>Created</th><th>Actions</th></tr></thead>
+<tbody id="mainForm:drafts_data" class="ui-datatable-data ui-widget-content">
+"""
+
+_ROW = """<tr data-ri="{i}" data-rk="{rk}" class="ui-widget-content {parity}" role="row">
+<td role="gridcell"><div class="ui-chkbox"><input type="checkbox" name="mainForm:drafts:{i}:sel" /></div></td>
+<td role="gridcell"><a id="mainForm:drafts:{i}:j_idt95" href="/draftplan.jsf?id={draft_id}&amp;from=list" title="Open Draft Shipment" class="ui-commandlink"><i class="pi pi-external-link"></i></a></td>
+<td role="gridcell" class="ui-editable-column"><div id="mainForm:drafts:{i}:j_idt97" class="ui-cell-editor"><div class="ui-cell-editor-output">{name}</div><div class="ui-cell-editor-input"><input id="mainForm:drafts:{i}:draft_name" name="mainForm:drafts:{i}:draft_name" type="text" value="{name}" class="ui-inputfield" /></div></div></td>
+<td role="gridcell"><span title="{loc}">{loc}</span></td>
+<td role="gridcell">FBA</td>
+<td role="gridcell"><span class="ui-tag">Draft</span><!-- status --></td>
+<td role="gridcell"> </td>
+<td role="gridcell">{skus}</td>
+<td role="gridcell">{units}</td>
+<td role="gridcell">{created}</td>
+<td role="gridcell"><a id="mainForm:drafts:{i}:j_idt120" href="#" class="ui-commandlink" onclick="PrimeFaces.ab({{s:'mainForm:drafts:{i}:j_idt120'}});return false;"><span class="ui-icon pi pi-copy"></span></a><a id="mainForm:drafts:{i}:j_idt121" href="#" title="Delete"><span class="pi pi-trash"></span></a></td>
+</tr>
+"""
+
+_PAGE_TAIL = """</tbody></table></div>
+<input type="hidden" name="javax.faces.ViewState" id="j_id1:javax.faces.ViewState:0" value="{viewstate}" autocomplete="off" />
+</form>
+<script type="text/javascript">$(function(){{PrimeFaces.cw('DataTable','widget_mainForm_drafts',{{id:'mainForm:drafts'}});}});</script>
+</body></html>
+"""
+
+
+def draft_row_fields(i, rng):
+    return {
+        "i": i,
+        "rk": 100000 + i,
+        "draft_id": 500000 + i,
+        "parity": "ui-datatable-even" if i % 2 == 0 else "ui-datatable-odd",
+        "name": f"Draft {i} &amp; Co - copy" if i % 7 == 0 else f"Draft {i}",
+        "loc": rng.choice(_LOCATIONS),
+        "skus": rng.randint(1, 40),
+        "units": rng.randint(10, 4000),
+        "created": f"{rng.randint(1, 12):02d}.{rng.randint(1, 28):02d}.2026 {i // 60 % 24:02d}:{i % 60:02d}",
+    }
+
+
+def render_draft_page(rows, viewstate, account="Babil Design", padding_kb=64):
+    """draft.jsf page from row dicts (the fields of draft_row_fields, name / loc already HTML-escaped)."""
+    parts = [_PAGE_HEAD.format(padding="x" * (padding_kb * 1024), account=account)]
+    parts.extend(_ROW.format(**row) for row in rows)
+    parts.append(_PAGE_TAIL.format(viewstate=viewstate))
+    return "".join(parts).encode("utf-8")
+
+
+def draft_page(n_rows, seed=0, padding_kb=64):
+    """Full draft.jsf page with n_rows draft rows. padding_kb emulates the inline scripts of the real page."""
+    rng = random.Random(seed)
+    rows = [draft_row_fields(i, rng) for i in range(n_rows)]
+    return render_draft_page(rows, f"-{rng.getrandbits(63)}:{rng.getrandbits(63)}", padding_kb=padding_kb)
+
+
+def partial_response(updates=(), viewstate=None, redirect=None):
+    """JSF partial-response: updates is a sequence of (id, html) pairs."""
+    parts = ["<?xml version='1.0' encoding='UTF-8'?>\n<partial-response id=\"j_id1\">"]
+    if redirect:
+        parts.append(f"<redirect url=\"{redirect.replace('&', '&amp;')}\"></redirect>")
+    else:
+        parts.append("<changes>")
+        parts.extend(f"<update id=\"{update_id}\"><![CDATA[{html}]]></update>" for update_id, html in updates)
+        if viewstate:
+            parts.append(f"<update id=\"j_id1:javax.faces.ViewState:0\"><![CDATA[{viewstate}]]></update>")
+        parts.append("</changes>")
+    parts.append("</partial-response>")
+    return "".join(parts).encode("utf-8")
+
+
+_ACCOUNT_ROW = """<tr data-ri="{i}" data-rk="{rk}" class="ui-widget-content ui-datatable-selectable" role="row"><td role="gridcell"><span class="flag-icon flag-icon-us"></span></td><td role="gridcell"><input id="__my_store_form__:__my_stor_table__:{i}:store_name" type="text" value="{name}" readonly="readonly" class="ui-inputfield" /></td></tr>"""
+
+
+def account_table_response(accounts, viewstate):
+    """Partial-response of the account menu (formLogo) with (row key, name) pairs."""
+    rows = "".join(_ACCOUNT_ROW.format(i=i, rk=rk, name=name) for i, (rk, name) in enumerate(accounts))
+    table = (
+        "<div id=\"__my_store_form__:__my_stor_table__\" class=\"ui-datatable\"><table role=\"grid\"><tbody "
+        f"id=\"__my_store_form__:__my_stor_table___data\" class=\"ui-datatable-data\">{rows}</tbody></table></div>"
+    )
+    return partial_response([("__my_store_form__:__my_stor_table__", table)], viewstate)
+
+
+def account_rows(n_accounts, seed=0):
+    rng = random.Random(seed)
+    return [(str(rng.randint(10 ** 6, 10 ** 7)), f"Account {i:02d} LLC") for i in range(n_accounts)]
+
+
+_DETAIL_PAGE = """<?xml version="1.0" encoding="UTF-8"?>
+<html xmlns="http://www.w3.org/1999/xhtml"><head><title>Draft Plan</title>
+<script type="text/javascript">var PrimeFaces = {{}}; /* {padding} */</script>
+</head><body>
+<form id="formLogo" name="formLogo" method="post" action="/draftplan.jsf">
+<div id="ccFlag" class="flag"><span> {account}</span></div>
+</form>
+<form id="mainForm" name="mainForm" method="post" action="/draftplan.jsf?id={draft_id}" enctype="application/x-www-form-urlencoded">
+<input type="hidden" name="mainForm" value="mainForm" />
+<table id="mainForm:draftInfo" class="ui-datatable"><tbody><tr data-ri="0">
+<td><input id="mainForm:draftInfo:0:draft_name" name="mainForm:draftInfo:0:draft_name" type="text" value="{name}" class="ui-inputfield" /></td>
+<td><span id="mainForm:draftInfo:0:ship_from_address">{loc}</span>
+<a id="mainForm:draftInfo:0:ship_from_address_edit" href="#" title="Change 'Ship From' address" class="ui-commandlink"><i class="pi pi-pencil"></i></a></td>
+<td>{skus} SKUs / {units} units</td></tr></tbody></table>
+<script id="mainForm:j_idt310" type="text/javascript">updateAddress = function() {{PrimeFaces.ab({{s:"mainForm:j_idt310",f:"mainForm",u:"mainForm:draftInfo"}});return false;}}</script>
+<script id="mainForm:onPlanShippingJobComplete" type="text/javascript">onPlanShippingJobComplete = function() {{PrimeFaces.ab({{s:"mainForm:onPlanShippingJobComplete"}});}}</script>
+{items}
+<button id="mainForm:create_plan" name="mainForm:create_plan" type="button" class="ui-button"><span class="ui-button-text">Create Plan</span></button>
+<div id="mainForm:shipmentPlansPanel" class="ui-outputpanel"></div>
+<input type="hidden" name="javax.faces.ViewState" id="j_id1:javax.faces.ViewState:0" value="{viewstate}" autocomplete="off" />
+</form>
+</body></html>
+"""
+
+_DETAIL_ITEM = """<input type="hidden" name="mainForm:items:{i}:sku" value="SKU-{draft_id}-{i}" /><input type="text" name="mainForm:items:{i}:qty" value="{qty}" />"""
+
+
+def draft_detail_page(draft_id, name, loc, viewstate, account="Babil Design", skus=5, units=100, padding_kb=32):
+    """draftplan.jsf?id=... page: name input, ship-from address, create plan button and item inputs."""
+    items = "".join(_DETAIL_ITEM.format(i=i, draft_id=draft_id, qty=units // max(1, skus)) for i in range(skus))
+    return _DETAIL_PAGE.format(draft_id=draft_id, name=name, loc=loc, viewstate=viewstate, account=account,
+                               skus=skus, units=units, items=items,
+                               padding="x" * (padding_kb * 1024)).encode("utf-8")
+
+
+_WAREHOUSES = ["ONT8", "LGB8", "SBD1", "PHX7", "MDW2", "IND9", "ABE8", "TEB9", "SWF2", "RDU1", "CLT2", "FTW1"]
+
+_PLAN_HEAD = """<div id="mainForm:shipmentPlansPanel" class="ui-outputpanel"><div id="mainForm:plans" class="ui-datatable">
+<table role="grid"><thead><tr><th>#</th><th>Shipment</th><th>Destination</th><th>Distance</th><th>Units</th></tr></thead>
+<tbody id="mainForm:plans_data" class="ui-datatable-data ui-widget-content">
+"""
+
+_PLAN_GROUP = """<tr class="ui-widget-header ui-rowgroup-header" role="row"><td colspan="5"><span class="plan-title">{option}</span></td></tr>
+"""
+
+_PLAN_ROW = """<tr data-ri="{i}" class="ui-widget-content" role="row"><td role="gridcell">{i}</td><td role="gridcell"><span>FBA{shipment}</span></td><td role="gridcell"><span title="{wh}">{wh}:{city}</span></td><td role="gridcell"><span class="dist">{dist}</span></td><td role="gridcell">{units}</td></tr>
+"""
+
+
+def plan_response(n_options, rows_per_option, seed=0, padding_kb=128, bad_every=0):
+    """
+    Partial-response of the onPlanShippingJobComplete call with n_options plan options.
+    The box content panel is padded with padding_kb of markup like the real reply.
+    bad_every: every n-th row gets an unreadable distance ("- mi").
+    """
+    rng = random.Random(seed)
+    parts = [_PLAN_HEAD]
+    i = 0
+    for o in range(n_options):
+        option = "Amazon Optimized Splits" if o == 0 else f"Option {o}: {rng.randint(1, 6)} shipments"
+        parts.append(_PLAN_GROUP.format(option=option))
+        for _ in range(rows_per_option):
+            dist = "- mi" if bad_every and i % bad_every == bad_every - 1 else f"{rng.randint(20, 2900):,} mi"
+            parts.append(_PLAN_ROW.format(i=i, shipment=rng.getrandbits(32), wh=rng.choice(_WAREHOUSES),
+                                          city=rng.choice(_LOCATIONS), dist=dist, units=rng.randint(1, 500)))
+            i += 1
+    parts.append("</tbody></table></div></div>")
+    box = "<div id=\"mainForm:a2dw_boxContentPanel\">" + "<div class=\"box\"><span>box</span></div>" * (padding_kb * 1024 // 40) + "</div>"
+    return (
+        "<?xml version='1.0' encoding='UTF-8'?>\n<partial-response id=\"j_id1\"><changes>"
+        f"<update id=\"mainForm:shipmentPlansPanel\"><![CDATA[{''.join(parts)}]]></update>"
+        f"<update id=\"mainForm:a2dw_boxContentPanel\"><![CDATA[{box}]]></update>"
+        "<update id=\"messagesPrepDetails\"><![CDATA[<div id=\"messagesPrepDetails\"></div>]]></update>"
+        f"<update id=\"j_id1:javax.faces.ViewState:0\"><![CDATA[-{rng.getrandbits(63)}:{rng.getrandbits(63)}]]></update>"
+        "</changes></partial-response>"
+    ).encode("utf-8")
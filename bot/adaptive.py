@@ -0,0 +1,112 @@
+import heapq
+import itertools
+import random
+import threading
+import time
+
+
+class AdaptiveSchedule:
+    """
+    Per-draft next check times for scheduler_mode "adaptive" (min-heap of (next_check, seq, draft_id)).
+
+    After every check a draft's interval (minutes) is adjusted within [min_interval, max_interval]:
+    - new warehouse found / copied: back to min_interval
+    - near miss (closest new warehouse under limit × (1 + near_miss_ratio)): interval / backoff
+    - nothing close: interval × backoff (exponential backoff for stale drafts)
+    - error (no plan results): interval unchanged
+    New drafts start at the scheduler's base interval and are due immediately.
+    """
+
+    def __init__(self, min_interval=5, max_interval=240, near_miss_ratio=0.25, backoff=2.0, jitter=0.1):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.near_miss_ratio = near_miss_ratio
+        self.backoff = backoff
+        self.jitter = jitter  # aynı anda eklenen taslaklar aynı dakikaya yığılmasın
+        self._heap = []
+        self._state = {}  # draft_id -> {"interval", "next_check", "reason", "best_mile", "checks"}
+        self._observed = {}  # draft_id -> (best_mile, limit) of the last analizi_yap
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def _clamp(self, interval):
+        return min(self.max_interval, max(self.min_interval, interval))
+
+    def _push(self, draft_id, state, now):
+        factor = 1 + random.uniform(-self.jitter, self.jitter)
+        state["next_check"] = now + state["interval"] * 60 * factor
+        heapq.heappush(self._heap, (state["next_check"], next(self._seq), draft_id))
+
+    def sync(self, draft_ids, base_interval):
+        """Adds new watch-list drafts (due now) and forgets removed ones."""
+        now = time.time()
+        with self._lock:
+            for draft_id in list(self._state):
+                if draft_id not in draft_ids:
+                    del self._state[draft_id]
+            for draft_id in draft_ids:
+                if draft_id not in self._state:
+                    state = {"interval": self._clamp(base_interval), "next_check": now, "reason": "yeni",
+                             "best_mile": None, "checks": 0}
+                    self._state[draft_id] = state
+                    heapq.heappush(self._heap, (now, next(self._seq), draft_id))
+
+    def pop_due(self, limit, now=None):
+        """Up to limit due drafts, most overdue first. They stay out of the heap until record()."""
+        now = time.time() if now is None else now
+        due = []
+        with self._lock:
+            while self._heap and len(due) < limit:
+                next_check, _, draft_id = self._heap[0]
+                state = self._state.get(draft_id)
+                if state is None or state["next_check"] != next_check:
+                    heapq.heappop(self._heap)  # silinmiş / yeniden planlanmış eski kayıt
+                    continue
+                if next_check > now:
+                    break
+                heapq.heappop(self._heap)
+                state["next_check"] = None
+                self._observed.pop(draft_id, None)
+                due.append(draft_id)
+        return due
+
+    def observe(self, draft_id, best_mile, limit_mile):
+        """Called by analizi_yap: closest mileage to a not yet found warehouse (None: no candidate)."""
+        with self._lock:
+            if draft_id in self._state:  # planlanmayan taslaklar birikmesin
+                self._observed[draft_id] = (best_mile, limit_mile)
+
+    def record(self, draft_id, outcome, new_draft_id=None):
+        """
+        outcome: "stop" (target found, draft leaves the list), "found" (new warehouse, copied
+        as new_draft_id) or None (no opportunity / error).
+        """
+        now = time.time()
+        with self._lock:
+            state = self._state.pop(draft_id, None)
+            observed = self._observed.pop(draft_id, None)
+            if state is None or outcome == "stop":
+                return
+            state["checks"] += 1
+            if observed is not None:
+                state["best_mile"] = observed[0]
+            if outcome == "found":
+                state["interval"], state["reason"] = self.min_interval, "yeni depo"
+            elif observed is None:
+                state["reason"] = "sonuç alınamadı"
+            else:
+                best_mile, limit_mile = observed
+                if best_mile is not None and best_mile <= limit_mile * (1 + self.near_miss_ratio):
+                    state["interval"], state["reason"] = state["interval"] / self.backoff, "yakın"
+                else:
+                    state["interval"], state["reason"] = state["interval"] * self.backoff, "sonuç yok"
+            state["interval"] = self._clamp(state["interval"])
+            key = new_draft_id or draft_id
+            self._state[key] = state
+            self._push(key, state, now)
+
+    def snapshot(self):
+        """Rows for the UI, earliest next check first."""
+        with self._lock:
+            rows = [{"draft_id": draft_id, **state} for draft_id, state in self._state.items()]
+        return sorted(rows, key=lambda r: r["next_check"] or 0)
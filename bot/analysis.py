@@ -1,11 +1,69 @@
-from bs4 import BeautifulSoup
 import re
 
+import numpy as np
+import pandas as pd
+
+from bot.jsf import JsfPage, find, find_all
+from bot.parsers import lxml_text
 from bot.notify import teams_bildirim_gonder
 
+PLAN_COLUMNS = ["option", "dest", "dist"]
+
+_INT_RE = r"[+-]?\d+"
+
+
+def _plans_tbody(page):
+    """tbody[id*=plans] of the reply; only the shipmentPlansPanel block is parsed when present."""
+    plans_update = page.find_update("shipmentPlansPanel")
+    pages = ([page.update_page(plans_update)] if plans_update else []) + [page]
+    for candidate in pages:
+        tbody = find(candidate.root, "tbody", id=lambda x: x and "plans" in x)
+        if tbody is not None:
+            return tbody
+    return None
+
+
+def plan_tablosu(page):
+    """
+    Plan results table as a DataFrame, one row per destination:
+        option - plan option (text of the last ui-rowgroup-header row)
+        dest   - destination code (upper case, part before ':')
+        dist   - raw distance text, e.g. "1,234 mi"
+        miles  - dist as int64 (only valid where mil_ok)
+        mil_ok - False where the distance could not be read as an integer
+    Returns None when the reply has no plans table.
+    """
+    if not isinstance(page, JsfPage):
+        page = JsfPage(page)
+    tbody = _plans_tbody(page)
+    if tbody is None:
+        return None
+
+    rows = []
+    current_option = "Bilinmiyor"
+    for row in find_all(tbody, "tr"):
+        if "ui-rowgroup-header" in (row.get("class") or "").split():
+            current_option = lxml_text(row)
+            continue
+        cells = list(find_all(row, "td"))
+        if len(cells) > 3:
+            dist_text = lxml_text(cells[3])
+            if "mi" in dist_text:
+                rows.append((current_option, lxml_text(cells[2]), dist_text))
+
+    df = pd.DataFrame(rows, columns=PLAN_COLUMNS)
+    df["dest"] = df["dest"].str.upper().str.split(":").str[0]
+    mil_text = df["dist"].str.replace("mi", "", regex=False).str.replace(",", "", regex=False).str.strip()
+    df["mil_ok"] = mil_text.str.fullmatch(_INT_RE).fillna(False).astype(bool)
+    df["miles"] = pd.to_numeric(mil_text.where(df["mil_ok"], "0")).astype(np.int64)
+    df["mil_text"] = mil_text
+    return df
+
+
 def analizi_yap(mgr, xml_response, draft_item):
 
     """
+    xml_response: JsfPage of the plan results reply (or its raw text).
     Returns:
     - True: Opportunity found (Copy)
     - False: Continue waiting
@@ -13,72 +71,73 @@ def analizi_yap(mgr, xml_response, draft_item):
     """
 
     mgr.add_log("📊 Sonuçlar analiz ediliyor...")
-    
+
     draft_name = draft_item.get('name', 'Bilinmiyor')
-    limit_mile = draft_item.get('max_mile', mgr.mile_threshold)
+    limit_mile = draft_item.get('max_mile')
+    if limit_mile is None or pd.isna(limit_mile):
+        # Tabloda boş bırakılan Max Mil: genel sınır geçerli
+        limit_mile = mgr.mile_threshold
     target_warehouses_str = draft_item.get('targets', "")
     known_warehouses = draft_item.get('found_warehouses', [])
 
-    html_parts = re.findall(r'<!\[CDATA\[(.*?)]]>', xml_response, re.DOTALL)
-    full_html = "".join(html_parts)
-    soup = BeautifulSoup(full_html, 'html.parser')
-    
-    plans_table = soup.find("tbody", id=lambda x: x and "plans" in x)
-    if not plans_table: return False
-
-    rows = plans_table.find_all("tr")
-    current_option = "Bilinmiyor"
+    df = plan_tablosu(xml_response)
+    if df is None: return False
 
     target_list = [t.strip().upper() for t in target_warehouses_str.split(',') if t.strip()]
     previously_found = set(k.upper() for k in known_warehouses)
-    
+
+    # --- Kurallar tüm satırlara tek seferde uygulanır ---
+    ok = df["mil_ok"].to_numpy()
+    aktif = ok & ~df["option"].str.contains("Amazon Optimized", regex=False).to_numpy()
+    if target_list:
+        hedef = aktif & df["dest"].str.contains("|".join(map(re.escape, target_list))).to_numpy()
+    else:
+        hedef = np.zeros(len(df), dtype=bool)
+    uygun = aktif & ~hedef & (df["miles"].to_numpy() < limit_mile)
+    bilinen = df["dest"].isin(previously_found).to_numpy()
+
+    # Uyarlamalı zamanlama için henüz bulunmamış depolara en yakın mesafe (bot/adaptive.py)
+    adaptive = getattr(mgr, "adaptive", None)
+    if adaptive is not None and getattr(mgr, "scheduler_mode", None) == "adaptive":
+        adaylar = df["miles"].to_numpy()[aktif & ~hedef & ~bilinen]
+        adaptive.observe(draft_item.get("draft_id"), float(adaylar.min()) if len(adaylar) else None, limit_mile)
+
+    # İlk hedef satırından sonrası değerlendirilmez (STOP)
+    hedef_idx = np.flatnonzero(hedef)
+    son = hedef_idx[0] if len(hedef_idx) else len(df)
+
     bulunan_firsatlar = {} # Dictionary to store merged results
     firsat_sayisi = 0
     found_new = {"found_new": []}
 
-    for row in rows:
-        if "ui-rowgroup-header" in row.get("class", []):
-            current_option = row.get_text(strip=True)
+    # Sadece log/sonuç üreten satırlar sırayla gezilir
+    for i in np.flatnonzero((uygun | ~ok)[:son]):
+        if not ok[i]:
+            mgr.add_log(f"Analiz hatasi: mesafe okunamadı {df['mil_text'].iat[i]!r}")
             continue
-            
-        cells = row.find_all("td")
-        if len(cells) > 3:
-            dist_text = cells[3].get_text(strip=True)
-            if "mi" in dist_text:
-                try:
-                    mil = int(dist_text.replace("mi", "").replace(",", "").strip())
-                    dest = cells[2].get_text(strip=True).upper()
-                    dest = dest.split(":")[0]
-                    
-                    if "Amazon Optimized" in current_option: continue
-                    
-                    # --- PRIORITY 1: TARGET WAREHOUSE (STOP CONDITION) ---
-                    if any(target in dest for target in target_list):
-                        mgr.add_log(f"🎯 HEDEF DEPO BULUNDU! ({dest}) - Takip Bitiyor.", "success")
-                        teams_bildirim_gonder(
-                            mgr=mgr,
-                            title="🎯 Hedef Depo Yakalandı!",
-                            message=f"**{draft_name}** için hedef depo (**{dest}**) bulundu. Takip listesinden çıkarılıyor.",
-                            status="success",
-                            facts={"Depo": dest, "Mesafe": f"{mil} Mil", "Plan": current_option}
-                        )
-                        return {"found_target": [{dest:mil}]} # Special signal to STOP
-                    
-                    # --- PRIORITY 2: MILE LIMIT (COPY CONDITION) ---
-                    elif mil < limit_mile:
-                        if dest in previously_found:
-                            print(f"Skipping {dest} (Already copied)")
-                            mgr.add_log(f"Skipping {dest} (Already copied)")
-                            found_new["found_new"].append({dest: mil})
-                            continue
-                        mgr.add_log(f"✅ MESAFE UYGUN: {mil} Mil ({dest})", "success")
-                        firsat_sayisi += 1
-                        bulunan_firsatlar[current_option] = f"{mil} Mil ➡️ {dest}"
-                        found_new["found_new"].append({dest: mil})
-
-                except Exception as e: 
-                    mgr.add_log(f"Analiz hatasi: {e}")
-                    pass
+        dest, mil = df["dest"].iat[i], int(df["miles"].iat[i])
+        if bilinen[i]:
+            print(f"Skipping {dest} (Already copied)")
+            mgr.add_log(f"Skipping {dest} (Already copied)")
+            found_new["found_new"].append({dest: mil})
+            continue
+        mgr.add_log(f"✅ MESAFE UYGUN: {mil} Mil ({dest})", "success")
+        firsat_sayisi += 1
+        bulunan_firsatlar[df["option"].iat[i]] = f"{mil} Mil ➡️ {dest}"
+        found_new["found_new"].append({dest: mil})
+
+    # --- PRIORITY 1: TARGET WAREHOUSE (STOP CONDITION) ---
+    if son < len(df):
+        dest, mil, current_option = df["dest"].iat[son], int(df["miles"].iat[son]), df["option"].iat[son]
+        mgr.add_log(f"🎯 HEDEF DEPO BULUNDU! ({dest}) - Takip Bitiyor.", "success")
+        teams_bildirim_gonder(
+            mgr=mgr,
+            title="🎯 Hedef Depo Yakalandı!",
+            message=f"**{draft_name}** için hedef depo (**{dest}**) bulundu. Takip listesinden çıkarılıyor.",
+            status="success",
+            facts={"Depo": dest, "Mesafe": f"{mil} Mil", "Plan": current_option}
+        )
+        return {"found_target": [{dest:mil}]} # Special signal to STOP
 
     # --- SEND SINGLE NOTIFICATION ---
     if bulunan_firsatlar:
@@ -92,4 +151,3 @@ def analizi_yap(mgr, xml_response, draft_item):
         return found_new
 
     return False
-
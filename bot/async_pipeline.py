@@ -0,0 +1,244 @@
+import asyncio
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+import urllib.parse
+
+import httpx
+
+from bot.constants import (
+    BASE_URL,
+    DRAFT_PAGE_URL,
+    PLAN_URL,
+)
+from bot.jsf import JsfPage, onay_adimini_bul
+from bot.analysis import analizi_yap
+from bot.drafts import (
+    html_tabloyu_parse_et,
+    drafti_kopyala,
+    CREATE_PLAN_PARAMS,
+    PLAN_COMPLETE_PARAMS,
+)
+from bot.logbuffer import log_tag
+from bot.metrics import InstrumentedAsyncTransport
+from bot.sse import job_dispatcher
+from bot.stagger import account_delay
+from bot.tracing import span
+from bot.workers import get_account_worker
+
+# Async engine for the draft planning pipeline (same steps as drafti_planla_backend).
+# Waiting on the server (create_plan, SSE, plan results) happens on one event loop, so a
+# draft in flight costs a coroutine instead of an OS thread. The httpx client shares the
+# cookie jar of the account's requests.Session: login and the rare copy workflow stay on
+# the sync code and run in a worker thread.
+
+
+def async_client(ctx):
+    return httpx.AsyncClient(
+        cookies=ctx.session.cookies,
+        headers={"User-Agent": ctx.session.headers["User-Agent"]},
+        follow_redirects=True,
+        timeout=httpx.Timeout(45, connect=10),
+        transport=InstrumentedAsyncTransport(
+            ctx.http_metrics,
+            # retries: only failed connects (httpx never repeats a sent request)
+            httpx.AsyncHTTPTransport(limits=httpx.Limits(max_connections=ctx.async_max_inflight * 2), retries=2),
+        ),
+    )
+
+
+async def get_list_page(ctx, client):
+    prefetched = ctx.broker.take_list_page(ctx.current_account_id, ctx.warmup_lead + 60)
+    if prefetched is not None:
+        return prefetched  # cron ön ısıtmasının çektiği sayfa (requests yanıtı, JsfPage ikisini de okur)
+    seen = ctx.broker.generation
+    res = await client.get(DRAFT_PAGE_URL)
+    if "login.jsf" in str(res.url):
+        # Aynı anda düşen coroutine'ler tek bir login'i bekler
+        if await asyncio.to_thread(ctx.broker.relogin, seen):
+            res = await client.get(DRAFT_PAGE_URL)
+    elif res.status_code < 400:
+        ctx.broker.touch()
+    return res
+
+
+async def auto_resolve_jsf_states_async(client, initial_res, current_url, max_depth=5):
+    current_res = initial_res
+    depth = 0
+    while depth < max_depth:
+        final_payload = onay_adimini_bul(JsfPage.from_response(current_res))
+        if final_payload is None:
+            break
+        current_res = await client.post(current_url, data=final_payload, headers={"Referer": current_url})
+        depth += 1
+
+    if depth >= max_depth:
+        print("[!] Otonom Çözücü Hata: Maksimum derinliğe ulaşıldı, sonsuz döngü riski.")
+    return current_res, depth
+
+
+async def drafti_planla_async(ctx, client, draft_item, list_page=None):
+    """
+    Async twin of drafti_planla_backend, same return values.
+    list_page: JsfPage of the account's draft list, fetched once per sweep; fetched here when None.
+    """
+    target_id = draft_item['draft_id']
+    draft_name = draft_item['name']
+    waiter = None
+    try:
+        # 1. Draft Aç
+        ctx.add_log(f"İşlem başladı: {draft_name}", "info")
+        with span("list_fetch"):
+            if list_page is None:
+                list_page = JsfPage.from_response(await get_list_page(ctx, client))
+            list_df = html_tabloyu_parse_et(ctx, list_page)
+
+        target_row = list_df[list_df["Draft Id"] == target_id] if not list_df.empty else list_df
+        if target_row.empty:
+            ctx.add_log(f"⚠️ {draft_name} listede bulunamadı! (Tarih eşleşmedi)", "warning")
+            return None
+        redirect_url = urllib.parse.urljoin(BASE_URL, target_row.iloc[0]["Link"])
+
+        # 2. Planlama
+        ctx.add_log(f"🚀 Planlama baslatiliyor")
+        with span("detail_get"):
+            detay_res = await client.get(redirect_url)
+            detay_form_data = JsfPage.from_response(detay_res).form_data
+
+        # Job events of every draft of this session arrive on one shared SSE stream
+        waiter = job_dispatcher(ctx).expect(draft_id=target_id)
+        with span("create_plan"):
+            res_plan = await client.post(PLAN_URL, data={**detay_form_data, **CREATE_PLAN_PARAMS}, headers={"Referer": redirect_url})
+
+        if "ui-messages-error" in res_plan.text:
+            ctx.add_log("Planlama hatası.", "error")
+            return None
+
+        with span("auto_resolve") as s:
+            res_plan, resolved_count = await auto_resolve_jsf_states_async(client, res_plan, redirect_url)
+            if s is not None: s.attrs["resolved"] = resolved_count
+        plan_vs = JsfPage.from_response(res_plan).viewstate
+        if plan_vs:
+            detay_form_data["javax.faces.ViewState"] = plan_vs
+
+        # 3. SSE + sonuç tablosu
+        try:
+            try:
+                with span("sse_wait"):
+                    await waiter.wait(ctx.plan_job_timeout)
+                ctx.add_log("🟢 SSE Akışı Tamamlandı.", "success")
+            except (asyncio.TimeoutError, ConnectionError) as e:
+                # Sunucudaki iş boşa gitmesin: sonuç tablosu yine de istenir
+                ctx.add_log(f"⚠️ SSE beklenemedi ({e or 'zaman aşımı'}), sonuçlar doğrudan kontrol ediliyor.", "warning")
+            with span("plan_complete"):
+                res_results = await client.post(redirect_url, data={**detay_form_data, **PLAN_COMPLETE_PARAMS}, headers={"Referer": redirect_url})
+                results_page = JsfPage.from_response(res_results)
+
+            if not results_page.find_update("shipmentPlansPanel"):
+                ctx.add_log(f"❌ Sonuç XML'i alınamadı veya hatalı. Sunucu yanıtı reddetti.", "error")
+                return None
+
+            # analizi_yap may post a Teams card, keep it off the event loop
+            with span("analizi_yap"):
+                sonuc = await asyncio.to_thread(analizi_yap, ctx, results_page, draft_item)
+
+            if isinstance(sonuc, dict) and "found_target" in sonuc:
+                ctx.add_log(f"🏁 {draft_name}: Hedef depo bulunduğu için işlem sonlandırıldı.", "success")
+                return {"STOP": sonuc["found_target"]}
+
+            elif isinstance(sonuc, dict) and 'found_new' in sonuc:
+                found_wh = sonuc['found_new']
+                with span("drafti_kopyala"):
+                    yeni_draft_verisi = await asyncio.to_thread(drafti_kopyala, ctx, target_id, list_page)
+                if yeni_draft_verisi:
+                    yeni_draft_verisi['newly_found_warehouse'] = found_wh
+                    ctx.add_log(f"🔄 {draft_name} kopyalandı ({found_wh}).", "success")
+                    return yeni_draft_verisi
+
+            ctx.add_log(f"{draft_name} tamamlandı, fırsat yok.", "warning")
+            return None
+
+        except Exception as e:
+            ctx.add_log(f"İşlem beklenirken hata oluştu: {str(e) or type(e).__name__}", "error")
+            return None
+
+    except Exception:
+        ctx.add_log(f"Hata ({draft_name}): {traceback.format_exc()}", "error")
+        return None
+
+    finally:
+        if waiter is not None:
+            waiter.cancel()
+
+
+@asynccontextmanager
+async def draft_slot_async(mgr, slot_pool):
+    """
+    Global draft slot shared with the other users (bot/execution.py). The blocking acquire
+    waits on slot_pool's threads, not the default executor, so waiting drafts never block
+    the to_thread calls (relogin, copy) of drafts that already hold a slot.
+    """
+    slots = mgr.execution.slots
+    acquired = asyncio.get_running_loop().run_in_executor(slot_pool, slots.acquire, mgr.email, getattr(mgr, "weight", 1))
+    try:
+        await asyncio.shield(acquired)
+    except asyncio.CancelledError:
+        # İptal edilen bekleyiş slotu sonradan alırsa geri bırakılır
+        acquired.add_done_callback(lambda f: f.cancelled() or f.exception() or slots.release(mgr.email))
+        raise
+    try:
+        yield
+    finally:
+        slots.release(mgr.email)
+
+
+async def _hesap_sweep(mgr, acc_id, acc_name, items, global_limit, on_result, slot_pool):
+    await asyncio.sleep(account_delay(mgr, acc_id))  # staggered account start in cron modes
+    ctx = get_account_worker(mgr, acc_id, acc_name, slot=0)
+    if not await asyncio.to_thread(ctx.ensure_account):
+        mgr.add_log(f"❌ {acc_name}: hesaba geçilemedi, {len(items)} taslak atlandı.", "error")
+        return
+
+    account_limit = asyncio.Semaphore(max(1, mgr.get_account_concurrency(acc_id)))
+    async with async_client(ctx) as client:
+        # The list page is fetched once per account instead of once per draft
+        list_page = JsfPage.from_response(await get_list_page(ctx, client))
+
+        async def run(item):
+            # Hesap sırası önce: global slotu sadece hemen çalışabilecek taslak tutar
+            async with account_limit, global_limit, draft_slot_async(mgr, slot_pool):
+                if not mgr.is_running:
+                    return
+                # Each gather() task has its own context copy, tags don't leak between drafts
+                log_tag.set(item.get('name'))
+                with mgr.tracer.trace(item['draft_id'], item.get('name'), mode="async"):
+                    sonuc = await drafti_planla_async(ctx, client, item, list_page)
+                on_result(mgr, item, sonuc)
+
+        await asyncio.gather(*(run(item) for item in items))
+
+
+async def async_sweep(mgr, sorted_tasks, on_result):
+    """Runs the whole watch list on the current event loop. on_result(mgr, item, sonuc) applies each result."""
+    groups = {}
+    for item in sorted_tasks:
+        acc_id = item.get('account_id')
+        groups.setdefault(acc_id, (item.get('account_name', 'Bilinmiyor'), []))[1].append(item)
+
+    global_limit = asyncio.Semaphore(max(1, mgr.async_max_inflight))
+    # global_limit içinde beklenir: aynı anda en fazla async_max_inflight bekleyen thread
+    with ThreadPoolExecutor(max_workers=max(1, mgr.async_max_inflight), thread_name_prefix="draft-slot") as slot_pool:
+        results = await asyncio.gather(
+            *(_hesap_sweep(mgr, acc_id, acc_name, items, global_limit, on_result, slot_pool)
+              for acc_id, (acc_name, items) in groups.items()),
+            return_exceptions=True,
+        )
+    for result in results:
+        if isinstance(result, Exception):
+            mgr.add_log(f"🔥 Async sweep hatası: {result}", "error")
+
+
+def run_async_sweep(mgr, sorted_tasks, on_result):
+    """Sync wrapper for the scheduler thread."""
+    asyncio.run(async_sweep(mgr, sorted_tasks, on_result))
+
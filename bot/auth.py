@@ -1,8 +1,8 @@
-from bs4 import BeautifulSoup
 import requests
 import re
 
-from bot.jsf import form_verilerini_topla
+from bot.jsf import JsfPage, find
+from bot.parsers import lxml_text
 from bot.constants import (
     LOGIN_URL,
     DRAFT_PAGE_URL,
@@ -17,14 +17,13 @@ def login(mgr):
         mgr.session.cookies.clear()
 
         res = mgr.session.get(LOGIN_URL)
-        soup = BeautifulSoup(res.text, 'html.parser')
-        view_state_input = soup.find("input", {"name": "javax.faces.ViewState"})
-        button_id = soup.find("button").get("id")
+        page = JsfPage.from_response(res)
+        view_state = page.viewstate
+        button_id = page.find("button").get("id")
 
-        if not view_state_input:
+        if view_state is None:
             print("HATA: Login sayfasında ViewState bulunamadı.")
             return False
-        view_state = view_state_input.get('value')
 
         payload = {
             "mainForm": "mainForm",
@@ -66,15 +65,15 @@ def fetch_accounts_backend(mgr, current_url=DRAFT_PAGE_URL):
             print("Login gerekli.")
             return False
 
-        soup_page = BeautifulSoup(res_page.text, 'html.parser')
+        page = JsfPage.from_response(res_page)
         
         # Sayfanın tepesindeki bayrak/isim alanını bul (id="ccFlag")
         active_account_name = "Bilinmiyor"
-        cc_flag_div = soup_page.find("div", id="ccFlag")
+        cc_flag_div = page.find("div", id="ccFlag")
         
-        if cc_flag_div:
+        if cc_flag_div is not None:
             # Span içindeki texti al (örn: " Babil Design")
-            span_text = cc_flag_div.get_text(strip=True)
+            span_text = lxml_text(cc_flag_div)
             if span_text:
                 active_account_name = span_text
                 mgr.current_account_name = active_account_name
@@ -84,19 +83,18 @@ def fetch_accounts_backend(mgr, current_url=DRAFT_PAGE_URL):
 
         # --- ADIM 2: HESAP LİSTESİNİ ÇEK (POST İSTEĞİ) ---
         # Menu butonuna basıp listeyi alıyoruz
-        form_data = form_verilerini_topla(res_page.text)
         menu_btn_id = None
         
         # Strategy B: Fallback to onclick content if A fails
         if not menu_btn_id:
-            link = soup_page.find("a", onclick=re.compile(r"__my_store__"))
-            if link: menu_btn_id = link.get("id")
+            link = page.find("a", onclick=re.compile(r"__my_store__"))
+            if link is not None: menu_btn_id = link.get("id")
 
         # Strategy A: Look for Amazon Icon
-        icon = soup_page.find("i", class_="fa-amazon")
-        if icon:
-            parent = icon.find_parent("a")
-            if parent: menu_btn_id = parent.get("id")
+        icon = page.find("i", class_="fa-amazon")
+        if icon is not None:
+            parent = next(icon.iterancestors("a"), None)
+            if parent is not None: menu_btn_id = parent.get("id")
             
         if not menu_btn_id:
             print("❌ Could not find the Account Menu button ID.")
@@ -109,45 +107,20 @@ def fetch_accounts_backend(mgr, current_url=DRAFT_PAGE_URL):
             "javax.faces.partial.render": "__my_store_form__:__my_stor_table__",
             menu_btn_id: menu_btn_id,
             "formLogo": "formLogo",
-            "javax.faces.ViewState": form_data.get("javax.faces.ViewState", "")
+            "javax.faces.ViewState": page.form_data.get("javax.faces.ViewState", "")
         }
         
         res_menu = mgr.session.post(current_url, data=payload)
         
         # XML Parse
-        outer_soup = BeautifulSoup(res_menu.text, 'xml')
-        update_tag = outer_soup.find('update', {'id': '__my_store_form__:__my_stor_table__'})
-        
-        if not update_tag:
+        new_accounts_list = hesap_tablosunu_parse_et(JsfPage.from_response(res_menu), active_account_name)
+        if new_accounts_list is None:
             print("Hesap tablosu XML içinde bulunamadı.")
             return False
 
-        inner_html = update_tag.text
-        inner_soup = BeautifulSoup(inner_html, 'html.parser')
-        rows = inner_soup.find_all("tr", attrs={"data-rk": True})
-        
-        new_accounts_list = []
-        
-        for row in rows:
-            rk_id = row['data-rk']
-            
-            # İsmi input değerinden al
-            name_input = row.find("input", id=lambda x: x and "store_name" in x)
-            name = name_input['value'] if name_input else row.get_text(strip=True)
-            
-            # --- AKTİFLİK KONTROLÜ ---
-            # Tablodaki isim ile yukarıda bulduğumuz aktif isim aynı mı?
-            # (Küçük/büyük harf duyarlılığını kaldırmak için .strip() kullanıyoruz)
-            is_active = (name.strip() == active_account_name.strip())
-            if is_active:
-                mgr.current_account_id = rk_id
-            new_accounts_list.append({
-                "id": rk_id,
-                "name": name,
-                "flag": "🇺🇸", 
-                "is_active": is_active
-            })
-            
+        for account in new_accounts_list:
+            if account["is_active"]:
+                mgr.current_account_id = account["id"]
         mgr.available_accounts = new_accounts_list
         return True
 
@@ -155,10 +128,48 @@ def fetch_accounts_backend(mgr, current_url=DRAFT_PAGE_URL):
         print(f"Hesap çekme hatası: {e}")
         return False
 
+def hesap_tablosunu_parse_et(menu_page, active_account_name):
+    """
+    Account menu partial-response -> [{"id", "name", "flag", "is_active"}], None if the table is missing.
+    menu_page: JsfPage (or the raw response body).
+    """
+    if not isinstance(menu_page, JsfPage):
+        menu_page = JsfPage(menu_page)
+    table_page = menu_page.update_page('__my_store_form__:__my_stor_table__')
+    if table_page is None:
+        return None
+
+    accounts = []
+    for row in table_page.find_all("tr", **{"data-rk": True}):
+        rk_id = row.get('data-rk')
+
+        # İsmi input değerinden al
+        name_input = find(row, "input", id=lambda x: x and "store_name" in x)
+        name = name_input.attrib['value'] if name_input is not None else lxml_text(row)
+
+        # --- AKTİFLİK KONTROLÜ ---
+        # Tablodaki isim ile yukarıda bulduğumuz aktif isim aynı mı?
+        # (Küçük/büyük harf duyarlılığını kaldırmak için .strip() kullanıyoruz)
+        accounts.append({
+            "id": rk_id,
+            "name": name,
+            "flag": "🇺🇸",
+            "is_active": name.strip() == active_account_name.strip()
+        })
+    return accounts
+
 def switch_account_backend(mgr, account_rk, current_url=DRAFT_PAGE_URL):
     """
     Switches the account using the row key (data-rk).
     """
+    try:
+        with mgr.broker.account_context(timeout=mgr.ui_lock_timeout):
+            return _switch_account(mgr, account_rk, current_url)
+    except TimeoutError as e:
+        mgr.add_log(f"Switch error: {e}", "error")
+        return False
+
+def _switch_account(mgr, account_rk, current_url):
     try:
         mgr.add_log("Hesap değiştiriliyor...", "info")
         
@@ -168,7 +179,7 @@ def switch_account_backend(mgr, account_rk, current_url=DRAFT_PAGE_URL):
         # 1. Trigger fetch again to ensure we have the latest table state/ViewState to submit
         # Or simply use the page we are on. Let's assume we are on DRAFT_PAGE_URL.
         res_page = mgr.session.get(current_url)
-        form_data = form_verilerini_topla(res_page.text)
+        form_data = JsfPage.from_response(res_page).form_data
         
         # We need to construct the specific payload for row selection
         # Note: We need to recreate the inputs for the table rows (store_name) 
@@ -196,7 +207,7 @@ def switch_account_backend(mgr, account_rk, current_url=DRAFT_PAGE_URL):
         res = mgr.session.post(current_url, data=payload)
         
         # Check for success (Look for ccFlag update which shows the new name)
-        if "update id=\"ccFlag\"" in res.text:
+        if "ccFlag" in JsfPage.from_response(res).updates:
             # Refresh accounts list to update 'active' status in our UI
             fetch_accounts_backend(mgr) 
             mgr.add_log("✅ Hesap başarıyla değiştirildi.", "success")
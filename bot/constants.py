@@ -1,5 +1,7 @@
+import os
 
-BASE_URL = "https://app.2dworkflow.com"
+# TWD_BASE_URL: başka bir sunucuya yönlendirmek için (ör. benchmarks/simulator.py ile yerel test)
+BASE_URL = os.environ.get("TWD_BASE_URL", "https://app.2dworkflow.com").rstrip("/")
 
 LOGIN_URL = f"{BASE_URL}/login.jsf"
 DRAFT_PAGE_URL = f"{BASE_URL}/draft.jsf"
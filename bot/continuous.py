@@ -0,0 +1,209 @@
+import statistics
+import threading
+import time
+import traceback
+from collections import deque
+
+from bot.drafts import drafti_planla_backend
+from bot.logbuffer import log_context
+from bot.notify import teams_ozetini_gonder
+from bot.scheduler import sonucu_isle
+from bot.workers import get_account_worker
+
+
+class RollingPipeline:
+    """
+    scheduler_mode "continuous": instead of periodic sweeps, keeps mgr.continuous_inflight
+    drafts in flight all the time and starts the stalest eligible draft whenever one finishes.
+
+    - Every draft runs on an AccountSession lane (like the parallel mode); an account never
+      has more drafts in flight than its account concurrency.
+    - A draft is not planned again before mgr.continuous_min_gap minutes have passed since
+      its last check, so a short watch list doesn't hammer 2DWorkflow.
+    - stats() reports the measured throughput (drafts/hour) and per-draft staleness.
+    """
+
+    def __init__(self, mgr):
+        self.mgr = mgr
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+        self._inflight = {}  # draft_id -> (account_id, slot, started)
+        self._busy = {}  # account_id -> set of busy lane slots
+        self._last_checked = {}  # draft_id -> epoch of the last finished check
+        self._first_seen = {}  # draft_id -> epoch it entered the pipeline
+        self._done = deque(maxlen=20000)  # (finished_at, seconds) of recent drafts
+        self.started_at = None
+        self.completed = 0
+        self.errors = 0
+        self._rotation = 0
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            self._stop.clear()  # durdurulmuş ama henüz çıkmamış döngü devam eder
+            return
+        self._stop.clear()
+        self.started_at = time.time()
+        self._done.clear()
+        self._thread = threading.Thread(target=self._run, name="rolling-pipeline", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops feeding new drafts; drafts in flight finish on their own threads."""
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+
+    def _eligible(self, items, now):
+        """Returns (stalest eligible item, None) or (None, seconds until one becomes eligible)."""
+        mgr = self.mgr
+        gap = mgr.continuous_min_gap * 60
+        best, best_seen, wait = None, None, None
+        for item in items:
+            draft_id = item['draft_id']
+            if draft_id in self._inflight:
+                continue
+            acc_id = item.get('account_id')
+            if len(self._busy.get(acc_id, ())) >= mgr.get_account_concurrency(acc_id):
+                continue
+            seen = self._last_checked.get(draft_id)
+            if seen is not None and now - seen < gap:
+                remaining = gap - (now - seen)
+                wait = remaining if wait is None else min(wait, remaining)
+                continue
+            # Hiç kontrol edilmemiş taslak en bayat sayılır
+            if best is None or (seen or 0) < (best_seen or 0):
+                best, best_seen = item, seen
+        return best, wait
+
+    def _run(self):
+        mgr = self.mgr
+        mgr.load_state()
+        mgr.tracer.new_cycle()
+        mgr.add_log(f"🔁 Sürekli mod başladı (hedef {mgr.continuous_inflight} eşzamanlı taslak).", "info")
+        while not self._stop.is_set() and mgr.is_running:
+            with self._cond:
+                # Liste _cond altında okunur: kopyanın yeni id'si budamadan önce listede olur
+                with mgr.watch_list_lock:
+                    items = list(mgr.watch_list.values())
+                now = time.time()
+                for item in items:
+                    self._first_seen.setdefault(item['draft_id'], now)
+                # STOP ile ya da UI'den listeden çıkan taslaklar unutulur
+                ids = {item['draft_id'] for item in items}
+                for state in (self._last_checked, self._first_seen):
+                    for draft_id in [d for d in state if d not in ids and d not in self._inflight]:
+                        del state[draft_id]
+                if len(self._inflight) >= max(1, mgr.continuous_inflight):
+                    self._cond.wait(5)
+                    continue
+                item, wait = self._eligible(items, now)
+                if item is None:
+                    self._cond.wait(min(wait, 30) if wait is not None else 5)
+                    continue
+                acc_id = item.get('account_id')
+                busy = self._busy.setdefault(acc_id, set())
+                slot = next(i for i in range(len(busy) + 1) if i not in busy)
+                busy.add(slot)
+                self._inflight[item['draft_id']] = (acc_id, slot, now)
+            threading.Thread(target=self._run_one, args=(item, slot), name="rolling-draft", daemon=True).start()
+        mgr.add_log("⏹️ Sürekli mod durdu.", "warning")
+
+    def _run_one(self, item, slot):
+        mgr = self.mgr
+        draft_id = item['draft_id']
+        acc_id = item.get('account_id')
+        acc_name = item.get('account_name', 'Bilinmiyor')
+        started = time.time()
+        new_draft_id = None
+        ok = False
+        try:
+            worker = get_account_worker(mgr, acc_id, acc_name, slot)
+            # Diğer kullanıcılarla paylaşılan taslak slotu (bot/execution.py)
+            with mgr.execution.draft_slot(mgr):
+                if not worker.ensure_account():
+                    mgr.add_log(f"❌ {acc_name}: hesaba geçilemedi, taslak atlandı ({item['name']}).", "error")
+                else:
+                    with log_context(item.get('name')), \
+                            mgr.tracer.trace(draft_id, item.get('name'), mode="continuous", lane=slot):
+                        sonuc = drafti_planla_backend(worker, item)
+                        if isinstance(sonuc, dict) and 'STOP' not in sonuc:
+                            new_draft_id = sonuc.get('draft_id')
+                        sonucu_isle(mgr, item, sonuc)
+                    ok = True
+        except Exception as e:
+            mgr.add_log(f"🔥 Sürekli mod hatası ({acc_name}): {e}", "error")
+            traceback.print_exc()
+        finally:
+            rotation_done = False
+            with self._cond:
+                self._busy.get(acc_id, set()).discard(slot)
+                self._inflight.pop(draft_id, None)
+                now = time.time()
+                self._last_checked[draft_id] = now
+                if new_draft_id and new_draft_id != draft_id:
+                    # Kopya yeni taslak olarak izlenir, az önce kontrol edilmiş sayılır
+                    self._last_checked[new_draft_id] = self._first_seen[new_draft_id] = now
+                    self._last_checked.pop(draft_id, None)
+                    self._first_seen.pop(draft_id, None)
+                self._done.append((now, now - started))
+                self.completed += 1
+                if not ok:
+                    self.errors += 1
+                # Liste bir kez döndüğünde: yeni trace döngüsü ve Teams özeti
+                self._rotation += 1
+                if self._rotation >= max(1, len(mgr.watch_list)):
+                    self._rotation = 0
+                    rotation_done = True
+                self._cond.notify_all()
+            if rotation_done:
+                mgr.tracer.new_cycle()
+                teams_ozetini_gonder(mgr)
+
+    def staleness(self):
+        """Per-draft rows: seconds since the last finished check (or since it was added), stalest first."""
+        now = time.time()
+        with self.mgr.watch_list_lock:
+            items = list(self.mgr.watch_list.values())
+        with self._cond:
+            rows = []
+            for item in items:
+                draft_id = item['draft_id']
+                last = self._last_checked.get(draft_id)
+                since = last or self._first_seen.get(draft_id) or self.started_at or now
+                rows.append({
+                    "draft_id": draft_id,
+                    "name": item.get('name'),
+                    "account_name": item.get('account_name'),
+                    "last_checked": last,
+                    "staleness_s": now - since,
+                    "inflight": draft_id in self._inflight,
+                })
+        return sorted(rows, key=lambda r: r["staleness_s"], reverse=True)
+
+    def stats(self, window=3600):
+        """Throughput over the last `window` seconds and staleness summary."""
+        now = time.time()
+        with self._cond:
+            recent = [seconds for finished, seconds in self._done if finished >= now - window]
+            inflight = len(self._inflight)
+        elapsed = min(window, now - self.started_at) if self.started_at else 0
+        per_hour = len(recent) / elapsed * 3600 if elapsed > 0 and len(recent) >= 5 else None
+        stale = [r["staleness_s"] for r in self.staleness()]
+        return {
+            "running": self.running,
+            "inflight": inflight,
+            "target": self.mgr.continuous_inflight,
+            "completed": self.completed,
+            "errors": self.errors,
+            "drafts_per_hour": per_hour,
+            "avg_draft_s": statistics.fmean(recent) if recent else None,
+            "staleness_p50_s": statistics.median(stale) if stale else None,
+            "staleness_max_s": max(stale) if stale else None,
+            # Tüm listenin bir kez dönmesi için gereken süre (mevcut hızla)
+            "rotation_s": len(stale) / per_hour * 3600 if per_hour else None,
+        }
@@ -1,15 +1,11 @@
-from bs4 import BeautifulSoup
 import urllib.parse
-from urllib.parse import urlparse, parse_qs
 from datetime import datetime
 import time
 import re
 import pandas as pd
 import requests
-import json
-import string
-import random
 import traceback
+from concurrent.futures import TimeoutError as FutureTimeoutError
 
 from bot.constants import (
     BASE_URL,
@@ -18,91 +14,39 @@ from bot.constants import (
     PLAN_URL,
     USER_AGENT,
 )
-from bot.auth import login
-from bot.jsf import form_verilerini_topla, extract_viewstate, jsf_ajax_payload, auto_resolve_jsf_states
+from bot.session_broker import get_logged_in
+from bot.jsf import JsfPage, jsf_ajax_payload, auto_resolve_jsf_states
 from bot.analysis import analizi_yap
+from bot.parsers import draft_table_rows, lxml_text
+from bot.sse import job_dispatcher
+from bot.tracing import span
 
-def html_tabloyu_parse_et(mgr, html_content):
-    soup = BeautifulSoup(html_content, 'html.parser')
-    rows = soup.find_all("tr", role="row")
+def html_tabloyu_parse_et(mgr, html_content, encoding=None, backend=None):
+    """
+    Draft listesini DataFrame'e çevirir.
+    html_content: JsfPage, response.content (bytes) veya response.text.
+    backend: bot.parsers içindeki parser ("auto", "lxml", "bs4"). None ise mgr.parser_backend.
+    """
+    if isinstance(html_content, JsfPage):
+        rows = html_content.draft_rows(backend or mgr.parser_backend)
+    else:
+        rows = draft_table_rows(html_content, encoding, backend or mgr.parser_backend)
     if not rows: return pd.DataFrame()
 
+    # --- AUTO SELECT MANTIĞI ---
+    # Eğer bu draft takip listesindeyse TRUE yap
     takip_edilen_tarihler = set(mgr.watch_list.keys())
-    
-    veri_listesi = []
-    for row in rows:
-        cells = row.find_all("td")
-        if not cells or len(cells) < 11: continue
-        try:
-            name_input = cells[2].find("input")
-            draft_name = name_input['value'] if name_input else cells[2].get_text(strip=True)
-            name_input_id = name_input["id"]
-            cell_editor_id = None
-            if name_input:
-                editor_div = name_input.find_parent("div", class_="ui-cell-editor")
-                if editor_div and editor_div.has_attr("id"):
-                    cell_editor_id = editor_div["id"]
-            print(cell_editor_id)
-            open_link = row.find("a", title="Open Draft Shipment")
-            if not open_link: open_link = cells[1].find("a") 
-            row_action_id = open_link.get("id") if open_link else None
-            
-            # Copy butonu bulma
-            copy_link = row.find("a", title=lambda x: x and ("duplicate" in x.lower() or "copy" in x.lower()))
-            if not copy_link:
-                copy_icon = row.find("span", class_=lambda x: x and ("copy" in x or "clone" in x))
-                if copy_icon: copy_link = copy_icon.find_parent("a")
-            copy_action_id = copy_link.get("id") if copy_link else None
-
-            from_loc = cells[3].get_text(strip=True)
-            created_date = cells[9].get_text(strip=True)
-            units = cells[8].get_text(strip=True)
-            skus = cells[7].get_text(strip=True)
-
-            href = open_link.get("href")
-            draft_id = None
-
-            if not href:
-                href = None
-            else:
-                parsed_url = urlparse(href)
-                query_params = parse_qs(parsed_url.query)
-                draft_id = query_params.get('id', [None])[0]
-            
-            # --- AUTO SELECT MANTIĞI ---
-            # Eğer bu draft ismi, oluşturduğumuz kopyalar listesindeyse TRUE yap
-
-            secili_mi = created_date in takip_edilen_tarihler
-            veri_listesi.append({
-                "Seç": secili_mi, # Dinamik seçim
-                "Draft Name": draft_name,
-                "Draft Id": draft_id,
-                "From": from_loc,
-                "SKUs": skus,
-                "Units": units,
-                "Created": created_date,
-                "Action ID": row_action_id,
-                "Copy ID": copy_action_id,
-                "Name Input ID": name_input_id,
-                "Link": href,
-                "UI Cell Editor": cell_editor_id
-            })
-            
-            
-        except Exception as e: 
-            print(e)
-            continue
-    #for veri in veri_listesi:
-    #    print(f"\n\n{veri}\n\n")
+    veri_listesi = [{"Seç": row["Created"] in takip_edilen_tarihler, **row} for row in rows]
     return pd.DataFrame(veri_listesi)
 
-def veriyi_dataframe_yap(mgr):
-    if not mgr.session.cookies:
-        if not login(mgr): return None, "Giriş Yapılamadı"
+def veriyi_dataframe_yap(mgr, lock_timeout=None):
+    """lock_timeout: seconds to wait for the account context (None: wait as long as needed)."""
     try:
-        response = mgr.session.get(DRAFT_PAGE_URL)
-        if "login.jsf" in response.url: login(mgr); response = mgr.session.get(DRAFT_PAGE_URL, headers={"Referer": DRAFT_PAGE_URL})
-        df = html_tabloyu_parse_et(mgr, response.text)
+        # Liste aktif hesaba bağlı; çekilirken başka bir thread hesap değiştirmesin
+        with mgr.broker.account_context(timeout=lock_timeout):
+            if not mgr.broker.ensure(): return None, "Giriş Yapılamadı"
+            response = get_logged_in(mgr, DRAFT_PAGE_URL)
+        df = html_tabloyu_parse_et(mgr, JsfPage.from_response(response))
         
         if not df.empty:
             # --- NEW CONFIG COLUMNS ---
@@ -131,11 +75,8 @@ def poll_results_until_complete(session, base_payload, referer_url):
                 "enrichmentStateForm": "enrichmentStateForm"
             }
             res = session.post(PLAN_URL, data={**base_payload, **poll_params}, headsers={"Referer": referer_url}, timeout=20)
-            if "javax.faces.ViewState" in res.text:
-                try:
-                    match = re.search(r'id=".*?javax\.faces\.ViewState.*?"><!\[CDATA\[(.*?)]]>', res.text)
-                    if match: base_payload["javax.faces.ViewState"] = match.group(1)
-                except: pass
+            vs = JsfPage.from_response(res).viewstate
+            if vs: base_payload["javax.faces.ViewState"] = vs
 
             #if "mainForm:plans" in res.text or "Amazon Optimized Splits" in res.text:
                 #return res.text
@@ -148,70 +89,62 @@ def poll_results_until_complete(session, base_payload, referer_url):
         except: time.sleep(5)
     return None
 
-def listen_for_shipment_completion(mgr, session: requests.Session, domain_url: str) -> dict:
-    mgr.add_log("📡 SSE Bağlantısı kuruluyor...", "info")
-
-    random_str = ''.join(random.choices(string.ascii_lowercase + string.digits, k=11))
-    client_id = f"sw-{random_str}"
-    sse_url = f"{domain_url}/api/sse/jobs/session?clientId={client_id}"
-
-    headers = {
-        "Accept": "text/event-stream",
-        "Cache-Control": "no-cache",
-        "Connection": "keep-alive",
-        "Pragma": "no-cache",
-        "User-Agent": USER_AGENT
-    }
-
-    # KESİN DÜZELTME: 'with' bloğu soketin her senaryoda kapatılmasını zorunlu kılar
-    with session.get(sse_url, stream=True, headers=headers, timeout=(10, 300)) as response:
-        response.raise_for_status()
-
-        current_event_type = None
-
-        for line in response.iter_lines(decode_unicode=True):
-            if not line or line.startswith(":"):
-                continue
-
-            if line.startswith("event:"):
-                current_event_type = line.split(":", 1)[1].strip()
-
-            elif line.startswith("data:"):
-                data_str = line.split(":", 1)[1].strip()
+def listen_for_shipment_completion(mgr, session: requests.Session, domain_url: str, timeout=300) -> dict:
+    """Waits for the next plan job of this session on the shared SSE dispatcher (see bot/sse.py)."""
+    waiter = job_dispatcher(mgr).expect()
+    return plan_job_bekle(mgr, waiter, timeout)
 
-                if current_event_type == "job-status-global":
-                    try:
-                        payload = json.loads(data_str)
-
-                        if payload.get("type") == "CREATE_SHIPMENT_PLAN":
-                            status = payload.get("status")
-                            done = payload.get("done", 0)
-                            total = payload.get("total", 0)
-
-                            if status == "DONE" or (total > 0 and done == total):
-                                mgr.add_log("🟢 SSE Akışı Tamamlandı.", "success")
-                                return payload  # Fonksiyondan çıkarken 'with' bloğu soketi otomatik kapatır
-
-                            elif status == "FAILED" or payload.get("errorMessage"):
-                                raise RuntimeError(f"Sunucu Hatası: {payload.get('errorMessage')}")
-
-                    except json.JSONDecodeError:
-                        continue
-
-    # Sunucu veriyi bitirmeden soketi kapatırsa
-    raise ConnectionError("Sunucu, işlem tamamlanmadan SSE bağlantısını kesti (EOF).")
-
-def drafti_kopyala(mgr, target_id):
+def plan_job_bekle(mgr, waiter, timeout=300):
+    try:
+        payload = waiter.result(timeout)
+    except FutureTimeoutError:
+        waiter.cancel()
+        raise TimeoutError(f"Plan işi {timeout} sn içinde tamamlanmadı.")
+    mgr.add_log("🟢 SSE Akışı Tamamlandı.", "success")
+    return payload
+
+def hazir_olana_kadar_bekle(fetch, is_ready, ilk_bekleme=0.25, tavan=2.0, toplam=15):
+    """
+    Calls fetch() until is_ready(result) is true, sleeping 0.25, 0.5, 1, 2, 2... seconds in between
+    (instead of a fixed sleep). Returns the last result, ready or not, once `toplam` seconds are used up.
+    """
+    deadline = time.monotonic() + toplam
+    bekleme = ilk_bekleme
+    while True:
+        sonuc = fetch()
+        if is_ready(sonuc) or time.monotonic() + bekleme > deadline:
+            return sonuc
+        time.sleep(bekleme)
+        bekleme = min(tavan, bekleme * 2)
+
+def _draft_adi_inputu(page):
+    return page.find("input", name=lambda x: x and "draft_name" in x)
+
+def _temiz_kopya_adi(new_draft_name):
+    clean_base = re.sub(r'(\s*-\s*copy|\s*copy|\s*-\s*clone)+', '', new_draft_name, flags=re.IGNORECASE).strip()
+    # Eski tarihleri temizle
+    clean_base = re.sub(r'\s\d{2}[/.-]\d{2}\s\d{2}:\d{2}:\d{2}$', '', clean_base)
+
+    # Yeni Tarih Ekle (Gün/Ay Saat:Dk:Sn)
+    unique_ts = datetime.now().strftime("%d/%m %H:%M:%S")
+    if len(clean_base) > 30: clean_base = clean_base[:30]
+    return f"{clean_base} {unique_ts}"
+
+def drafti_kopyala(mgr, target_id, list_page=None):
     """
-    Kopyalama yapar ve YENİ OLUŞAN DRAFT'IN ADINI döndürür.
+    Kopyalama yapar ve YENİ OLUŞAN DRAFT'IN bilgilerini döndürür.
+    list_page: drafti_planla_backend'in zaten indirdiği draft.jsf JsfPage'i. Verilirse liste
+    tekrar çekilmez; ViewState'i eskimişse taze liste ile bir kez daha denenir.
     """
     mgr.add_log("Kopyalama işlemi başlatılıyor...", "info")
+    liste_tekrar_kullanildi = list_page is not None
     
     # 1. Target'dan draftı bul
-    res = mgr.session.get(DRAFT_PAGE_URL)
-    if "login.jsf" in res.url: login(mgr); res = mgr.session.get(DRAFT_PAGE_URL)
-    
-    df = html_tabloyu_parse_et(mgr, res.text)
+    if list_page is None:
+        res = get_logged_in(mgr, DRAFT_PAGE_URL)
+        list_page = JsfPage.from_response(res)
+
+    df = html_tabloyu_parse_et(mgr, list_page)
     if df.empty: return None
 
     ilgili_satir = df[df["Draft Id"] == target_id]
@@ -224,7 +157,7 @@ def drafti_kopyala(mgr, target_id):
     if not copy_id: return None
         
     # 2. Copy Butonuna Bas
-    form_data = form_verilerini_topla(res.text)
+    form_data = list_page.form_data
     copy_payload = {
         "javax.faces.partial.ajax": "true",
         "javax.faces.source": copy_id,
@@ -236,19 +169,17 @@ def drafti_kopyala(mgr, target_id):
     res_confirm = mgr.session.post(DRAFT_PAGE_URL, data={**form_data, **copy_payload})
     
     # 3. Confirm (Yes) Butonuna Bas
-    confirm_btn_id = None
-    try:
-        match = re.search(r'button id="([^"]+)"[^>]*class="[^"]*ui-confirmdialog-yes', res_confirm.text)
-        if match: confirm_btn_id = match.group(1)
-    except: pass
+    confirm_page = JsfPage.from_response(res_confirm)
+    confirm_btn_id = confirm_page.dialog_yes_id
     
-    if not confirm_btn_id: return None
+    if not confirm_btn_id:
+        if liste_tekrar_kullanildi:
+            # Eldeki listenin ViewState'i sunucuda düşmüş olabilir
+            print("Onay penceresi gelmedi, liste yeniden çekiliyor.")
+            return drafti_kopyala(mgr, target_id)
+        return None
         
-    current_vs = form_data.get("javax.faces.ViewState")
-    try:
-        match_vs = re.search(r'id=".*?javax\.faces\.ViewState.*?"><!\[CDATA\[(.*?)]]>', res_confirm.text)
-        if match_vs: current_vs = match_vs.group(1)
-    except: pass
+    current_vs = confirm_page.viewstate or form_data.get("javax.faces.ViewState")
 
     confirm_payload = {
         "javax.faces.partial.ajax": "true",
@@ -261,104 +192,87 @@ def drafti_kopyala(mgr, target_id):
     
     res_final = mgr.session.post(DRAFT_PAGE_URL, data=confirm_payload)
 
-    # 4. Redirect ve Yeni İsim Alma
-    if "<redirect" in res_final.text:
-        try:
-            redirect_part = res_final.text.split('url="')[1].split('"')[0].replace("&amp;", "&")
-            full_redirect_url = urllib.parse.urljoin(BASE_URL, redirect_part)
-            
-            # Yeni sayfaya git
-            new_page_res = mgr.session.get(full_redirect_url)    
-            soup_new = BeautifulSoup(new_page_res.text, 'html.parser')
+    # 4. Redirect: yeni draft id'si URL'den okunur
+    redirect_part = JsfPage.from_response(res_final).redirect
+    if not redirect_part: return None
+    try:
+        full_redirect_url = urllib.parse.urljoin(BASE_URL, redirect_part)
+        new_id = urllib.parse.parse_qs(urllib.parse.urlparse(full_redirect_url).query).get("id", [None])[0]
+        if not new_id:
+            mgr.add_log("⚠️ Kopyanın id'si yönlendirme adresinde yok.", "warning")
+            return None
 
-            name_input = soup_new.find("input", {"name": lambda x: x and "draft_name" in x})
-            new_draft_name = name_input.get("value") if name_input else "Bilinmeyen Kopya"
+        # Yeni sayfa hazır olana kadar kısa aralıklarla dene (sabit sleep yerine)
+        new_page_res = hazir_olana_kadar_bekle(
+            lambda: mgr.session.get(full_redirect_url, timeout=45),
+            lambda r: _draft_adi_inputu(JsfPage.from_response(r)) is not None
+        )
+        new_page = JsfPage.from_response(new_page_res)
 
-            loc_span = soup_new.find("span", {"id": "mainForm:draftInfo:0:ship_from_address"})
-            new_location = loc_span.get_text(strip=True) if loc_span else ""
+        name_input = _draft_adi_inputu(new_page)
+        new_draft_name = name_input.get("value") if name_input is not None else "Bilinmeyen Kopya"
 
-            mgr.add_log(f"✅ Kopyalandı: {new_draft_name}")
-            
-            if base_loc.lower() not in new_location.lower():
-                mgr.add_log(f"📍 Adres düzeltiliyor: {new_location} -> {base_loc}", "warning")
-                address_request_handler(mgr, full_redirect_url, target_id, new_page_res)
-            
-            time.sleep(2) # Sistemin oturması için
-            res_check = mgr.session.get(DRAFT_PAGE_URL)
-            soup_list = BeautifulSoup(res_check.text, 'html.parser')
-            df_check = html_tabloyu_parse_et(mgr, res_check.text)
-            yeni_satir = df_check[df_check["Draft Name"] == new_draft_name]
-
-            if not yeni_satir.empty:
-                yeni_tarih = yeni_satir.iloc[0]["Created"]
-                loc = yeni_satir.iloc[0]["From"]
-                new_id = yeni_satir.iloc[0]["Draft Id"]
-                new_input_id = yeni_satir.iloc[0]["Name Input ID"]
-                new_target_editor_id = yeni_satir.iloc[0]["UI Cell Editor"]
-                clean_base = re.sub(r'(\s*-\s*copy|\s*copy|\s*-\s*clone)+', '', new_draft_name, flags=re.IGNORECASE).strip()
-                # Eski tarihleri temizle
-                clean_base = re.sub(r'\s\d{2}[/.-]\d{2}\s\d{2}:\d{2}:\d{2}$', '', clean_base)
-                
-                # Yeni Tarih Ekle (Gün/Ay Saat:Dk:Sn)
-                unique_ts = datetime.now().strftime("%d/%m %H:%M:%S")
-                if len(clean_base) > 30: clean_base = clean_base[:30]
-                new_clean_name = f"{clean_base} {unique_ts}"
-                
-                # ViewState'i formdan al
-                vs_input = soup_list.find("input", {"name": "javax.faces.ViewState"})
-                current_vs = vs_input.get("value")
-                
-                # --- RENAME SEQUENCE ÇAĞIR ---
-                if rename_draft_sequence(mgr, new_input_id, new_target_editor_id, new_clean_name, soup_list, current_vs):
-                    final_draft_name = new_clean_name
-                    mgr.add_log(f"✏️ İsim düzeltildi: {new_clean_name}")
-                else:
-                    final_draft_name = new_draft_name
-                
-                # SUCCESS NOTIFICATION
-                # teams_bildirim_gonder(
-                #     mgr=mgr,
-                #     title="Kopyalama Başarılı",
-                #     message="Yeni taslak oluşturuldu ve takip listesine eklendi.",
-                #     status="info",
-                #     facts={
-                #         "Eski Taslak": str(target_date), # Or original name if you pass it
-                #         "Yeni Taslak": new_draft_name,
-                #         "Lokasyon": loc,
-                #         "Tarih": yeni_tarih
-                #     }
-                # )
-                time.sleep(2) # Sistemin oturması için
-                res_final_check = mgr.session.get(DRAFT_PAGE_URL)
-                df_check = html_tabloyu_parse_et(mgr, res_final_check.text)
-                yeni_satir = df_check[df_check["Draft Name"] == final_draft_name]
-
-                if not yeni_satir.empty:
-                    yeni_tarih = yeni_satir.iloc[0]["Created"]
-                    loc = yeni_satir.iloc[0]["From"]
-                return {"name": final_draft_name, "date": yeni_tarih, "loc": loc, "draft_id": new_id}
-            else:
-                mgr.add_log("⚠️ Kopyalanan satır listede bulunamadı (Rename atlandı).", "warning")
-            return None
-            
-        except Exception as e: 
-            print(f"Kopya isim hatası: {e}")
-            return None
-            
-    return None
+        loc_span = new_page.find("span", id="mainForm:draftInfo:0:ship_from_address")
+        new_location = lxml_text(loc_span) if loc_span is not None else ""
+
+        mgr.add_log(f"✅ Kopyalandı: {new_draft_name}")
+        
+        if base_loc.lower() not in new_location.lower():
+            mgr.add_log(f"📍 Adres düzeltiliyor: {new_location} -> {base_loc}", "warning")
+            address_request_handler(mgr, full_redirect_url, target_id, new_page_res)
+
+        # 5. İsim düzeltme: önce draft sayfasının kendi state'i ile, olmazsa liste üzerinden
+        new_clean_name = _temiz_kopya_adi(new_draft_name)
+        final_draft_name = new_draft_name
+        if name_input is not None and drafti_sayfada_yeniden_adlandir(mgr, new_page, full_redirect_url, name_input.get("name"), new_clean_name):
+            final_draft_name = new_clean_name
+        elif rename_from_list(mgr, new_id, new_clean_name):
+            final_draft_name = new_clean_name
+        if final_draft_name == new_clean_name:
+            mgr.add_log(f"✏️ İsim düzeltildi: {new_clean_name}")
+
+        # date: sonucu_isle takipteki orijinal tarihi korur
+        return {"name": final_draft_name, "date": None, "loc": base_loc, "draft_id": new_id}
+
+    except Exception as e: 
+        print(f"Kopya isim hatası: {e}")
+        return None
+
+CREATE_PLAN_PARAMS = {
+    "javax.faces.partial.ajax": "true",
+    "javax.faces.source": "mainForm:create_plan",
+    "javax.faces.partial.execute": "@all",
+    "javax.faces.partial.render": "mainForm",
+    "mainForm:create_plan_pc": "mainForm:create_plan_pc",
+    "mainForm": "mainForm"
+}
+
+# Tarayıcının yaptığı JSF AJAX (onPlanShippingJobComplete) çağrısı
+PLAN_COMPLETE_PARAMS = {
+    "javax.faces.partial.ajax": "true",
+    "javax.faces.source": "mainForm:onPlanShippingJobComplete",
+    "javax.faces.partial.execute": "mainForm:onPlanShippingJobComplete",
+    "javax.faces.partial.render": "mainForm:shipmentPlansPanel mainForm:a2dw_boxContentPanel messagesPrepDetails",
+    "mainForm:onPlanShippingJobComplete": "mainForm:onPlanShippingJobComplete",
+    "mainForm": "mainForm"
+}
 
 def drafti_planla_backend(mgr, draft_item):
 
     target_date = draft_item['date']
     target_id = draft_item['draft_id']
     draft_name = draft_item['name']
+    waiter = None
     try:
         # 1. Draft Aç
         mgr.add_log(f"İşlem başladı: {draft_name}", "info")
-        main_res = mgr.session.get(DRAFT_PAGE_URL)
-        if "login.jsf" in main_res.url: login(mgr); main_res = mgr.session.get(DRAFT_PAGE_URL)
+        with span("list_fetch"):
+            # Cron slotundan önce ön ısıtmada çekilen liste varsa o kullanılır (bot/scheduler.py: on_isitma)
+            main_res = mgr.broker.take_list_page(mgr.current_account_id, mgr.warmup_lead + 60)
+            if main_res is None:
+                main_res = get_logged_in(mgr, DRAFT_PAGE_URL)
 
-        df = html_tabloyu_parse_et(mgr, main_res.text)
+            df = html_tabloyu_parse_et(mgr, JsfPage.from_response(main_res))
         target_row = df[df["Draft Id"] == target_id]
 
         if target_row.empty:
@@ -400,52 +314,55 @@ def drafti_planla_backend(mgr, draft_item):
 
         # 2. Planlama
         mgr.add_log(f"🚀 Planlama baslatiliyor")
-        detay_res = mgr.session.get(redirect_url, timeout=45)
-        detay_form_data = form_verilerini_topla(detay_res.text)
-        create_plan_params = {
-            "javax.faces.partial.ajax": "true",
-            "javax.faces.source": "mainForm:create_plan",
-            "javax.faces.partial.execute": "@all",
-            "javax.faces.partial.render": "mainForm",
-            "mainForm:create_plan_pc": "mainForm:create_plan_pc",
-            "mainForm": "mainForm"
-        }
-        res_plan = mgr.session.post(PLAN_URL, data={**detay_form_data, **create_plan_params}, headers={"Referer": redirect_url}, timeout=45)
+        with span("detail_get"):
+            detay_res = mgr.session.get(redirect_url, timeout=45)
+            detay_form_data = JsfPage.from_response(detay_res).form_data
+
+        # SSE bekleyicisi plan isteğinden ÖNCE kaydedilir, böylece hiçbir olay kaçmaz
+        waiter = job_dispatcher(mgr).expect(draft_id=target_id)
+        try:
+            with span("create_plan"):
+                res_plan = mgr.session.post(PLAN_URL, data={**detay_form_data, **CREATE_PLAN_PARAMS}, headers={"Referer": redirect_url}, timeout=45)
+        except Exception:
+            waiter.cancel()
+            raise
 
         if "ui-messages-error" in res_plan.text:
+            waiter.cancel()
             mgr.add_log("Planlama hatası.", "error")
             return None
     
-        res_plan, resolved_count = auto_resolve_jsf_states(mgr.session, res_plan, redirect_url)
-        vs_match = re.search(r'id=".*?javax\.faces\.ViewState.*?"><!\[CDATA\[(.*?)]]>', res_plan.text)
-        if vs_match: 
-            detay_form_data["javax.faces.ViewState"] = vs_match.group(1)
+        with span("auto_resolve") as s:
+            res_plan, resolved_count = auto_resolve_jsf_states(mgr.session, res_plan, redirect_url)
+            if s is not None: s.attrs["resolved"] = resolved_count
+        plan_vs = JsfPage.from_response(res_plan).viewstate
+        if plan_vs: 
+            detay_form_data["javax.faces.ViewState"] = plan_vs
         # 3. Polling
         try:
             # 1. Adım: Planlamanın bitmesini senkron olarak bekle
-            sse_sonuc = listen_for_shipment_completion(mgr, mgr.session, BASE_URL)
+            try:
+                with span("sse_wait"):
+                    sse_sonuc = plan_job_bekle(mgr, waiter, mgr.plan_job_timeout)
+            except (TimeoutError, ConnectionError) as e:
+                # Sunucudaki iş boşa gitmesin: sonuç tablosu yine de istenir
+                mgr.add_log(f"⚠️ SSE beklenemedi ({e}), sonuçlar doğrudan kontrol ediliyor.", "warning")
 
             # 2. Adım: Tarayıcının yaptığı JSF AJAX (onPlanShippingJobComplete) çağrısını taklit et
-            complete_payload = {
-                "javax.faces.partial.ajax": "true",
-                "javax.faces.source": "mainForm:onPlanShippingJobComplete",
-                "javax.faces.partial.execute": "mainForm:onPlanShippingJobComplete",
-                "javax.faces.partial.render": "mainForm:shipmentPlansPanel mainForm:a2dw_boxContentPanel messagesPrepDetails",
-                "mainForm:onPlanShippingJobComplete": "mainForm:onPlanShippingJobComplete",
-                "mainForm": "mainForm"
-            }
-
             # detay_form_data, res_plan adımında zaten en güncel ViewState ile güncellenmişti.
             # Taslak ürünlerini (draft items) ve yeni payload'u birleştiriyoruz.
-            final_payload = {**detay_form_data, **complete_payload}
+            final_payload = {**detay_form_data, **PLAN_COMPLETE_PARAMS}
 
             # Sayfayı GET ile indirmek yerine, sadece tabloyu getiren POST isteğini atıyoruz.
-            res_results = mgr.session.post(redirect_url, data=final_payload, headers={"Referer": redirect_url},
-                                           timeout=45)
-            final_xml = res_results.text
+            # Yanıt akış halinde okunur (bot/partial.py), büyük XML bellekte ikinci kez tutulmaz.
+            with span("plan_complete"), \
+                    mgr.session.post(redirect_url, data=final_payload, headers={"Referer": redirect_url},
+                                     timeout=45, stream=True) as res_results:
+                results_page = JsfPage.from_response(res_results)
 
-            if final_xml and "shipmentPlansPanel" in final_xml:
-                sonuc = analizi_yap(mgr, final_xml, draft_item)
+            if results_page.find_update("shipmentPlansPanel"):
+                with span("analizi_yap"):
+                    sonuc = analizi_yap(mgr, results_page, draft_item)
 
                 if isinstance(sonuc, dict) and "found_target" in sonuc:
                     mgr.add_log(f"🏁 {draft_name}: Hedef depo bulunduğu için işlem sonlandırıldı.", "success")
@@ -454,7 +371,9 @@ def drafti_planla_backend(mgr, draft_item):
                 elif isinstance(sonuc, dict) and 'found_new' in sonuc:
                     found_wh = sonuc['found_new']
 
-                    yeni_draft_verisi = drafti_kopyala(mgr, target_id)
+                    # Planlamanın başında çekilen liste tekrar kullanılır
+                    with span("drafti_kopyala"):
+                        yeni_draft_verisi = drafti_kopyala(mgr, target_id, list_page=JsfPage.from_response(main_res))
 
                     if yeni_draft_verisi:
                         yeni_draft_verisi['newly_found_warehouse'] = found_wh
@@ -468,10 +387,12 @@ def drafti_planla_backend(mgr, draft_item):
                 return None
 
         except Exception as e:
+            waiter.cancel()
             mgr.add_log(f"İşlem beklenirken hata oluştu: {str(e)}", "error")
             return None
 
     except Exception as e:
+        if waiter is not None: waiter.cancel()
         error_string = traceback.format_exc()
         mgr.add_log(f"Hata ({draft_name}): {error_string}", "error")
         return None
@@ -491,31 +412,32 @@ def address_request_handler(mgr, draft_url, target_id, res_draft):
     # Request the draft page:
 
     # res_draft = manager.session.get(draft_url)
-    form_data = form_verilerini_topla(res_draft.text)
+    draft_page = JsfPage.from_response(res_draft)
+    form_data = draft_page.form_data
     current_viewstate = form_data.get("javax.faces.ViewState")
-    draft_soup = BeautifulSoup(res_draft.text, "html.parser")
 
     # find the id of secret button
     # STRICT SEARCH: Find the script tag containing the specific function name
     # We use re.compile to match the content partially
     secret_btn_id = ""
-    target_script = draft_soup.find('script', string=re.compile(r'updateAddress\s*='))
+    update_address = re.compile(r'updateAddress\s*=')
+    target_script = next((tag for tag in draft_page.find_all('script') if tag.text and update_address.search(tag.text)), None)
 
-    if target_script and target_script.has_attr('id'):
-        found_id = target_script['id']
+    if target_script is not None and target_script.get('id'):
+        found_id = target_script.get('id')
         print(f"Found ID: {found_id}")
         secret_btn_id = found_id
     else:
         print("Target script not found or has no ID.")
     # Find pencil:
 
-    edit_link = draft_soup.find("a", title="Change 'Ship From' address")
-    if not edit_link: edit_link = draft_soup.find("a", id=re.compile(r"ship_from_address_edit"))
-    if not edit_link:
-        pencil_icon = draft_soup.find("i", class_="pi-pencil")
-        if pencil_icon: edit_link = pencil_icon.find_parent("a")
+    edit_link = draft_page.find("a", title="Change 'Ship From' address")
+    if edit_link is None: edit_link = draft_page.find("a", id=re.compile(r"ship_from_address_edit"))
+    if edit_link is None:
+        pencil_icon = draft_page.find("i", class_="pi-pencil")
+        if pencil_icon is not None: edit_link = next(pencil_icon.iterancestors("a"), None)
 
-    if not edit_link:
+    if edit_link is None:
         mgr.add_log("❌ Kalem butonu bulunamadı.", "error")
         return False
 
@@ -535,40 +457,37 @@ def address_request_handler(mgr, draft_url, target_id, res_draft):
     data_rk = ""
     select_btn_id = ""
     xml_data = mgr.session.post(PLAN_URL, data=payload_open)
-    vs = extract_viewstate(xml_data.text)
+    xml_page = JsfPage.from_response(xml_data)
+    vs = xml_page.viewstate
     if vs: current_viewstate = vs
 
-    outer_soup = BeautifulSoup(xml_data.text, 'xml')
-
-    update_tag = outer_soup.find('update', {'id': 'addressDialog:addressForm:addressTable'})
+    table_page = xml_page.update_page('addressDialog:addressForm:addressTable')
 
-    if update_tag:
-        inner_html_content = update_tag.text
-        inner_soup = BeautifulSoup(inner_html_content, 'html.parser')
+    if table_page is not None:
 
         # Find select button
         
-        select_span = inner_soup.find('span', string='Select')
-        if select_span:
+        select_span = next((tag for tag in table_page.find_all('span') if len(tag) == 0 and tag.text == 'Select'), None)
+        if select_span is not None:
             # 2. Go up to the parent button
-            select_button = select_span.find_parent('button')
+            select_button = next(select_span.iterancestors('button'))
             # 3. (Optional) Get the ID to use later
-            print(select_button['id'])
-            select_btn_id = select_button["id"]
+            print(select_button.get('id'))
+            select_btn_id = select_button.get("id")
         else:
             print("cant find select buton")
             return None
 
-        target_input = inner_soup.find('input', {'value': location_value})
+        target_input = table_page.find('input', value=location_value)
         
-        if target_input:
-            parent_tr = target_input.find_parent('tr')
+        if target_input is not None:
+            parent_tr = next(target_input.iterancestors('tr'), None)
             
-            if parent_tr and parent_tr.has_attr('data-rk'):
+            if parent_tr is not None and parent_tr.get('data-rk') is not None:
                 print(f"FOUND MATCH!")
-                print(f"Row Key (data-rk): {parent_tr['data-rk']}")
-                data_rk = parent_tr['data-rk']
-                modal_inputs = form_verilerini_topla(inner_html_content)
+                print(f"Row Key (data-rk): {parent_tr.get('data-rk')}")
+                data_rk = parent_tr.get('data-rk')
+                modal_inputs = table_page.form_data
                 payload_select = {
                     "javax.faces.partial.ajax": "true",
                     "javax.faces.source": select_btn_id,
@@ -582,10 +501,10 @@ def address_request_handler(mgr, draft_url, target_id, res_draft):
                 }
                 res_select = mgr.session.post(PLAN_URL, data=payload_select)
                 if res_select.status_code == 200:
-                    vs_2 = extract_viewstate(res_select.text)
+                    vs_2 = JsfPage.from_response(res_select).viewstate
                     if vs_2: current_viewstate = vs_2
 
-                    modal_form_data = form_verilerini_topla(inner_html_content)
+                    modal_form_data = table_page.form_data
 
                     payload_refresh = {
                         "javax.faces.partial.ajax": "true",
@@ -608,17 +527,68 @@ def address_request_handler(mgr, draft_url, target_id, res_draft):
     else:
         print("Could not find the update tag with the table ID.")
 
-def rename_draft_sequence(mgr, target_input_id, target_editor_id, new_name, soup_page, current_vs):
+JSF_AJAX_HEADERS = {
+    "Accept": "application/xml, text/xml, */*; q=0.01",
+    "User-Agent": USER_AGENT,
+    "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8",
+    "Faces-Request": "partial/ajax",
+    "X-Requested-With": "XMLHttpRequest",
+}
+
+def drafti_sayfada_yeniden_adlandir(mgr, draft_page, draft_url, input_name, new_name):
+    """
+    Renames a draft from its own draftplan page (the page the copy redirected to):
+    fires the name input's change event with the page's ViewState, no list page needed.
+    Returns True only if the new name is confirmed (echoed input or a fresh draft page).
+    """
+    payload = {
+        **draft_page.form_data,
+        **jsf_ajax_payload(input_name, execute=input_name, viewstate=draft_page.viewstate),
+        "javax.faces.behavior.event": "change",
+        "javax.faces.partial.event": "change",
+        input_name: new_name,
+    }
+    try:
+        res = mgr.session.post(PLAN_URL, data=payload, headers={**JSF_AJAX_HEADERS, "Referer": draft_url}, timeout=45)
+        page = JsfPage.from_response(res)
+        if res.status_code == 200 and page.is_partial and not page.validation_failed and not page.errors:
+            # Hatasız boş yanıt kaydedildiği anlamına gelmez (listener'sız change olayı da böyle döner):
+            # yanıttaki input yoksa draft sayfası tekrar okunur
+            echoed = _draft_adi_inputu(page) if page.updates else None
+            if echoed is None:
+                echoed = _draft_adi_inputu(JsfPage.from_response(mgr.session.get(draft_url, timeout=45)))
+            if echoed is not None and echoed.get("value") == new_name:
+                return True
+            print(f"❌ Draft sayfasında isim kaydedilmedi: {echoed.get('value') if echoed is not None else None!r}")
+        else:
+            print(f"❌ Draft sayfasında isim değişmedi: {res.status_code} {page.errors}")
+    except Exception as e:
+        print(f"❌ Draft sayfasında isim hatası: {e}")
+    return False
+
+def rename_from_list(mgr, draft_id, new_name):
+    """Fallback: renames through the draft list's cell editor (one list GET), row found by id."""
+    res_check = mgr.session.get(DRAFT_PAGE_URL)
+    check_page = JsfPage.from_response(res_check)
+    df_check = html_tabloyu_parse_et(mgr, check_page)
+    yeni_satir = df_check[df_check["Draft Id"] == draft_id] if not df_check.empty else df_check
+    if yeni_satir.empty:
+        mgr.add_log("⚠️ Kopyalanan satır listede bulunamadı (Rename atlandı).", "warning")
+        return False
+    return rename_draft_sequence(mgr, yeni_satir.iloc[0]["Name Input ID"], yeni_satir.iloc[0]["UI Cell Editor"],
+                                 new_name, check_page, check_page.viewstate)
+
+def rename_draft_sequence(mgr, target_input_id, target_editor_id, new_name, list_page, current_vs):
     """
     Executes the 2-step rename sequence:
     1. Full Table Update (Request 1)
     2. Specific Change Event (Request 2)
+    list_page: JsfPage of draft.jsf (already parsed by the caller).
     """
     print(f"🔄 Renaming sequence started for: {new_name}")
 
     # --- STEP 1: PREPARE PAYLOAD FOR REQUEST #1 (FULL TABLE) ---
-    form = soup_page.find("form", id="mainForm")
-    if not form: return False
+    if list_page.find("form", id="mainForm") is None: return False
 
     try:
         row_index = target_input_id.split(':')[2]
@@ -628,14 +598,7 @@ def rename_draft_sequence(mgr, target_input_id, target_editor_id, new_name, soup
     
 
     # Scrape ALL inputs to mimic the browser's full table submission
-    payload_req1 = {}
-    for tag in form.find_all(["input", "select", "textarea"]):
-        name = tag.get("name")
-        value = tag.get("value", "")
-        if not name: continue
-        if tag.get("type") in ["checkbox", "radio"] and not tag.has_attr("checked"):
-            continue
-        payload_req1[name] = value
+    payload_req1 = list_page.form_fields(textarea=True)
 
     # Overwrite the specific target input with the NEW name
     payload_req1[target_input_id] = new_name
@@ -657,14 +620,7 @@ def rename_draft_sequence(mgr, target_input_id, target_editor_id, new_name, soup
         "javax.faces.ViewState": current_vs
     })
 
-    headers = {
-        "Accept": "application/xml, text/xml, */*; q=0.01",
-        "User-Agent": USER_AGENT,
-        "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8",
-        "Faces-Request": "partial/ajax",
-        "X-Requested-With": "XMLHttpRequest",
-        "Referer": DRAFT_PAGE_URL
-    }
+    headers = {**JSF_AJAX_HEADERS, "Referer": DRAFT_PAGE_URL}
 
     try:
         # --- SEND REQUEST #1 ---
@@ -676,7 +632,7 @@ def rename_draft_sequence(mgr, target_input_id, target_editor_id, new_name, soup
 
         # IMPORTANT: Capture the NEW ViewState from Request 1 to use in Request 2
         # JSF updates the state after every AJAX request.
-        vs = extract_viewstate(res1.text)
+        vs = JsfPage.from_response(res1).viewstate
         next_viewstate = vs if vs else current_vs
         
         # --- STEP 2: PREPARE PAYLOAD FOR REQUEST #2 (CHANGE EVENT) ---
@@ -0,0 +1,183 @@
+import os
+import threading
+import traceback
+from collections import deque
+from itertools import count
+from contextlib import contextmanager
+
+from apscheduler.schedulers.background import BackgroundScheduler
+
+
+class FairSlots:
+    """
+    Global cap on drafts in flight, shared by every user. A freed slot goes to the waiting
+    user with the lowest in_use / weight (weighted max-min fairness), FIFO within a user.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._cond = threading.Condition()
+        self._in_use = {}
+        self._total = 0
+        self._waiting = {}  # user -> deque of tickets (arrival numbers)
+        self._weights = {}
+        self._tickets = count()
+
+    def _next_ticket(self):
+        user = min(self._waiting, key=lambda u: (self._in_use.get(u, 0) / self._weights[u], self._waiting[u][0]))
+        return self._waiting[user][0]
+
+    def acquire(self, user, weight=1):
+        with self._cond:
+            ticket = next(self._tickets)
+            self._waiting.setdefault(user, deque()).append(ticket)
+            self._weights[user] = max(weight, 0.01)
+            while self._total >= self.capacity or self._next_ticket() != ticket:
+                self._cond.wait()
+            queue = self._waiting[user]
+            queue.popleft()
+            if not queue:
+                del self._waiting[user]
+            self._in_use[user] = self._in_use.get(user, 0) + 1
+            self._total += 1
+            self._cond.notify_all()  # boşta başka slot varsa sıradaki bekleyen de uyansın
+
+    def release(self, user):
+        with self._cond:
+            self._in_use[user] -= 1
+            if not self._in_use[user]:
+                del self._in_use[user]
+            self._total -= 1
+            self._cond.notify_all()
+
+    def usage(self):
+        with self._cond:
+            return dict(self._in_use), {u: len(q) for u, q in self._waiting.items()}
+
+
+class ExecutionService:
+    """
+    Process-wide scheduler and worker pool shared by every GlobalManager.
+
+    - One BackgroundScheduler holds the triggers of all users (interval / cron modes). A trigger
+      only queues the user's job; max_running worker threads run the queued jobs.
+    - Users with queued jobs are served by smooth weighted round-robin (mgr.weight), at most
+      one job per user runs at a time, and a trigger that arrives while the user's previous job
+      is still queued or running is coalesced instead of silently dropped.
+    - draft_slot() caps the drafts in flight across all users (FairSlots); the async mode
+      takes the same slots through async_pipeline.draft_slot_async.
+    """
+
+    def __init__(self, max_running=4, max_drafts=16):
+        self.max_running = max_running
+        self.slots = FairSlots(max_drafts)
+        self.scheduler = BackgroundScheduler(job_defaults={"coalesce": True, "misfire_grace_time": 60})
+        self._cond = threading.Condition()
+        self._queues = {}  # user -> deque of (key, fn, mgr)
+        self._running = {}  # user -> key of the running job
+        self._weights = {}
+        self._credit = {}
+        self._workers = []
+        self.coalesced = 0
+
+    def ensure_started(self):
+        with self._cond:
+            if not self.scheduler.running:
+                self.scheduler.start()
+            self._workers = [t for t in self._workers if t.is_alive()]
+            while len(self._workers) < self.max_running:
+                worker = threading.Thread(target=self._work, name=f"exec-{len(self._workers)}", daemon=True)
+                worker.start()
+                self._workers.append(worker)
+
+    def submit(self, mgr, fn, key="user_task", announce=True):
+        """
+        Queues fn(mgr). Returns False if the same job of this user is already queued or running
+        (announce: log the skipped trigger to the user).
+        """
+        user = mgr.email
+        with self._cond:
+            queue = self._queues.setdefault(user, deque())
+            if self._running.get(user) == key or any(k == key for k, _, _ in queue):
+                self.coalesced += 1
+                if announce:
+                    mgr.add_log("⏭️ Önceki kontrol hâlâ sürüyor, bu tetik atlandı.", "warning")
+                return False
+            queue.append((key, fn, mgr))
+            self._weights[user] = getattr(mgr, "weight", 1)
+            self._cond.notify()
+        self.ensure_started()
+        return True
+
+    def cancel(self, mgr):
+        """Drops the user's queued (not yet running) jobs."""
+        with self._cond:
+            self._queues.pop(mgr.email, None)
+
+    def _pick(self):
+        """Smooth weighted round-robin over users that have a queued job and none running."""
+        eligible = [u for u, q in self._queues.items() if q and u not in self._running]
+        if not eligible:
+            return None
+        total = sum(self._weights.get(u, 1) for u in eligible)
+        for u in eligible:
+            self._credit[u] = self._credit.get(u, 0) + self._weights.get(u, 1)
+        user = max(eligible, key=lambda u: self._credit[u])
+        self._credit[user] -= total
+        key, fn, mgr = self._queues[user].popleft()
+        self._running[user] = key
+        return user, fn, mgr
+
+    def _work(self):
+        while True:
+            with self._cond:
+                job = self._pick()
+                while job is None:
+                    self._cond.wait()
+                    job = self._pick()
+            user, fn, mgr = job
+            try:
+                fn(mgr)
+            except Exception as e:
+                mgr.add_log(f"🔥 Scheduler crash: {e}", "error")
+                traceback.print_exc()
+            finally:
+                with self._cond:
+                    self._running.pop(user, None)
+                    self._cond.notify_all()
+
+    @contextmanager
+    def draft_slot(self, mgr):
+        """Holds one of the global draft slots while planning a draft of mgr's user."""
+        self.slots.acquire(mgr.email, getattr(mgr, "weight", 1))
+        try:
+            yield
+        finally:
+            self.slots.release(mgr.email)
+
+    def stats(self):
+        """Per-user queue / running / draft slot usage."""
+        in_use, waiting = self.slots.usage()
+        with self._cond:
+            users = set(self._queues) | set(self._running) | set(in_use) | set(waiting)
+            return {u: {"queued": len(self._queues.get(u, ())),
+                        "running": self._running.get(u),
+                        "drafts": in_use.get(u, 0),
+                        "waiting_drafts": waiting.get(u, 0),
+                        "weight": self._weights.get(u, 1)} for u in sorted(users)}
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_execution_service():
+    """The process-wide ExecutionService (TWD_MAX_SWEEPS / TWD_MAX_DRAFTS set the caps)."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = ExecutionService(
+                max_running=int(os.environ.get("TWD_MAX_SWEEPS", 4)),
+                max_drafts=int(os.environ.get("TWD_MAX_DRAFTS", 16)),
+            )
+        return _service
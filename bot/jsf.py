@@ -1,33 +1,227 @@
-from bs4 import BeautifulSoup
+from functools import cached_property
 import re
 
+from bot.partial import VIEWSTATE, PartialResponse, is_streaming
+from bot.parsers import DRAFT_TABLE_BACKENDS, draft_rows_from_tree, lxml_root, lxml_text, resolve_backend
+
+positive_indicators = re.compile(r'(confirm|yes|ok|continue|onayla|accept)', re.IGNORECASE)
+
+
+def _attr_match(attr, value, expected):
+    if expected is True:
+        return value is not None
+    if callable(expected):
+        return bool(expected(value))
+    if value is None:
+        return False
+    if hasattr(expected, "search"):
+        return expected.search(value) is not None
+    if attr == "class":
+        # BeautifulSoup gibi: class_="x" tek bir sınıfla da eşleşir
+        return value == expected or expected in value.split()
+    return value == expected
+
+
+def find_all(el, tags, **attrs):
+    """
+    Elements under el (el included) with the given tag(s) whose attributes match attrs.
+    attrs: exact value, True (attribute present), compiled regex or a callable. class_ -> class.
+    """
+    if el is None:
+        return
+    tags = (tags,) if isinstance(tags, str) else tags
+    attrs = {k.rstrip("_"): v for k, v in attrs.items()}
+    for node in el.iter(*tags):
+        if all(_attr_match(k, node.get(k), v) for k, v in attrs.items()):
+            yield node
+
+
+def find(el, tags, **attrs):
+    return next(find_all(el, tags, **attrs), None)
+
+
+class JsfPage:
+    """
+    One JSF response (full page or partial-response XML), parsed once.
+    ViewState, form fields, update blocks, buttons and draft rows are computed on first
+    access and cached, so a call site can read several of them from a single parse.
+    """
+
+    def __init__(self, content, encoding=None, url=None):
+        if isinstance(content, str):
+            content, encoding = content.encode("utf-8"), "utf-8"
+        self.content = content or b""
+        self.encoding = encoding or "utf-8"
+        self.url = url
+        self._stream = None
+        self._fields = {}
+        self._fragments = {}
+        self._rows = {}
+
+    @classmethod
+    def from_response(cls, res):
+        """
+        Page of a requests/httpx response; cached on the response so it is parsed only once.
+        A partial-response requested with stream=True is read straight from the socket
+        (see bot.partial); such a page keeps the parsed parts only, not the raw body.
+        """
+        page = getattr(res, "_jsf_page", None)
+        if page is None:
+            if is_streaming(res) and "xml" in res.headers.get("Content-Type", ""):
+                page = cls(b"", res.encoding, str(res.url))
+                page._stream = res
+                page.is_partial = True
+                page.partial  # gövdeyi şimdi tüket, bağlantı havuza dönsün
+            else:
+                page = cls(res.content, res.encoding, str(res.url))
+            res._jsf_page = page
+        return page
+
+    @cached_property
+    def text(self):
+        return self.content.decode(self.encoding, errors="replace")
+
+    @cached_property
+    def is_partial(self):
+        return b"<partial-response" in self.content[:512]
+
+    # --- partial-response ---
+    @cached_property
+    def partial(self):
+        """PartialResponse (updates, ViewState, redirect, extensions, errors); None for full pages."""
+        if not self.is_partial:
+            return None
+        source, self._stream = self._stream or self.content, None
+        return PartialResponse(source)
+
+    @property
+    def updates(self):
+        """update id -> CDATA content, in document order (ViewState excluded)."""
+        return self.partial.updates if self.partial else {}
+
+    @property
+    def redirect(self):
+        """Redirect url of a partial-response (already unescaped), or None."""
+        return self.partial.redirect if self.partial else None
+
+    @property
+    def errors(self):
+        """(error-name, error-message) pairs of a partial-response."""
+        return self.partial.errors if self.partial else []
+
+    @property
+    def validation_failed(self):
+        return bool(self.partial) and self.partial.validation_failed
+
+    def find_update(self, fragment):
+        """Id of the first update block whose id contains fragment, or None."""
+        return next((update_id for update_id in self.updates if fragment in update_id), None)
+
+    def update_page(self, update_id):
+        """JsfPage of a single update block, or None if the response has no such update."""
+        if update_id not in self._fragments:
+            cdata = self.updates.get(update_id)
+            self._fragments[update_id] = JsfPage(cdata) if cdata is not None else None
+        return self._fragments[update_id]
+
+    # --- HTML ---
+    @cached_property
+    def html(self):
+        """HTML of the page. For partial responses: all update blocks joined (ViewState excluded)."""
+        if not self.is_partial or not self.updates:
+            return self.text
+        return "".join(self.updates.values())
+
+    @cached_property
+    def root(self):
+        if self.is_partial:
+            return lxml_root(self.html)
+        return lxml_root(self.content, self.encoding)
+
+    def find_all(self, tags, **attrs):
+        return find_all(self.root, tags, **attrs)
+
+    def find(self, tags, **attrs):
+        return find(self.root, tags, **attrs)
+
+    @cached_property
+    def viewstate(self):
+        if self.is_partial:
+            return self.partial.viewstate if self.partial else None
+        node = self.find("input", name=VIEWSTATE)
+        return node.get("value") if node is not None else None
+
+    def form_fields(self, form_id="mainForm", textarea=False):
+        """
+        name -> value of the form's fields as the browser submits them: unchecked
+        checkboxes/radios are skipped, a select sends its selected option.
+        textarea=True also collects textareas (full table submissions).
+        Returns a fresh dict, callers may modify it.
+        """
+        key = (form_id, textarea)
+        if key not in self._fields:
+            form = self.find("form", id=form_id)
+            payload = {}
+            tags = ("input", "select", "textarea") if textarea else ("input", "select")
+            for tag in find_all(form, tags):
+                name = tag.get("name")
+                if not name: continue
+                if tag.tag == "input":
+                    if tag.get("type") in ["checkbox", "radio"] and tag.get("checked") is None:
+                        continue
+                    payload[name] = tag.get("value", "")
+                elif tag.tag == "select":
+                    selected = find(tag, "option", selected=True)
+                    payload[name] = selected.get("value", "") if selected is not None else ""
+                else:
+                    payload[name] = tag.text or ""
+            self._fields[key] = payload
+        return dict(self._fields[key])
+
+    @property
+    def form_data(self):
+        """mainForm fields (same as form_verilerini_topla)."""
+        return self.form_fields()
+
+    # --- Buttons ---
+    @cached_property
+    def button_ids(self):
+        """Ids of all buttons and links, in document order."""
+        return [node.get("id") for node in self.find_all(("button", "a"), id=True)]
+
+    @cached_property
+    def dialog_yes_id(self):
+        """Id of the ui-confirmdialog-yes button, or None."""
+        node = self.find(("button", "a"), class_=lambda c: c and "ui-confirmdialog-yes" in c)
+        return node.get("id") if node is not None else None
+
+    @cached_property
+    def confirm_button_id(self):
+        """Confirm dialog button, falling back to any button that looks like Yes/OK/Continue."""
+        if self.dialog_yes_id:
+            return self.dialog_yes_id
+        for btn in self.find_all(("button", "a")):
+            if positive_indicators.search(lxml_text(btn)) or positive_indicators.search(btn.get("id", "")):
+                return btn.get("id")
+        return None
+
+    # --- Draft table ---
+    def draft_rows(self, backend="auto"):
+        """Draft table rows (see bot.parsers); the lxml backend reuses this page's tree."""
+        backend = resolve_backend(backend)
+        if backend not in self._rows:
+            if backend == "lxml":
+                self._rows[backend] = draft_rows_from_tree(self.root)
+            else:
+                self._rows[backend] = DRAFT_TABLE_BACKENDS[backend](self.html)
+        return [dict(row) for row in self._rows[backend]]
+
 
 def extract_viewstate(html, fallback=None):
-    if "javax.faces.ViewState" in html:
-        match = re.search(
-            r'id=".*?javax\.faces\.ViewState.*?"><!\[CDATA\[(.*?)]]>',
-            html
-        )
-        return match.group(1) if match else fallback
-    else: return fallback
+    return JsfPage(html).viewstate or fallback
 
 def form_verilerini_topla(html_content):
-    soup = BeautifulSoup(html_content, 'html.parser')
-    form = soup.find("form", id="mainForm")
-    if not form: return {}
-    payload = {}
-    for tag in form.find_all(["input", "select"]):
-        name = tag.get("name")
-        if not name: continue
-        if tag.name == "input":
-            value = tag.get("value", "")
-            if tag.get("type") in ["checkbox", "radio"]:
-                if tag.has_attr("checked"): payload[name] = value
-            else: payload[name] = value
-        elif tag.name == "select":
-            selected = tag.find("option", selected=True)
-            payload[name] = selected.get("value", "") if selected else ""
-    return payload
+    return JsfPage(html_content).form_data
 
 def jsf_ajax_payload(source, execute="@all", render=None, viewstate=None):
     payload = {
@@ -43,61 +237,41 @@ def jsf_ajax_payload(source, execute="@all", render=None, viewstate=None):
         payload["javax.faces.ViewState"] = viewstate
     return payload
 
+def onay_adimini_bul(page):
+    """
+    Looks for a pending confirm dialog ("Yes/OK/Continue") in a JSF response.
+    page: JsfPage (or response text). Returns the payload that clicks it, or None when the flow is clean.
+    """
+    if not isinstance(page, JsfPage):
+        page = JsfPage(page)
+
+    target_btn_id = page.confirm_button_id
+    if not target_btn_id:
+        # Hedef buton yoksa işlem pürüzsüzdür.
+        return None
+
+    print(f"[*] Otonom Çözücü: Beklenmeyen bir onay adımı tespit edildi. Geçiliyor... (Buton: {target_btn_id})")
+
+    payload = {
+        "javax.faces.partial.ajax": "true",
+        "javax.faces.source": target_btn_id,
+        "javax.faces.partial.execute": target_btn_id,
+        target_btn_id: target_btn_id,
+        "formLogo":"formLogo"
+    }
+    if page.is_partial and page.viewstate:
+        payload["javax.faces.ViewState"] = page.viewstate
+
+    return {**page.form_data, **payload}
+
 def auto_resolve_jsf_states(session, initial_res, current_url, max_depth=5):
     current_res = initial_res
     depth = 0
-    positive_indicators = re.compile(r'(confirm|yes|ok|continue|onayla|accept)', re.IGNORECASE)
     
     while depth < max_depth:
-        # 1. ViewState'i çek
-        vs_match = re.search(r'id=".*?javax\.faces\.ViewState.*?"><!\[CDATA\[(.*?)]]>', current_res.text)
-        current_vs = vs_match.group(1) if vs_match else None
-        
-        # 2. DIŞ KATMAN (XML PARSER)
-        # Hata buradaydı: JSF partial-response verisi bir XML'dir. CDATA'nın kaybolmaması için 'xml' motoru şarttır.
-        soup = BeautifulSoup(current_res.text, 'xml')
-        update_tags = soup.find_all("update")
-        
-        # XML'in içindeki CDATA (HTML bloğu) metne çevrilir
-        html_to_check = "".join([tag.text for tag in update_tags]) if update_tags else current_res.text
-        
-        # 3. İÇ KATMAN (HTML PARSER)
-        # Çıkarılan bu ham metin artık saf HTML'dir.
-        inner_soup = BeautifulSoup(html_to_check, 'html.parser')
-
-        target_btn_id = None
-        
-        # BS4 içindeki class niteliği bir liste döner. Liste kontrolü yapılıyor.
-        yes_btn = inner_soup.find(["button", "a"], class_=lambda c: c and "ui-confirmdialog-yes" in c)
-        
-        if not yes_btn:
-            buttons = inner_soup.find_all(["button", "a"])
-            for btn in buttons:
-                btn_text = btn.get_text(strip=True)
-                if positive_indicators.search(btn_text) or positive_indicators.search(btn.get("id", "")):
-                    yes_btn = btn
-                    break
-
-        if yes_btn and yes_btn.get("id"):
-            target_btn_id = yes_btn.get("id")
-        else:
-            # Hedef buton yoksa işlem pürüzsüzdür, döngüyü kır.
+        final_payload = onay_adimini_bul(JsfPage.from_response(current_res))
+        if final_payload is None:
             break
-            
-        print(f"[*] Otonom Çözücü: Beklenmeyen bir onay adımı tespit edildi. Geçiliyor... (Buton: {target_btn_id})")
-        
-        base_form_data = form_verilerini_topla(html_to_check)
-        payload = {
-            "javax.faces.partial.ajax": "true",
-            "javax.faces.source": target_btn_id,
-            "javax.faces.partial.execute": target_btn_id,
-            target_btn_id: target_btn_id,
-            "formLogo":"formLogo"
-        }
-        if current_vs:
-            payload["javax.faces.ViewState"] = current_vs
-            
-        final_payload = {**base_form_data, **payload}
 
         # İsteği fırlat ve sunucunun yeni durumunu (state) current_res üzerine yaz
         current_res = session.post(current_url, data=final_payload, headers={"Referer": current_url}, timeout=45)
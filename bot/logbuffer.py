@@ -0,0 +1,124 @@
+from collections import deque, namedtuple
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+import itertools
+import threading
+
+ICONS = {"success": "✅", "error": "❌", "warning": "⚠️", "info": "ℹ️"}
+
+# Aktif taslağın adı; add_log'a tag verilmezse buradan alınır.
+# asyncio task'ları ve asyncio.to_thread kendi kopyasını taşır, paralel lane'ler kendi değerini set eder.
+log_tag = ContextVar("log_tag", default=None)
+
+# Kayıt başına tahmini sabit maliyet (tuple, datetime, str başlıkları)
+_ENTRY_OVERHEAD = 200
+
+
+class LogEntry(namedtuple("LogEntry", "seq time level message tag")):
+    __slots__ = ()
+
+    def format(self):
+        prefix = f"[{self.tag}] " if self.tag else ""
+        return f"{self.time.strftime('%H:%M:%S')} {ICONS.get(self.level, 'ℹ️')} {prefix}{self.message}"
+
+
+@contextmanager
+def log_context(tag):
+    """Tags every add_log call inside the block with tag (usually the draft name)."""
+    token = log_tag.set(tag)
+    try:
+        yield
+    finally:
+        log_tag.reset(token)
+
+
+class LogBuffer:
+    """
+    Ring buffer of LogEntry with monotonically increasing sequence numbers.
+    Oldest entries are dropped when either `capacity` entries or roughly `max_bytes`
+    of messages are exceeded. Readers keep a cursor and call tail(since_seq).
+    Iterating yields formatted lines newest first (what the old deque of strings did).
+    """
+
+    def __init__(self, capacity=2000, max_bytes=2 * 1024 * 1024):
+        self.capacity = capacity
+        self.max_bytes = max_bytes
+        self._entries = deque()
+        self._bytes = 0
+        self._seq = itertools.count(1)
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def append(self, message, level="info", tag=None):
+        if tag is None:
+            tag = log_tag.get()
+        with self._lock:
+            entry = LogEntry(next(self._seq), datetime.now(), level, str(message), tag)
+            self._entries.append(entry)
+            self._bytes += len(entry.message) + _ENTRY_OVERHEAD
+            self._evict()
+        return entry.seq
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.capacity or self._bytes > self.max_bytes):
+            old = self._entries.popleft()
+            self._bytes -= len(old.message) + _ENTRY_OVERHEAD
+            self.dropped += 1
+
+    def configure(self, capacity=None, max_bytes=None):
+        with self._lock:
+            if capacity is not None: self.capacity = max(1, int(capacity))
+            if max_bytes is not None: self.max_bytes = max(1024, int(max_bytes))
+            self._evict()
+
+    def tail(self, since_seq=0, levels=None, tag=None, limit=None):
+        """
+        Entries with seq > since_seq, oldest first, optionally filtered by level(s) / tag.
+        Returns (entries, last_seq); pass last_seq back as since_seq on the next call.
+        """
+        with self._lock:
+            last_seq = self._entries[-1].seq if self._entries else since_seq
+            if not self._entries or last_seq <= since_seq:
+                return [], max(last_seq, since_seq)
+            # seq'ler ardışık: başlangıç indeksi doğrudan hesaplanır
+            start = max(0, since_seq - self._entries[0].seq + 1)
+            entries = list(itertools.islice(self._entries, start, None))
+        if levels:
+            entries = [e for e in entries if e.level in levels]
+        if tag is not None:
+            entries = [e for e in entries if e.tag == tag]
+        if limit is not None:
+            entries = entries[-limit:]
+        return entries, last_seq
+
+    @property
+    def first_seq(self):
+        with self._lock:
+            return self._entries[0].seq if self._entries else None
+
+    @property
+    def last_seq(self):
+        with self._lock:
+            return self._entries[-1].seq if self._entries else 0
+
+    @property
+    def approx_bytes(self):
+        return self._bytes
+
+    def tags(self):
+        with self._lock:
+            return sorted({e.tag for e in self._entries if e.tag})
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        with self._lock:
+            entries = list(self._entries)
+        return (e.format() for e in reversed(entries))
@@ -1,11 +1,24 @@
 from collections import deque
 from datetime import datetime
+import os
+import threading
+import time
 import requests
-from apscheduler.schedulers.background import BackgroundScheduler
 import pandas as pd
 
 from bot.constants import USER_AGENT
-from bot.scheduler import gorev
+from bot.scheduler import gorev, adaptif_gorev, on_isitma
+from bot.adaptive import AdaptiveSchedule
+from bot.continuous import RollingPipeline
+from bot.drafts import veriyi_dataframe_yap
+from bot.store import get_store
+from bot.logbuffer import LogBuffer
+from bot.metrics import HttpMetrics
+from bot.transport import ACCEPT_ENCODING, session_adapter
+from bot.tracing import Tracer, OtlpJsonFileExporter, record_http_span
+from bot.session_broker import SessionBroker, SessionBusy
+from bot.execution import get_execution_service
+from bot.stagger import CRON_SLOTS, cron_trigger_args, slot_offset, warmup_trigger_args
 
 class GlobalManager:
     def __init__(self, email, password, teams_webhook_url=None):
@@ -17,47 +30,252 @@ class GlobalManager:
         # 2. User-Specific Data
         # Structure: { "01.30.2026 14:00": { 'name':..., 'loc':... } }
         self.watch_list = {}
-        self.logs = deque(maxlen=50)
+        # Structured ring buffer (bot/logbuffer.py): seq numbers, levels, per-draft tags
+        self.logs = LogBuffer(capacity=2000, max_bytes=2 * 1024 * 1024)
         self.history = deque(maxlen=50)
         self.mile_threshold = 300
+        # Draft table parser backend: "auto" | "lxml" | "bs4" (see bot/parsers.py)
+        self.parser_backend = "auto"
 
         # Scheduling settings
         self.mins_threshold = 30
         self.scheduler_mode = "interval"
         self.is_running = False 
+        # "half_hourly" / "quarterly": staggered slots (bot/stagger.py)
+        self.stagger_window = 120  # seconds after the slot in which this user's sweep starts
+        self.stagger_account_s = 15  # account lanes of a sweep start spread over this many seconds
+        self.finish_by = None  # minutes after the slot the sweep should be done by (None: no deadline)
+        self.sweep_estimate = None  # seconds, moving average of the last sweeps
+        self.trigger_offset = None
+        self.warmup_lead = 45  # seconds before each slot the session is warmed up (0: off)
+        # "adaptive" mode: per-draft next checks (bot/adaptive.py), mins_threshold is the starting interval
+        self.adaptive = AdaptiveSchedule()
+        self.adaptive_tick = 60  # seconds between due-draft checks
+        self.adaptive_batch = 10  # drafts planned per tick at most (plan-job budget)
+        # "continuous" mode: rolling pipeline instead of periodic sweeps (bot/continuous.py)
+        self.pipeline = RollingPipeline(self)
+        self.continuous_inflight = 8  # drafts kept in flight
+        self.continuous_min_gap = 5  # minutes before the same draft is planned again
+
+        # Execution settings
+        # "sequential": one shared session, accounts switched between items
+        # "parallel": per-account isolated sessions on a bounded thread pool (bot/workers.py)
+        # "async": per-account isolated sessions, drafts as coroutines on one event loop (bot/async_pipeline.py)
+        self.execution_mode = "sequential"
+        self.max_workers = 4
+        self.async_max_inflight = 100
+        self.default_account_concurrency = 1
+        self.account_concurrency = {}  # { account_id: lanes }
+        self.account_workers = {}  # { (account_id, slot): AccountSession }
+        self.watch_list_lock = threading.RLock()
         
         # 3. Isolated Session
-        self.session = requests.Session()
-        self.session.headers.update({
-            "User-Agent": USER_AGENT,
-        })
+        self.http_metrics = HttpMetrics()  # every session of this user reports here (bot/metrics.py)
+        self.transport = None  # Recorder / Replayer (bot/replay.py); None: live site
+        # Per-draft phase traces (bot/tracing.py); HTTP calls become child spans of the active phase
+        trace_file = os.environ.get("TWD_TRACE_FILE")
+        self.tracer = Tracer(per_draft=20, exporter=OtlpJsonFileExporter(trace_file) if trace_file else None)
+        self.http_metrics.listeners.append(record_http_span)
+        self.session = self.new_session()
         self.available_accounts = [] 
         self.current_account_name = "Bilinmiyor"
         self.current_account_id = None
+        # Single-flight login + account context lock shared by the UI and scheduler threads (bot/session_broker.py)
+        self.broker = SessionBroker(self)
+        self.ui_lock_timeout = 20  # seconds the UI waits for the account context before giving up
+        self.sse_dispatcher = None  # shared job-status stream of self.session (bot/sse.py)
+        self.plan_job_timeout = 300  # seconds to wait for a create_plan job
+        self.sse_heartbeat_timeout = 45  # silent SSE stream is reopened after this many seconds
+
+        # 4. Scheduling: triggers and workers are shared by all users (bot/execution.py)
+        self.execution = get_execution_service()
+        self.job_id = f"user_task:{email}"
+        self.warmup_job_id = f"warmup:{email}"
+        self.weight = 1  # share of the shared workers / draft slots relative to other users
+
+        # 5. Draft List Cache (stale-while-revalidate)
+        # Structure: { account_id: {'df':..., 'error':..., 'fetched_at':..., 'version':..., 'refreshing':...} }
+        self.draft_cache = {}
+        self.draft_cache_ttl = 120  # seconds
+        self.draft_cache_version = 0
+        self._draft_cache_lock = threading.Lock()
+
+        # 6. Persistence (bot/store.py): every watch_list/history change is queued to the store
+        self.store = get_store()
+        self._state_loaded = False
+
+    def new_session(self, pool_size=4):
+        """
+        Creates a 2DWorkflow session with the bot's default headers, timeouts and retry policy (bot/transport.py).
+        pool_size: threads using the session at once. Default: UI, list refresh, scheduler and the SSE stream.
+        """
+        session = requests.Session()
+        session.headers.update({
+            "User-Agent": USER_AGENT,
+            "Accept-Encoding": ACCEPT_ENCODING,
+        })
+        adapter = session_adapter(self.http_metrics, pool_size, self.transport)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def set_transport(self, transport):
+        """Switches every session of this user to a Recorder / Replayer (None: back to the live site)."""
+        self.transport = transport
+        self.session = self.new_session()
+        self.broker.reset()
+        self.account_workers = {}
+        self.sse_dispatcher = None
+
+    def get_account_concurrency(self, account_id):
+        return self.account_concurrency.get(account_id, self.default_account_concurrency)
+
+    def add_log(self, message, type="info", tag=None):
+        """tag: draft the message belongs to; defaults to the active log_context."""
+        return self.logs.append(message, type, tag)
+
+    def set_log_limits(self, capacity=None, max_kb=None):
+        self.logs.configure(capacity, max_kb * 1024 if max_kb is not None else None)
+
+    def get_draft_snapshot(self, force=False):
+        """
+        Returns (df, hata) for the current account without hitting 2DWorkflow on every rerun.
+        - Fresh snapshot: served from cache.
+        - Stale snapshot (older than draft_cache_ttl): served as is, refreshed in the background.
+        - No snapshot or force=True: blocking fetch.
+        """
+        key = self.current_account_id
+        with self._draft_cache_lock:
+            snapshot = self.draft_cache.get(key)
+            needs_fetch = force or snapshot is None or snapshot["df"] is None
+            is_stale = snapshot is not None and time.time() - snapshot["fetched_at"] > self.draft_cache_ttl
+            if not needs_fetch and is_stale and not snapshot["refreshing"]:
+                snapshot["refreshing"] = True
+                threading.Thread(target=self._refresh_draft_snapshot, args=(key,), daemon=True).start()
+
+        if needs_fetch:
+            snapshot = self._refresh_draft_snapshot(key)
+
+        if snapshot["df"] is None:
+            return None, snapshot["error"]
 
-        # 4. User-Specific Scheduler
-        self.scheduler = BackgroundScheduler()
-        self.scheduler.start()
+        # Columns that depend on live settings are re-applied on every read
+        df = snapshot["df"].copy()
+        df["Seç"] = df["Created"].isin(list(self.watch_list.keys()))
+        df["Max Mil"] = self.mile_threshold
+        return df, None
 
-    def add_log(self, message, type="info"):
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        icon_map = {"success": "✅", "error": "❌", "warning": "⚠️", "info": "ℹ️"}
-        icon = icon_map.get(type, "ℹ️")
-        self.logs.appendleft(f"{timestamp} {icon} {message}")
+    def _refresh_draft_snapshot(self, key):
+        """
+        key: account the caller asked for. The list is stored under the account that was active
+        during the fetch, read under the same account lock (the scheduler may switch in between).
+        """
+        try:
+            with self.broker.account_context(timeout=self.ui_lock_timeout):
+                fetched_key = self.current_account_id
+                df, hata = veriyi_dataframe_yap(self)
+        except SessionBusy as e:
+            fetched_key, df, hata = key, None, str(e)
+        with self._draft_cache_lock:
+            requested = self.draft_cache.get(key)
+            if fetched_key != key and requested is not None:
+                requested["refreshing"] = False  # başka hesabın listesi geldi, bu hesap sonraki okumada tekrar denenir
+            key = fetched_key
+            previous = self.draft_cache.get(key)
+            if df is None and previous is not None and previous["df"] is not None:
+                # Keep serving the last good list, retry after the next TTL
+                snapshot = {**previous, "error": hata, "fetched_at": time.time(), "refreshing": False}
+            else:
+                if df is not None:
+                    self.draft_cache_version += 1
+                snapshot = {
+                    "df": df,
+                    "error": hata,
+                    "fetched_at": time.time(),
+                    "version": self.draft_cache_version,
+                    "refreshing": False,
+                }
+            self.draft_cache[key] = snapshot
+        return snapshot
+
+    def get_draft_snapshot_info(self):
+        """Age (seconds) and version of the current account's snapshot, or None."""
+        snapshot = self.draft_cache.get(self.current_account_id)
+        if not snapshot:
+            return None
+        return {
+            "age": time.time() - snapshot["fetched_at"],
+            "version": snapshot["version"],
+            "refreshing": snapshot["refreshing"],
+            "error": snapshot["error"],
+        }
+
+    def invalidate_draft_cache(self, drop=True):
+        """drop=True forces a blocking fetch on next read, drop=False only marks snapshots stale."""
+        with self._draft_cache_lock:
+            if drop:
+                self.draft_cache.clear()
+            else:
+                for snapshot in self.draft_cache.values():
+                    snapshot["fetched_at"] = 0
+
+    def load_state(self):
+        """Loads the persisted watch list and history once (items already in memory win)."""
+        with self.watch_list_lock:
+            if self._state_loaded:
+                return
+            self._state_loaded = True
+            try:
+                watch_list, history = self.store.load(self.email)
+            except Exception as e:
+                self.add_log(f"Kayıtlı takip listesi okunamadı: {e}", "error")
+                return
+            self.watch_list = {**watch_list, **self.watch_list}
+            self.history.extend(history)
+            if watch_list:
+                self.add_log(f"💾 {len(watch_list)} taslak kayıttan yüklendi.", "info")
+
+    def set_watch_item(self, key, item):
+        with self.watch_list_lock:
+            self.watch_list[key] = item
+            self.store.put_draft(self.email, key, item)
+
+    def remove_watch_item(self, key):
+        with self.watch_list_lock:
+            if self.watch_list.pop(key, None) is not None:
+                self.store.delete_draft(self.email, key)
 
     def start_bot_process(self):
         """Starts or Reschedules the job based on the selected mode"""
+        scheduler = self.execution.scheduler
+
+        # Sürekli mod tetik kullanmaz, kendi thread'inde çalışır
+        if self.scheduler_mode == "continuous":
+            if scheduler.get_job(self.job_id):
+                scheduler.remove_job(self.job_id)
+            self._schedule_warmup()
+            self.pipeline.start()
+            print(f"Scheduler updated: Mod: Sürekli ({self.continuous_inflight} eşzamanlı taslak)")
+            return
+        self.pipeline.stop()
         
         # 1. Determine Trigger Type
-        if self.scheduler_mode == "half_hourly":
-            # Run at :00 and :30
-            trigger_args = {'trigger': 'cron', 'minute': '0,30'}
-            log_msg = "Mod: Saat Başı ve Buçuk (xx:00, xx:30)"
+        func = gorev
+        if self.scheduler_mode == "adaptive":
+            # Sık tetiklenir ama sadece sırası gelen taslaklar planlanır
+            func = adaptif_gorev
+            trigger_args = {'trigger': 'interval', 'seconds': self.adaptive_tick}
+            log_msg = f"Mod: Uyarlamalı ({self.adaptive.min_interval}-{self.adaptive.max_interval} dk)"
+
+        elif self.scheduler_mode == "half_hourly":
+            # Run at :00 and :30 (+ this user's stagger offset)
+            trigger_args, self.trigger_offset = cron_trigger_args(self)
+            log_msg = f"Mod: Saat Başı ve Buçuk (xx:00, xx:30) +{self.trigger_offset} sn"
             
         elif self.scheduler_mode == "quarterly":
-            # Run at :00, :15, :30, :45
-            trigger_args = {'trigger': 'cron', 'minute': '0,15,30,45'}
-            log_msg = "Mod: Çeyrek Saatler (xx:00, xx:15...)"
+            # Run at :00, :15, :30, :45 (+ this user's stagger offset)
+            trigger_args, self.trigger_offset = cron_trigger_args(self)
+            log_msg = f"Mod: Çeyrek Saatler (xx:00, xx:15...) +{self.trigger_offset} sn"
             
         else:
             # Default: Interval
@@ -65,43 +283,92 @@ class GlobalManager:
             log_msg = f"Mod: Her {self.mins_threshold} dakikada bir"
 
         # 2. Add or Reschedule
-        if not self.scheduler.get_job('user_task'):
-            self.scheduler.add_job(
-                gorev, 
-                id='user_task', 
-                args=[self], 
-                max_instances=1,
+        # Tetik işi çalıştırmaz, sadece ortak kuyruğa ekler (ExecutionService.submit)
+        self.execution.ensure_started()
+        job = scheduler.get_job(self.job_id)
+        if job is not None and job.args[1] is not func:
+            # Mod değişti (tam tarama <-> uyarlamalı), iş fonksiyonu da değişmeli
+            scheduler.remove_job(self.job_id)
+            job = None
+        if job is None:
+            if func is adaptif_gorev:
+                trigger_args['next_run_time'] = datetime.now()
+            scheduler.add_job(
+                self.execution.submit,
+                id=self.job_id,
+                args=[self, func],
+                # Uyarlamalı mod her dakika tetiklenir, önceki tur sürerken atlanması normaldir
+                kwargs={'announce': func is not adaptif_gorev},
                 **trigger_args
             )
         else:
-            self.scheduler.reschedule_job('user_task', **trigger_args)
+            scheduler.reschedule_job(self.job_id, **trigger_args)
+        self._schedule_warmup()
             
         # Optional: Log the change internally if needed (mostly for debugging)
         print(f"Scheduler updated: {log_msg}")
 
+    def _schedule_warmup(self):
+        """Cron modes: warm-up job (on_isitma) warmup_lead seconds before every slot; removed otherwise."""
+        scheduler = self.execution.scheduler
+        if self.scheduler_mode not in CRON_SLOTS or not self.warmup_lead:
+            if scheduler.get_job(self.warmup_job_id):
+                scheduler.remove_job(self.warmup_job_id)
+            return
+        trigger_args = warmup_trigger_args(self, self.trigger_offset or 0)
+        if scheduler.get_job(self.warmup_job_id):
+            scheduler.reschedule_job(self.warmup_job_id, **trigger_args)
+        else:
+            scheduler.add_job(self.execution.submit, id=self.warmup_job_id, args=[self, on_isitma],
+                              kwargs={'key': 'warmup', 'announce': False}, **trigger_args)
+
     def stop_bot_process(self):
-        if self.scheduler.get_job('user_task'):
-            self.scheduler.remove_job('user_task')
+        self.pipeline.stop()
+        self.execution.cancel(self)
+        for job_id in (self.job_id, self.warmup_job_id):
+            if self.execution.scheduler.get_job(job_id):
+                self.execution.scheduler.remove_job(job_id)
+
+    def sweep_finished(self, seconds):
+        """Updates the sweep duration estimate; cron modes move the trigger if the deadline needs it."""
+        self.sweep_estimate = seconds if self.sweep_estimate is None else 0.7 * self.sweep_estimate + 0.3 * seconds
+        if self.scheduler_mode not in CRON_SLOTS or not self.is_running:
+            return
+        if self.finish_by is not None and seconds + (self.trigger_offset or 0) > self.finish_by * 60:
+            self.add_log(f"⚠️ Tarama {seconds / 60:.1f} dk sürdü, slottan sonra {self.finish_by} dk içinde bitirme hedefi aşıldı.", "warning")
+        if slot_offset(self) != self.trigger_offset:
+            self.start_bot_process()
+
+    def next_run_time(self):
+        """Next trigger of the user's job, None when no job is scheduled."""
+        job = self.execution.scheduler.get_job(self.job_id)
+        return job.next_run_time if job else None
+
+    def run_now(self):
+        """Queues one full sweep right away. Returns False if a sweep is already queued or running."""
+        return self.execution.submit(self, gorev)
             
     def update_watch_list_from_df(self, df_records):
-        new_watch_list = {}
-        for item in df_records:
-            key = item['draft_id']
-            final_item = item.copy()
+        with self.watch_list_lock:
+            new_watch_list = {}
+            for item in df_records:
+                key = item['draft_id']
+                final_item = item.copy()
             
-            if key in self.watch_list:
-                existing = self.watch_list[key]
-                final_item['found_warehouses'] = existing.get('found_warehouses', [])
-                final_item['account_id'] = existing.get('account_id')
-                final_item['account_name'] = existing.get('account_name')
-                final_item['date'] = existing.get('date')
-            else:
-                if 'found_warehouses' not in final_item:
-                    final_item['found_warehouses'] = []
+                if key in self.watch_list:
+                    existing = self.watch_list[key]
+                    final_item['found_warehouses'] = existing.get('found_warehouses', [])
+                    final_item['account_id'] = existing.get('account_id')
+                    final_item['account_name'] = existing.get('account_name')
+                    final_item['date'] = existing.get('date')
+                else:
+                    if 'found_warehouses' not in final_item:
+                        final_item['found_warehouses'] = []
 
-            new_watch_list[key] = final_item
+                new_watch_list[key] = final_item
         
-        self.watch_list = new_watch_list
+            self.watch_list = new_watch_list
+            self.store.replace_watch_list(self.email, new_watch_list)
 
     def get_watch_list_df(self):
         """
@@ -130,5 +397,11 @@ class GlobalManager:
             "time": timestamp
         }
         self.history.appendleft(entry)
+        self.store.add_history(self.email, entry)
+
+    def clear_history(self):
+        self.history.clear()
+        self.store.clear_history(self.email)
+
     def set_mile_threshold(self, mile):
         self.mile_threshold = mile
\ No newline at end of file
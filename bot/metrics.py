@@ -0,0 +1,241 @@
+from collections import deque
+import threading
+import time
+from urllib.parse import urlsplit
+
+import httpx
+from requests.adapters import HTTPAdapter
+
+from bot.constants import LOGIN_URL, DRAFT_PAGE_URL, PLAN_URL
+
+# Prometheus histogram sınırları (saniye)
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_ENDPOINTS = (
+    (LOGIN_URL, "login"),
+    (DRAFT_PAGE_URL, "draft"),
+    (PLAN_URL, "draftplan"),
+)
+_WEBHOOK_HOSTS = ("webhook.office.com", "logic.azure.com", "powerplatform.com")
+
+
+def endpoint_label(url):
+    """Short endpoint name of a request url: login, draft, draftplan, sse, teams or host/path."""
+    url = str(url)
+    base = url.split("?", 1)[0]
+    for prefix, label in _ENDPOINTS:
+        if base == prefix:
+            return label
+    parts = urlsplit(url)
+    if parts.path.startswith("/api/sse/"):
+        return "sse"
+    if any(parts.hostname and parts.hostname.endswith(host) for host in _WEBHOOK_HOSTS):
+        return "teams"
+    return f"{parts.hostname}{parts.path}"
+
+
+class _Series:
+    """Counters of one (endpoint, method) pair."""
+
+    def __init__(self, reservoir):
+        self.count = 0
+        self.errors = 0
+        self.retries = 0
+        self.statuses = {}
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.latency_sum = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.samples = deque(maxlen=reservoir)  # son N gecikme, yüzdelikler için
+
+
+class HttpMetrics:
+    """
+    Per-endpoint HTTP metrics of one manager: request counts, status codes, latency
+    percentiles and histogram, request/response bytes, retries and transport errors.
+    Filled by InstrumentedAdapter (requests) and InstrumentedAsyncTransport (httpx).
+    """
+
+    def __init__(self, reservoir=2048):
+        self.reservoir = reservoir
+        self.started_at = time.time()
+        self._series = {}
+        self._lock = threading.Lock()
+        self.listeners = []  # callables(endpoint, method, status, started, elapsed), e.g. tracing
+
+    def record(self, url, method, status, elapsed, bytes_out=0, bytes_in=0, retries=0, started=None):
+        """status: HTTP status code, or None for a transport error (timeout, connection reset)."""
+        endpoint = endpoint_label(url)
+        with self._lock:
+            series = self._series.get((endpoint, method))
+            if series is None:
+                series = self._series[(endpoint, method)] = _Series(self.reservoir)
+            series.count += 1
+            series.retries += retries
+            series.bytes_out += bytes_out
+            series.bytes_in += bytes_in
+            status_key = str(status) if status is not None else "error"
+            series.statuses[status_key] = series.statuses.get(status_key, 0) + 1
+            if status is None or status >= 500:
+                series.errors += 1
+            series.latency_sum += elapsed
+            series.samples.append(elapsed)
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if elapsed <= bound:
+                    series.buckets[i] += 1
+                    break
+        for listener in list(self.listeners):
+            try:
+                listener(endpoint, method, status, started if started is not None else time.time() - elapsed, elapsed)
+            except Exception as e:
+                print(f"Metrik dinleyici hatası: {e}")
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+            self.started_at = time.time()
+
+    @staticmethod
+    def _percentile(sorted_samples, q):
+        if not sorted_samples:
+            return None
+        index = min(len(sorted_samples) - 1, int(round(q * (len(sorted_samples) - 1))))
+        return sorted_samples[index]
+
+    def summary(self):
+        """One dict per (endpoint, method), latencies in milliseconds, sorted by total time."""
+        with self._lock:
+            items = [(key, s, sorted(s.samples)) for key, s in self._series.items()]
+        rows = []
+        for (endpoint, method), s, samples in items:
+            p50, p95, p99 = (self._percentile(samples, q) for q in (0.5, 0.95, 0.99))
+            rows.append({
+                "endpoint": endpoint,
+                "method": method,
+                "count": s.count,
+                "errors": s.errors,
+                "retries": s.retries,
+                "statuses": ", ".join(f"{k}×{v}" for k, v in sorted(s.statuses.items())),
+                "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+                "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+                "p99_ms": round(p99 * 1000, 1) if p99 is not None else None,
+                "total_s": round(s.latency_sum, 2),
+                "kb_out": round(s.bytes_out / 1024, 1),
+                "kb_in": round(s.bytes_in / 1024, 1),
+            })
+        rows.sort(key=lambda r: r["total_s"], reverse=True)
+        return rows
+
+    def to_prometheus(self, prefix="twd_http", labels=None):
+        """Prometheus text exposition format (counters and a latency histogram)."""
+        extra = "".join(f',{k}="{v}"' for k, v in (labels or {}).items())
+        with self._lock:
+            items = sorted(self._series.items())
+            lines = [
+                f"# HELP {prefix}_requests_total HTTP requests by endpoint, method and status.",
+                f"# TYPE {prefix}_requests_total counter",
+            ]
+            for (endpoint, method), s in items:
+                for status, n in sorted(s.statuses.items()):
+                    lines.append(f'{prefix}_requests_total{{endpoint="{endpoint}",method="{method}",status="{status}"{extra}}} {n}')
+
+            lines += [
+                f"# HELP {prefix}_request_duration_seconds Time until the response body was read.",
+                f"# TYPE {prefix}_request_duration_seconds histogram",
+            ]
+            for (endpoint, method), s in items:
+                base = f'endpoint="{endpoint}",method="{method}"{extra}'
+                cumulative = 0
+                for bound, n in zip(LATENCY_BUCKETS, s.buckets):
+                    cumulative += n
+                    lines.append(f'{prefix}_request_duration_seconds_bucket{{{base},le="{bound}"}} {cumulative}')
+                lines.append(f'{prefix}_request_duration_seconds_bucket{{{base},le="+Inf"}} {s.count}')
+                lines.append(f"{prefix}_request_duration_seconds_sum{{{base}}} {s.latency_sum:.6f}")
+                lines.append(f"{prefix}_request_duration_seconds_count{{{base}}} {s.count}")
+
+            for name, attr, help_text in (
+                    ("request_bytes_total", "bytes_out", "Request body bytes sent."),
+                    ("response_bytes_total", "bytes_in", "Response bytes received (wire size when known)."),
+                    ("retries_total", "retries", "Transport level retries."),
+                    ("errors_total", "errors", "Transport errors and 5xx responses.")):
+                lines += [f"# HELP {prefix}_{name} {help_text}", f"# TYPE {prefix}_{name} counter"]
+                for (endpoint, method), s in items:
+                    lines.append(f'{prefix}_{name}{{endpoint="{endpoint}",method="{method}"{extra}}} {getattr(s, attr)}')
+        return "\n".join(lines) + "\n"
+
+
+def _body_size(body):
+    if body is None:
+        return 0
+    if isinstance(body, (bytes, bytearray, str)):
+        return len(body)
+    return 0  # generator / file bodies are not measured
+
+
+class InstrumentedAdapter(HTTPAdapter):
+    """
+    requests transport adapter that records every request into HttpMetrics.
+    Non-streamed bodies are read here (requests reads them right after anyway), so the
+    latency covers the full download; streamed responses (SSE, stream=True) are timed to
+    the headers and sized by Content-Length.
+    """
+
+    def __init__(self, metrics, *args, timeout=None, socket_options=None, **kwargs):
+        """timeout: default for requests sent without one. socket_options: urllib3 socket options."""
+        self.metrics = metrics
+        self.default_timeout = timeout
+        self.socket_options = socket_options
+        super().__init__(*args, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        if self.socket_options is not None:
+            kwargs["socket_options"] = self.socket_options
+        super().init_poolmanager(*args, **kwargs)
+
+    def send(self, request, stream=False, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.default_timeout
+        started = time.time()
+        start = time.perf_counter()
+        try:
+            response = super().send(request, stream=stream, **kwargs)
+        except Exception:
+            self.metrics.record(request.url, request.method, None, time.perf_counter() - start,
+                                _body_size(request.body), started=started)
+            raise
+
+        if stream:
+            bytes_in = int(response.headers.get("Content-Length") or 0)
+        else:
+            content = response.content
+            wire = response.raw.tell() if hasattr(response.raw, "tell") else 0
+            bytes_in = wire or len(content)
+        history = getattr(getattr(response.raw, "retries", None), "history", None) or ()
+        self.metrics.record(request.url, request.method, response.status_code, time.perf_counter() - start,
+                            _body_size(request.body), bytes_in, len(history), started=started)
+        return response
+
+
+class InstrumentedAsyncTransport(httpx.AsyncBaseTransport):
+    """httpx counterpart of InstrumentedAdapter for the async pipeline."""
+
+    def __init__(self, metrics, transport):
+        self.metrics = metrics
+        self.transport = transport
+
+    async def handle_async_request(self, request):
+        started = time.time()
+        start = time.perf_counter()
+        try:
+            response = await self.transport.handle_async_request(request)
+            content = await response.aread()
+        except Exception:
+            self.metrics.record(request.url, request.method, None, time.perf_counter() - start,
+                                len(request.content), started=started)
+            raise
+        self.metrics.record(request.url, request.method, response.status_code, time.perf_counter() - start,
+                            len(request.content), len(content), started=started)
+        return response
+
+    async def aclose(self):
+        await self.transport.aclose()
@@ -1,13 +1,24 @@
+import atexit
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
 import requests
+from requests.adapters import HTTPAdapter
 
+from bot.constants import USER_AGENT
 
-def teams_bildirim_gonder(mgr, title, message, facts=None, status="info"):
+# Teams bildirimleri arka planda gider: analizi_yap sadece kuyruğa ekler, webhook POST'u
+# planlama akışını hiç bekletmez. Aynı kontrol döngüsündeki bildirimler tek bir özet
+# kartında birleşir (gorev sonunda teams_ozetini_gonder), her webhook için hız sınırı vardır.
+
+
+def kart_govdesi(title, message, facts=None, status="info"):
     """
-    Sends a high-contrast Adaptive Card with dividers between items.
+    Body elements of a high-contrast Adaptive Card with dividers between items.
     """
     # 1. Color and Icon Logic
-    if not mgr.teams_webhook_url:
-        return False
     status_map = {
         "success": ("good", "✅"), 
         "error": ("attention", "❌"), 
@@ -103,8 +114,12 @@ def teams_bildirim_gonder(mgr, title, message, facts=None, status="info"):
             "items": [list_container]
         })
 
-    # 4. Final Payload
-    payload = {
+    return card_body
+
+
+def adaptive_card(card_body):
+    """Teams webhook payload of an Adaptive Card."""
+    return {
         "type": "message",
         "attachments": [
             {
@@ -121,10 +136,260 @@ def teams_bildirim_gonder(mgr, title, message, facts=None, status="info"):
         ]
     }
 
+
+def ozet_karti(items, owner=None):
+    """One card for a batch of notifications; a single notification keeps its own card."""
+    if len(items) == 1:
+        return adaptive_card(kart_govdesi(**items[0]))
+    header = f"📬 {len(items)} Yeni Bildirim" + (f" · {owner}" if owner else "")
+    card_body = [{"type": "TextBlock", "text": header, "weight": "Bolder", "size": "Large", "wrap": True}]
+    for item in items:
+        card_body.append({
+            "type": "Container",
+            "separator": True,
+            "spacing": "Large",
+            "items": kart_govdesi(**item),
+        })
+    return adaptive_card(card_body)
+
+
+def _retry_after(response):
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
     try:
-        response = mgr.session.post(mgr.teams_webhook_url, json=payload, timeout=10)
-        if response.status_code not in [200, 202]:
-            print(f"❌ Teams Hatası: {response.status_code}")
-    except Exception as e:
-        print(f"❌ Teams Bağlantı Hatası: {e}")
+        return max(0.0, float(value))
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+class _RateLimit:
+    """Token bucket of one webhook (Teams throttles bursts with 429)."""
+
+    def __init__(self, per_minute, burst):
+        self.rate = per_minute / 60
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.not_before = 0.0  # Retry-After
+
+    def ready_at(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            return max(now, self.not_before)
+        return max(now + (1 - self.tokens) / self.rate, self.not_before)
+
+    def take(self):
+        self.tokens -= 1
+
+
+class TeamsNotifier:
+    """
+    Process-wide background sender for Teams webhooks (users may share one webhook).
+
+    Notifications are grouped per (webhook, owner) and go out as one digest card when the
+    owner's check cycle ends (flush) or max_linger seconds after the first one. Every webhook
+    has its own rate limit; connection errors, 429 and 5xx are retried up to max_attempts
+    times with jittered backoff (Retry-After wins). Uses its own requests.Session, so the
+    2DWorkflow cookies and connection pool are never involved.
+    """
+
+    def __init__(self, max_linger=60, per_minute=30, burst=4, max_attempts=4, max_batch=15,
+                 max_pending=500, timeout=10):
+        self.max_linger = max_linger
+        self.per_minute = per_minute
+        self.burst = burst
+        self.max_attempts = max_attempts
+        self.max_batch = max_batch  # Adaptive Card size limit (~28 KB)
+        self.max_pending = max_pending
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = USER_AGENT
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=2)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._batches = []
+        self._limits = {}
+        self._pending = 0
+        self._cond = threading.Condition()
+        self._thread = None
+        self._closing = False
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def submit(self, url, item, owner=None, metrics=None, log=None):
+        """
+        Queues item ({title, message, facts, status}) for url. Returns False if the queue is full.
+        metrics: HttpMetrics the webhook calls are recorded in. log: add_log for delivery errors.
+        """
+        with self._cond:
+            if self._pending >= self.max_pending:
+                self.dropped += 1
+                print(f"⚠️ Teams kuyruğu dolu, bildirim atlandı: {item.get('title')}")
+                return False
+            batch = next((b for b in self._batches if b["open"] and b["url"] == url and b["owner"] == owner), None)
+            if batch is None:
+                batch = {"url": url, "owner": owner, "items": [], "metrics": metrics, "log": log, "open": True,
+                         "due": time.monotonic() + self.max_linger, "not_before": 0.0, "attempt": 0}
+                self._batches.append(batch)
+            batch["items"].append(item)
+            self._pending += 1
+            self._start()
+            self._cond.notify()
+        return True
+
+    def flush(self, url=None, owner=None):
+        """Sends the open batches of (url, owner) now; url=None: every batch."""
+        with self._cond:
+            for batch in self._batches:
+                if url is None or (batch["url"] == url and batch["owner"] == owner):
+                    batch["due"] = 0.0
+            self._cond.notify()
+
+    def pending(self):
+        with self._cond:
+            return self._pending
+
+    def close(self, timeout=5):
+        """Flushes everything and waits up to timeout seconds for the sender."""
+        with self._cond:
+            self._closing = True
+            self._cond.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="teams-notifier", daemon=True)
+            self._thread.start()
+
+    def _limit(self, url):
+        limit = self._limits.get(url)
+        if limit is None:
+            limit = self._limits[url] = _RateLimit(self.per_minute, self.burst)
+        return limit
+
+    def _next_batch(self):
+        """(batch to send now, None) or (None, seconds until the next one is due)."""
+        now = time.monotonic()
+        best, wait = None, None
+        for batch in self._batches:
+            due = batch["not_before"] if self._closing else max(batch["due"], batch["not_before"])
+            ready_at = max(due, self._limit(batch["url"]).ready_at(now))
+            if ready_at <= now:
+                if best is None or batch["due"] < best["due"]:
+                    best = batch
+            elif wait is None or ready_at - now < wait:
+                wait = ready_at - now
+        return best, wait
+
+    def _run(self):
+        while True:
+            with self._cond:
+                batch, wait = self._next_batch()
+                while batch is None:
+                    if self._closing and not self._batches:
+                        return
+                    self._cond.wait(wait)
+                    batch, wait = self._next_batch()
+                self._batches.remove(batch)
+                batch["open"] = False
+                if len(batch["items"]) > self.max_batch:
+                    rest = {**batch, "items": batch["items"][self.max_batch:]}
+                    batch["items"] = batch["items"][:self.max_batch]
+                    self._batches.append(rest)
+                self._limit(batch["url"]).take()
+            try:
+                self._send(batch)
+            except Exception as e:
+                self._done(batch, f"beklenmeyen hata: {e}")
+
+    def _send(self, batch):
+        payload = ozet_karti(batch["items"], batch["owner"])
+        started = time.time()
+        start = time.perf_counter()
+        status, retry_after, hata, body = None, None, None, b""
+        try:
+            response = self.session.post(batch["url"], json=payload, timeout=self.timeout)
+            status, body = response.status_code, response.content
+            retry_after = _retry_after(response)
+            # Eski connector webhook'ları kısıtlamayı 200 + hata metniyle bildirir
+            if status == 200 and b"429" in body[:200]:
+                status = 429
+            if status not in (200, 202):
+                hata = f"HTTP {status}"
+        except requests.RequestException as e:
+            hata = str(e) or type(e).__name__
+        if batch["metrics"] is not None:
+            batch["metrics"].record(batch["url"], "POST", status, time.perf_counter() - start, 0, len(body),
+                                    batch["attempt"], started=started)
+
+        if hata is None:
+            self._done(batch)
+            return
+        retryable = status is None or status == 429 or status >= 500
+        if not retryable or batch["attempt"] + 1 >= self.max_attempts:
+            self._done(batch, hata)
+            return
+
+        batch["attempt"] += 1
+        delay = retry_after if retry_after is not None else min(60, 2 ** batch["attempt"]) * (0.5 + random.random())
+        print(f"⚠️ Teams bildirimi tekrar denenecek ({batch['attempt']}. deneme, {delay:.0f} sn sonra): {hata}")
+        with self._cond:
+            batch["not_before"] = time.monotonic() + delay
+            if status == 429:
+                self._limit(batch["url"]).not_before = batch["not_before"]
+            self._batches.append(batch)
+            self._cond.notify()
+
+    def _done(self, batch, hata=None):
+        with self._cond:
+            self._pending -= len(batch["items"])
+            if hata is None:
+                self.sent += len(batch["items"])
+            else:
+                self.failed += len(batch["items"])
+        if hata is not None:
+            print(f"❌ Teams Hatası: {hata}")
+            if batch["log"] is not None:
+                batch["log"](f"❌ {len(batch['items'])} Teams bildirimi gönderilemedi: {hata}", "error")
+
+
+_notifier = None
+_notifier_lock = threading.Lock()
+
+
+def get_notifier():
+    """The process-wide TeamsNotifier (created lazily, flushed at exit)."""
+    global _notifier
+    with _notifier_lock:
+        if _notifier is None:
+            _notifier = TeamsNotifier()
+            atexit.register(_notifier.close)
+        return _notifier
+
+
+def teams_bildirim_gonder(mgr, title, message, facts=None, status="info"):
+    """
+    Queues an Adaptive Card notification; it is sent in the background by TeamsNotifier,
+    together with the other notifications of the same check cycle.
+    """
+    if not mgr.teams_webhook_url:
+        return False
+    item = {"title": title, "message": message, "facts": dict(facts) if facts else None, "status": status}
+    return get_notifier().submit(mgr.teams_webhook_url, item, owner=mgr.email,
+                                 metrics=mgr.http_metrics, log=mgr.add_log)
+
 
+def teams_ozetini_gonder(mgr):
+    """End of a check cycle: sends the notifications of this cycle as one digest card."""
+    if mgr.teams_webhook_url:
+        get_notifier().flush(mgr.teams_webhook_url, mgr.email)
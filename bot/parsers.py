@@ -0,0 +1,193 @@
+from urllib.parse import urlparse, parse_qs
+
+from bs4 import BeautifulSoup
+
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:  # lxml yoksa BeautifulSoup yoluna düşülür
+    lxml = None
+
+# Tags whose strings BeautifulSoup's get_text() skips (Script/Stylesheet/TemplateString)
+_NON_TEXT_TAGS = {"script", "style", "template"}
+
+
+def _draft_id_from_href(href):
+    if not href:
+        return None, None
+    query_params = parse_qs(urlparse(href).query)
+    return href, query_params.get('id', [None])[0]
+
+
+def _draft_rows_bs4(html_content, encoding=None):
+    """Reference backend: full html.parser tree, same lookups as the original parser."""
+    if isinstance(html_content, bytes):
+        html_content = html_content.decode(encoding or "utf-8", errors="replace")
+    soup = BeautifulSoup(html_content, 'html.parser')
+    rows = soup.find_all("tr", role="row")
+
+    veri_listesi = []
+    for row in rows:
+        cells = row.find_all("td")
+        if not cells or len(cells) < 11: continue
+        try:
+            name_input = cells[2].find("input")
+            draft_name = name_input['value'] if name_input else cells[2].get_text(strip=True)
+            name_input_id = name_input["id"]
+            cell_editor_id = None
+            if name_input:
+                editor_div = name_input.find_parent("div", class_="ui-cell-editor")
+                if editor_div and editor_div.has_attr("id"):
+                    cell_editor_id = editor_div["id"]
+            open_link = row.find("a", title="Open Draft Shipment")
+            if not open_link: open_link = cells[1].find("a")
+            row_action_id = open_link.get("id") if open_link else None
+
+            # Copy butonu bulma
+            copy_link = row.find("a", title=lambda x: x and ("duplicate" in x.lower() or "copy" in x.lower()))
+            if not copy_link:
+                copy_icon = row.find("span", class_=lambda x: x and ("copy" in x or "clone" in x))
+                if copy_icon: copy_link = copy_icon.find_parent("a")
+            copy_action_id = copy_link.get("id") if copy_link else None
+
+            href, draft_id = _draft_id_from_href(open_link.get("href"))
+
+            veri_listesi.append({
+                "Draft Name": draft_name,
+                "Draft Id": draft_id,
+                "From": cells[3].get_text(strip=True),
+                "SKUs": cells[7].get_text(strip=True),
+                "Units": cells[8].get_text(strip=True),
+                "Created": cells[9].get_text(strip=True),
+                "Action ID": row_action_id,
+                "Copy ID": copy_action_id,
+                "Name Input ID": name_input_id,
+                "Link": href,
+                "UI Cell Editor": cell_editor_id
+            })
+        except Exception as e:
+            print(e)
+            continue
+    return veri_listesi
+
+
+def lxml_root(html_content, encoding=None):
+    """Parses raw response bytes (or text) into an lxml.html tree. Returns None on an empty document."""
+    if isinstance(html_content, str):
+        # Unicode input with an XML declaration is rejected by libxml2, so go through bytes.
+        html_content, encoding = html_content.encode("utf-8"), "utf-8"
+    if not html_content:
+        return None
+    parser = lxml.html.HTMLParser(encoding=encoding or "utf-8", huge_tree=True)
+    try:
+        # document_fromstring always returns <html>, so fragments are searchable with .iter() too
+        return lxml.html.document_fromstring(html_content, parser=parser)
+    except etree.ParserError:
+        return None
+
+
+def lxml_text(el):
+    """Equivalent of BeautifulSoup's get_text(strip=True) for an lxml element."""
+    parts = []
+
+    def walk(node):
+        if isinstance(node.tag, str) and node.tag not in _NON_TEXT_TAGS and node.text:
+            parts.append(node.text)
+        for child in node:
+            walk(child)
+            if child.tail:
+                parts.append(child.tail)
+
+    walk(el)
+    return "".join(s.strip() for s in parts)
+
+
+def _first(el, tag, predicate=None):
+    for node in el.iter(tag):
+        if node is not el and (predicate is None or predicate(node)):
+            return node
+    return None
+
+
+def _copy_title(node):
+    title = node.get("title")
+    return bool(title) and ("duplicate" in title.lower() or "copy" in title.lower())
+
+
+def _copy_icon(node):
+    cls = node.get("class")
+    return bool(cls) and ("copy" in cls or "clone" in cls)
+
+
+def _draft_rows_lxml(html_content, encoding=None):
+    """C-backed backend: parses the bytes once and only walks tr[role=row] subtrees."""
+    return draft_rows_from_tree(lxml_root(html_content, encoding))
+
+
+def draft_rows_from_tree(root):
+    """lxml backend on an already parsed tree (see bot.jsf.JsfPage)."""
+    if root is None:
+        return []
+
+    veri_listesi = []
+    for row in root.iter("tr"):
+        if row.get("role") != "row": continue
+        cells = [td for td in row.iter("td") if td is not row]
+        if len(cells) < 11: continue
+        try:
+            name_input = _first(cells[2], "input")
+            draft_name = name_input.attrib['value'] if name_input is not None else lxml_text(cells[2])
+            name_input_id = name_input.attrib["id"]
+            cell_editor_id = None
+            for editor_div in name_input.iterancestors("div"):
+                if "ui-cell-editor" in (editor_div.get("class") or "").split():
+                    cell_editor_id = editor_div.get("id")
+                    break
+            open_link = _first(row, "a", lambda n: n.get("title") == "Open Draft Shipment")
+            if open_link is None: open_link = _first(cells[1], "a")
+            row_action_id = open_link.get("id") if open_link is not None else None
+
+            copy_link = _first(row, "a", _copy_title)
+            if copy_link is None:
+                copy_icon = _first(row, "span", _copy_icon)
+                if copy_icon is not None: copy_link = next(copy_icon.iterancestors("a"), None)
+            copy_action_id = copy_link.get("id") if copy_link is not None else None
+
+            href, draft_id = _draft_id_from_href(open_link.get("href"))
+
+            veri_listesi.append({
+                "Draft Name": draft_name,
+                "Draft Id": draft_id,
+                "From": lxml_text(cells[3]),
+                "SKUs": lxml_text(cells[7]),
+                "Units": lxml_text(cells[8]),
+                "Created": lxml_text(cells[9]),
+                "Action ID": row_action_id,
+                "Copy ID": copy_action_id,
+                "Name Input ID": name_input_id,
+                "Link": href,
+                "UI Cell Editor": cell_editor_id
+            })
+        except Exception as e:
+            print(e)
+            continue
+    return veri_listesi
+
+
+DRAFT_TABLE_BACKENDS = {"bs4": _draft_rows_bs4}
+if lxml is not None:
+    DRAFT_TABLE_BACKENDS["lxml"] = _draft_rows_lxml
+
+
+def resolve_backend(backend="auto"):
+    if backend == "auto" or backend not in DRAFT_TABLE_BACKENDS:
+        return "lxml" if "lxml" in DRAFT_TABLE_BACKENDS else "bs4"
+    return backend
+
+
+def draft_table_rows(html_content, encoding=None, backend="auto"):
+    """
+    Returns the draft table rows as a list of dicts.
+    backend: "auto" (fastest available), "lxml" or "bs4".
+    """
+    return DRAFT_TABLE_BACKENDS[resolve_backend(backend)](html_content, encoding)
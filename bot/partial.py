@@ -0,0 +1,109 @@
+import io
+
+from lxml import etree
+
+# JSF partial-response okuyucu.
+# <partial-response> tek geçişte (iterparse) okunur; update blokları CDATA metni olarak
+# döner, HTML'e çevirmek çağırana kalır. Böylece sadece ihtiyaç duyulan blok parse edilir.
+
+VIEWSTATE = "javax.faces.ViewState"
+
+_TAGS = ("update", "redirect", "extension", "error", "eval")
+
+
+def _source(obj):
+    """bytes/str, file-like veya response -> okunabilir kaynak."""
+    if isinstance(obj, str):
+        return io.BytesIO(obj.encode("utf-8"))
+    if isinstance(obj, (bytes, bytearray)):
+        return io.BytesIO(obj)
+    if hasattr(obj, "read"):
+        return obj
+    # requests: stream=True ile açılmış ve henüz okunmamış yanıt doğrudan soketten okunur
+    if is_streaming(obj):
+        obj.raw.decode_content = True
+        return obj.raw
+    return io.BytesIO(obj.content)
+
+
+def is_streaming(res):
+    """True if res is a requests stream=True response whose body has not been read yet."""
+    return getattr(res, "_content", None) is False and getattr(res, "raw", None) is not None
+
+
+def _wanted(updates, update_id):
+    if updates is None:
+        return True
+    if callable(updates):
+        return updates(update_id)
+    return update_id in updates
+
+
+def iter_partial_response(source, updates=None):
+    """
+    Reads a JSF partial-response in one pass and yields (kind, key, value) in document order:
+        ("update", id, cdata)        - only ids accepted by `updates` (None: all, set of ids or a callable)
+        ("viewstate", id, value)
+        ("redirect", None, url)
+        ("extension", attrs, text)   - e.g. PrimeFaces callback args {"validationFailed":true}
+        ("error", error_name, error_message)
+        ("eval", None, script)
+    source: bytes/str, a file-like object, or a response (stream=True responses are read from .raw).
+    Handled elements are cleared right away, so memory stays flat on big replies.
+    """
+    context = etree.iterparse(_source(source), events=("end",), tag=_TAGS,
+                              huge_tree=True, recover=True, resolve_entities=False)
+    try:
+        for _, el in context:
+            tag = el.tag
+            if tag == "update":
+                update_id = el.get("id", "")
+                if VIEWSTATE in update_id:
+                    yield "viewstate", update_id, el.text or ""
+                elif _wanted(updates, update_id):
+                    yield "update", update_id, el.text or ""
+            elif tag == "redirect":
+                yield "redirect", None, el.get("url")
+            elif tag == "extension":
+                yield "extension", dict(el.attrib), el.text or ""
+            elif tag == "error":
+                yield "error", el.findtext("error-name"), el.findtext("error-message")
+            elif tag == "eval":
+                yield "eval", None, el.text or ""
+
+            el.clear(keep_tail=True)
+            parent = el.getparent()
+            if parent is not None:
+                while el.getprevious() is not None:
+                    del parent[0]
+    except etree.XMLSyntaxError:
+        return  # boş/bozuk yanıt: okunabilen kısım zaten döndü
+
+
+class PartialResponse:
+    """Everything iter_partial_response yields, collected from one pass."""
+
+    def __init__(self, source, updates=None):
+        self.updates = {}
+        self.viewstate = None
+        self.redirect = None
+        self.extensions = []
+        self.errors = []
+        self.scripts = []
+        for kind, key, value in iter_partial_response(source, updates):
+            if kind == "update":
+                self.updates[key] = value
+            elif kind == "viewstate":
+                if self.viewstate is None: self.viewstate = value
+            elif kind == "redirect":
+                self.redirect = value
+            elif kind == "extension":
+                self.extensions.append((key, value))
+            elif kind == "error":
+                self.errors.append((key, value))
+            elif kind == "eval":
+                self.scripts.append(value)
+
+    @property
+    def validation_failed(self):
+        return any('"validationFailed":true' in text.replace(" ", "") for _, text in self.extensions)
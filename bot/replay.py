@@ -0,0 +1,428 @@
+import base64
+import gzip
+import http.client
+import io
+import json
+import re
+import threading
+import time
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError as RequestsConnectionError
+from urllib3 import HTTPResponse
+
+from bot.metrics import InstrumentedAdapter
+
+# HTTP kayıt / tekrar oynatma katmanı.
+# Recorder gerçek sitedeki alışverişleri (JSF sayfaları, partial-response'lar, SSE akışları)
+# temizlenmiş bir fixture dosyasına yazar; Replayer aynı baytları ağa çıkmadan mgr.session'a
+# geri verir. Her ikisi de bir transport adapter'ıdır, bot/ kodunda hiçbir şey değişmez:
+#
+#     mgr.set_transport(Replayer.load("fixtures/flow.json.gz"))
+#
+# Eşleştirme host'tan bağımsızdır (sadece path), bu yüzden fixture başka bir BASE_URL ile de oynatılabilir.
+
+FORMAT_VERSION = 1
+
+# İstekleri eşleştirirken kullanılan form alanları; ViewState gibi değişkenler dahil edilmez
+_MATCH_FIELDS = (
+    "javax.faces.source",
+    "javax.faces.partial.render",
+    "javax.faces.behavior.event",
+    "javax.faces.partial.event",
+)
+# Her bağlantıda rastgele üretilen query parametreleri (SSE clientId)
+_VOLATILE_QUERY = {"clientId"}
+# Fixture'a yazılan istek başlıkları (Cookie, Authorization vb. asla yazılmaz)
+_REQUEST_HEADERS = ("Content-Type", "Referer", "Accept", "Last-Event-ID", "Faces-Request")
+# Gövde baytları çözülmüş halde saklandığı için aktarım başlıkları atılır
+_DROP_RESPONSE_HEADERS = {"content-encoding", "transfer-encoding", "content-length", "connection", "keep-alive"}
+_SECRET_FIELDS = re.compile(r"password|passwd|email|username|token", re.I)
+
+
+class ReplayMiss(RequestsConnectionError):
+    """No recorded exchange left for a request (strict replay)."""
+
+
+def _origin(url):
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def _path(url):
+    parts = urlsplit(url)
+    return parts.path + (f"?{parts.query}" if parts.query else "")
+
+
+def _form(body, content_type):
+    if not body or "x-www-form-urlencoded" not in (content_type or ""):
+        return None
+    if isinstance(body, bytes):
+        body = body.decode("utf-8", "replace")
+    return parse_qsl(body, keep_blank_values=True)
+
+
+def match_key(method, url, body=None, content_type=None):
+    """Key that identifies 'the same request' across runs: method, path, stable query and JSF source fields."""
+    parts = urlsplit(url)
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k not in _VOLATILE_QUERY)
+    key = [method.upper(), parts.path, urlencode(query)]
+    form = _form(body, content_type)
+    if form:
+        fields = dict(form)
+        key += [f"{name}={fields[name]}" for name in _MATCH_FIELDS if name in fields]
+    return " ".join(filter(None, key))
+
+
+def _encode_body(data):
+    try:
+        return {"text": data.decode("utf-8")}
+    except UnicodeDecodeError:
+        return {"base64": base64.b64encode(data).decode("ascii")}
+
+
+def _decode_body(stored):
+    if "text" in stored:
+        return stored["text"].encode("utf-8")
+    return base64.b64decode(stored["base64"])
+
+
+class Cassette:
+    """Ordered list of recorded exchanges plus free-form metadata (steps of the recorded flow)."""
+
+    def __init__(self, exchanges=None, meta=None):
+        self.exchanges = exchanges if exchanges is not None else []
+        self.meta = meta if meta is not None else {}
+
+    @classmethod
+    def load(cls, path):
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Desteklenmeyen fixture sürümü: {data.get('version')}")
+        return cls(data["exchanges"], data.get("meta", {}))
+
+    def save(self, path):
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "wt", encoding="utf-8") as f:
+            json.dump({"version": FORMAT_VERSION, "meta": self.meta, "exchanges": self.exchanges},
+                      f, ensure_ascii=False, indent=1)
+
+
+# --- Recording ---
+
+class _TeeRaw:
+    """
+    Wraps the urllib3 response of a stream=True request and copies every decoded chunk
+    (with its offset from the request start) into the exchange while the caller reads it.
+    """
+
+    def __init__(self, raw, exchange, started, on_done):
+        self.__dict__.update(_raw=raw, _exchange=exchange, _started=started, _on_done=on_done, _finished=False)
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._raw, name, value)
+
+    def _capture(self, data):
+        if data:
+            self._exchange["response"]["chunks"].append([round(time.time() - self._started, 4), data])
+        return data
+
+    def read(self, amt=None, decode_content=None, **kwargs):
+        data = self._capture(self._raw.read(amt, decode_content=True, **kwargs))
+        if not data:
+            self._finish()
+        return data
+
+    def stream(self, amt=2 ** 16, decode_content=None):
+        for chunk in self._raw.stream(amt, decode_content=True):
+            yield self._capture(chunk)
+        self._finish()
+
+    def close(self):
+        self._finish()
+        self._raw.close()
+
+    def _finish(self):
+        if not self._finished:
+            self.__dict__["_finished"] = True
+            self._on_done(self._exchange)
+
+
+class _RecordingTransport(HTTPAdapter):
+    recorder = None
+
+    def send(self, request, stream=False, **kwargs):
+        started = time.time()
+        response = super().send(request, stream=stream, **kwargs)
+        exchange = self.recorder._begin(request, response, time.time() - started)
+        if stream:
+            exchange["response"]["chunks"] = []
+            response.raw = _TeeRaw(response.raw, exchange, started, self.recorder._done)
+        else:
+            exchange["response"]["body"] = response.content
+            self.recorder._done(exchange)
+        return response
+
+
+class RecordingAdapter(InstrumentedAdapter, _RecordingTransport):
+    """InstrumentedAdapter that also records every exchange (metrics and traces keep working)."""
+
+    def __init__(self, recorder, metrics, *args, **kwargs):
+        self.recorder = recorder
+        super().__init__(metrics, *args, **kwargs)
+
+
+class Recorder:
+    """
+    Records the exchanges of every session it is mounted on.
+    redact: {secret: placeholder} literal replacements applied to urls, headers and bodies
+    on save (e-mail, account / company names, draft names...). Form fields that look like
+    credentials and Set-Cookie values are always replaced.
+    """
+
+    def __init__(self, redact=None):
+        self.redact = dict(redact or {})
+        self.meta = {}
+        self._exchanges = []
+        self._lock = threading.Lock()
+
+    def adapter(self, metrics, **kwargs):
+        return RecordingAdapter(self, metrics, **kwargs)
+
+    def clear(self):
+        with self._lock:
+            self._exchanges = []
+
+    def _begin(self, request, response, elapsed):
+        content_type = request.headers.get("Content-Type")
+        body = request.body
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        form = _form(body, content_type)
+        if form is not None:
+            body = urlencode([(k, "***" if _SECRET_FIELDS.search(k) else v) for k, v in form]).encode("utf-8")
+
+        exchange = {
+            "match": match_key(request.method, request.url, body, content_type),
+            "request": {
+                "method": request.method,
+                "url": _path(request.url),
+                "headers": {k: request.headers[k] for k in _REQUEST_HEADERS if k in request.headers},
+                "body": body or b"",
+            },
+            "response": {
+                "status": response.status_code,
+                "reason": response.reason,
+                "headers": [[k, v] for k, v in response.raw.headers.items()
+                            if k.lower() not in _DROP_RESPONSE_HEADERS],
+                "elapsed": round(elapsed, 4),
+            },
+            "origin": _origin(request.url),
+            "complete": False,
+        }
+        with self._lock:
+            self._exchanges.append(exchange)
+        return exchange
+
+    def _done(self, exchange):
+        exchange["complete"] = True
+
+    def _clean(self, data, origins):
+        text = data if isinstance(data, str) else None
+        if text is None:
+            for origin in origins:
+                data = data.replace(origin.encode("utf-8"), b"")
+            for secret, placeholder in self.redact.items():
+                data = data.replace(secret.encode("utf-8"), placeholder.encode("utf-8"))
+            return data
+        for origin in origins:
+            text = text.replace(origin, "")
+        for secret, placeholder in self.redact.items():
+            text = text.replace(secret, placeholder)
+        return text
+
+    def _clean_cookie(self, value, cookies):
+        name, _, rest = value.partition("=")
+        cookie_value, sep, attrs = rest.partition(";")
+        placeholder = cookies.setdefault((name, cookie_value), f"redacted{len(cookies) + 1}")
+        return f"{name}={placeholder}{sep}{attrs}"
+
+    def cassette(self):
+        """Sanitized copy of everything recorded so far (streams still open are cut where they are)."""
+        with self._lock:
+            exchanges = list(self._exchanges)
+        # Mutlak URL'ler göreli hale gelir, fixture host'a bağlı kalmaz
+        origins = sorted({e["origin"] for e in exchanges}, key=len, reverse=True)
+        cookies = {}
+        out = []
+        for e in exchanges:
+            req, res = e["request"], e["response"]
+            headers = []
+            for k, v in res["headers"]:
+                if k.lower() == "set-cookie":
+                    v = self._clean_cookie(v, cookies)
+                headers.append([k, self._clean(v, origins)])
+            stored = {
+                "match": self._clean(e["match"], origins),
+                "request": {
+                    "method": req["method"],
+                    "url": self._clean(req["url"], origins),
+                    "headers": {k: self._clean(v, origins) for k, v in req["headers"].items()},
+                    "body": _encode_body(self._clean(req["body"], origins)),
+                },
+                "response": {"status": res["status"], "reason": res["reason"], "headers": headers,
+                             "elapsed": res["elapsed"]},
+            }
+            if "chunks" in res:
+                stored["response"]["chunks"] = [[offset, _encode_body(self._clean(chunk, origins))]
+                                                for offset, chunk in list(res["chunks"])]
+                stored["response"]["complete"] = e["complete"]
+            else:
+                stored["response"]["body"] = _encode_body(self._clean(res.get("body", b""), origins))
+            out.append(stored)
+        meta = json.loads(self._clean(json.dumps(self.meta, ensure_ascii=False), origins))
+        return Cassette(out, meta)
+
+    def save(self, path):
+        cassette = self.cassette()
+        cassette.save(path)
+        return cassette
+
+
+# --- Replay ---
+
+class _TimedBody(io.RawIOBase):
+    """Body of a replayed stream: hands out the recorded chunks at their recorded offsets × scale."""
+
+    def __init__(self, chunks, scale):
+        self._chunks = [(offset * scale, data) for offset, data in chunks]
+        self._started = time.time()
+        self._buffer = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        if not self._buffer:
+            if not self._chunks:
+                return 0
+            offset, self._buffer = self._chunks.pop(0)
+            delay = self._started + offset - time.time()
+            if delay > 0:
+                time.sleep(delay)
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+
+class _OriginalResponse:
+    """What requests' cookie extraction expects from http.client (Set-Cookie headers in .msg)."""
+
+    def __init__(self, headers):
+        raw = "".join(f"{k}: {v}\r\n" for k, v in headers) + "\r\n"
+        self.msg = http.client.parse_headers(io.BytesIO(raw.encode("latin-1")))
+
+    def isclosed(self):
+        return True
+
+    def close(self):
+        pass
+
+
+class _ReplayTransport(HTTPAdapter):
+    replayer = None
+
+    def send(self, request, stream=False, **kwargs):
+        exchange = self.replayer._next(request)
+        res = exchange["response"]
+        scale = self.replayer.latency_scale
+        if scale:
+            time.sleep(res.get("elapsed", 0) * scale)
+
+        headers = list(res["headers"])
+        if "chunks" in res:
+            body = _TimedBody([(offset, _decode_body(chunk)) for offset, chunk in res["chunks"]], scale)
+        else:
+            data = _decode_body(res["body"])
+            headers.append(["Content-Length", str(len(data))])
+            body = io.BytesIO(data)
+
+        raw = HTTPResponse(
+            body=body,
+            headers=headers,
+            status=res["status"],
+            reason=res.get("reason"),
+            preload_content=False,
+            decode_content=False,
+            original_response=_OriginalResponse(headers),
+            request_method=request.method,
+            request_url=request.url,
+        )
+        return self.build_response(request, raw)
+
+
+class ReplayAdapter(InstrumentedAdapter, _ReplayTransport):
+    """InstrumentedAdapter whose network is a Replayer."""
+
+    def __init__(self, replayer, metrics, *args, **kwargs):
+        self.replayer = replayer
+        super().__init__(metrics, *args, **kwargs)
+
+
+class Replayer:
+    """
+    Serves the exchanges of a Cassette. Requests are matched by match_key(); exchanges that
+    share a key are handed out in recorded order. Bodies are returned byte for byte.
+    latency_scale: 0 replays instantly, 1.0 reproduces the recorded server time and
+    stream chunk timing, 0.5 halves it, etc.
+    strict: a request with no exchange left raises ReplayMiss; otherwise the last exchange
+    of that key is served again.
+    """
+
+    def __init__(self, cassette, latency_scale=0.0, strict=True):
+        self.cassette = cassette
+        self.latency_scale = latency_scale
+        self.strict = strict
+        self.misses = []
+        self._lock = threading.Lock()
+        self.rewind()
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        return cls(Cassette.load(path), **kwargs)
+
+    def rewind(self):
+        with self._lock:
+            self._queues = {}
+            for exchange in self.cassette.exchanges:
+                self._queues.setdefault(exchange["match"], []).append(exchange)
+            self._served = {key: 0 for key in self._queues}
+
+    def adapter(self, metrics, **kwargs):
+        return ReplayAdapter(self, metrics, **kwargs)
+
+    def _next(self, request):
+        key = match_key(request.method, request.url, request.body, request.headers.get("Content-Type"))
+        with self._lock:
+            queue = self._queues.get(key)
+            served = self._served.get(key, 0)
+            if queue and served < len(queue):
+                self._served[key] = served + 1
+                return queue[served]
+            self.misses.append(key)
+            if queue and not self.strict:
+                return queue[-1]
+        raise ReplayMiss(f"Kayıtlı yanıt yok: {key}", request=request)
+
+    @property
+    def unused(self):
+        """Exchanges that were recorded but not requested (flow changed since recording)."""
+        with self._lock:
+            return sum(len(queue) - self._served[key] for key, queue in self._queues.items())
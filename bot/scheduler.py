@@ -1,7 +1,16 @@
 import time
+import queue
+from concurrent.futures import ThreadPoolExecutor, wait
 
 from bot.auth import switch_account_backend
 from bot.drafts import drafti_planla_backend
+from bot.workers import get_account_worker
+from bot.async_pipeline import run_async_sweep
+from bot.logbuffer import log_context
+from bot.notify import teams_ozetini_gonder
+from bot.stagger import account_delay
+from bot.constants import DRAFT_PAGE_URL
+from bot.session_broker import get_logged_in
 import traceback
 
 def safe_run(manager):
@@ -13,42 +22,204 @@ def safe_run(manager):
 
 def gorev(mgr):
     if not mgr.is_running: return
+    mgr.load_state()
     if not mgr.watch_list: return
 
     mgr.add_log(f"⏰ Periyodik kontrol başladı. ({len(mgr.watch_list)} adet)", "info")
+    mgr.tracer.new_cycle()
     
-    tasks = list(mgr.watch_list.values())
+    start = time.time()
+    gorevleri_calistir(mgr, list(mgr.watch_list.values()))
+    mgr.sweep_finished(time.time() - start)
+
+def adaptif_gorev(mgr):
+    """
+    scheduler_mode "adaptive": runs every mgr.adaptive_tick seconds and plans only the drafts
+    whose next check time has come (at most mgr.adaptive_batch), see bot/adaptive.py.
+    """
+    if not mgr.is_running: return
+    mgr.load_state()
+    with mgr.watch_list_lock:
+        items = {item['draft_id']: item for item in mgr.watch_list.values()}
+    schedule = mgr.adaptive
+    schedule.sync(items, mgr.mins_threshold)
+    due = schedule.pop_due(mgr.adaptive_batch)
+    if not due: return
+
+    mgr.add_log(f"⏰ Uyarlamalı kontrol: {len(due)}/{len(items)} taslağın sırası geldi.", "info")
+    mgr.tracer.new_cycle()
+
+    sonuclar = {}
+    def on_result(mgr, item, sonuc):
+        # sonucu_isle sonucu değiştirir, sınıflandırma önce yapılır
+        if isinstance(sonuc, dict) and 'STOP' in sonuc:
+            sonuclar[item['draft_id']] = ("stop", None)
+        elif isinstance(sonuc, dict):
+            sonuclar[item['draft_id']] = ("found", sonuc.get('draft_id'))
+        sonucu_isle(mgr, item, sonuc)
+
+    try:
+        gorevleri_calistir(mgr, [items[d] for d in due], on_result)
+    finally:
+        # Çalışmayan / hata veren taslaklar da yeniden sıraya girer
+        for draft_id in due:
+            outcome, new_draft_id = sonuclar.get(draft_id, (None, None))
+            schedule.record(draft_id, outcome, new_draft_id)
+
+def on_isitma(mgr):
+    """
+    Cron modes: runs mgr.warmup_lead seconds before every slot. Validates / refreshes the
+    login, switches to the sweep's first account and prefetches its draft list, so the sweep
+    starts on a live session, a hot connection and a cached page (SessionBroker.stash_list_page).
+    """
+    if not mgr.is_running: return
+    mgr.load_state()
+    with mgr.watch_list_lock:
+        tasks = sorted(mgr.watch_list.values(), key=lambda x: str(x.get('account_id') or ''))
+    if not tasks: return
+
+    start = time.time()
+    try:
+        if mgr.execution_mode == "sequential":
+            # gorev'in sıralamasındaki ilk hesap; sıralı mod tek oturumla çalışır
+            item = tasks[0]
+            with mgr.broker.account_context():
+                if not mgr.broker.ensure():
+                    mgr.add_log("❌ Ön ısıtma: giriş yapılamadı.", "error")
+                    return
+                target_acc_id = item.get('account_id')
+                if target_acc_id and target_acc_id != mgr.current_account_id:
+                    if not switch_account_backend(mgr, target_acc_id):
+                        return
+                    mgr.current_account_id = target_acc_id
+                    mgr.current_account_name = item.get('account_name', 'Bilinmiyor')
+                mgr.broker.stash_list_page(mgr.current_account_id, get_logged_in(mgr, DRAFT_PAGE_URL))
+            hazir = 1
+        else:
+            # Paralel / async: her hesabın ilk lane'i (slot 0) kendi oturumuyla hazırlanır
+            accounts = {}
+            for item in tasks:
+                accounts.setdefault(item.get('account_id'), item.get('account_name', 'Bilinmiyor'))
+
+            def hazirla(acc_id, acc_name):
+                worker = get_account_worker(mgr, acc_id, acc_name, 0)
+                if not worker.ensure_account():
+                    return False
+                worker.broker.stash_list_page(worker.current_account_id, get_logged_in(worker, DRAFT_PAGE_URL))
+                return True
+
+            with ThreadPoolExecutor(max_workers=max(1, min(mgr.max_workers, len(accounts))), thread_name_prefix="warmup") as pool:
+                hazir = sum(pool.map(lambda acc: hazirla(*acc), accounts.items()))
+        mgr.add_log(f"🔥 Ön ısıtma tamam: {hazir} hesap hazır ({time.time() - start:.1f} sn).", "info")
+    except Exception as e:
+        mgr.add_log(f"⚠️ Ön ısıtma hatası: {e}", "warning")
+        traceback.print_exc()
+
+def gorevleri_calistir(mgr, tasks, on_result=None):
+    """Plans tasks with the configured execution mode, then sends the cycle's Teams digest."""
+    on_result = on_result or sonucu_isle
     sorted_tasks = sorted(tasks, key=lambda x: str(x.get('account_id') or ''))
-    
-    #keys_to_remove = []
 
+    if mgr.execution_mode == "parallel":
+        paralel_gorev(mgr, sorted_tasks, on_result)
+    elif mgr.execution_mode == "async":
+        run_async_sweep(mgr, sorted_tasks, on_result)
+    else:
+        sirali_gorev(mgr, sorted_tasks, on_result)
+
+    # Bu döngüde biriken Teams bildirimleri tek bir özet kartı olarak gider
+    teams_ozetini_gonder(mgr)
+
+def sirali_gorev(mgr, sorted_tasks, on_result=None):
+    """Runs the watch list on mgr's own session, switching accounts between items."""
     for item in sorted_tasks:
-        d_key = item['draft_id']
-        print(d_key)
-        d_name = item['name']
-        d_account = item['account_name']
+        if not mgr.is_running: break
+        print(item['draft_id'])
         
-        # --- CONTEXT SWITCHING ---
-        target_acc_id = item.get('account_id')
-        target_acc_name = item.get('account_name', 'Bilinmiyor')
-        
-        if target_acc_id and target_acc_id != mgr.current_account_id:
-            if switch_account_backend(mgr, target_acc_id):
-                mgr.current_account_id = target_acc_id
-                mgr.current_account_name = target_acc_name
-                time.sleep(2)
-            else:
-                continue
+        # Hesap geçişi + planlama tek parça: UI bu arada hesabı değiştiremez.
+        # Ortak taslak slotu önce alınır, beklerken hesap kilidi UI'yi bloklamasın.
+        with mgr.execution.draft_slot(mgr), mgr.broker.account_context():
+            # Süresi dolmak üzere olan oturum istek düşmeden yenilenir
+            if not mgr.broker.ensure():
+                mgr.add_log("❌ Giriş yapılamadı, kontrol durduruldu.", "error")
+                break
 
-        # --- EXECUTE (Just pass the item!) ---
-        sonuc = drafti_planla_backend(mgr, item)
-        
+            # --- CONTEXT SWITCHING ---
+            target_acc_id = item.get('account_id')
+            target_acc_name = item.get('account_name', 'Bilinmiyor')
+
+            if target_acc_id and target_acc_id != mgr.current_account_id:
+                if switch_account_backend(mgr, target_acc_id):
+                    mgr.current_account_id = target_acc_id
+                    mgr.current_account_name = target_acc_name
+                    time.sleep(2)
+                else:
+                    continue
+
+            # --- EXECUTE (Just pass the item!) ---
+            with log_context(item.get('name')), mgr.tracer.trace(item['draft_id'], item.get('name'), mode="sequential"):
+                sonuc = drafti_planla_backend(mgr, item)
+                (on_result or sonucu_isle)(mgr, item, sonuc)
+
+def paralel_gorev(mgr, sorted_tasks, on_result=None):
+    """
+    Runs the watch list on a bounded thread pool.
+    Every account gets `account_concurrency` lanes; each lane owns an isolated session
+    logged into that account and drains the account's queue, so no account switching
+    happens between items. mgr.max_workers caps the lanes running at once, the shared
+    draft slots (bot/execution.py) cap the drafts in flight across all users.
+    """
+    queues = {}
+    for item in sorted_tasks:
+        acc_id = item.get('account_id')
+        if acc_id not in queues:
+            queues[acc_id] = (item.get('account_name', 'Bilinmiyor'), queue.Queue())
+        queues[acc_id][1].put(item)
+
+    def lane(acc_id, acc_name, slot, items):
+        # Cron slotlarında hesaplar aynı saniyede başlamasın (bot/stagger.py)
+        time.sleep(account_delay(mgr, acc_id))
+        worker = get_account_worker(mgr, acc_id, acc_name, slot)
+        while mgr.is_running:
+            try:
+                item = items.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                with mgr.execution.draft_slot(mgr):
+                    if not worker.ensure_account():
+                        mgr.add_log(f"❌ {acc_name}: hesaba geçilemedi, taslak atlandı ({item['name']}).", "error")
+                        continue
+                    with log_context(item.get('name')), \
+                            mgr.tracer.trace(item['draft_id'], item.get('name'), mode="parallel", lane=slot):
+                        sonuc = drafti_planla_backend(worker, item)
+                        (on_result or sonucu_isle)(mgr, item, sonuc)
+            except Exception as e:
+                mgr.add_log(f"🔥 Lane crash ({acc_name}): {e}", "error")
+                traceback.print_exc()
+
+    with ThreadPoolExecutor(max_workers=max(1, mgr.max_workers), thread_name_prefix="draft-lane") as pool:
+        futures = []
+        for acc_id, (acc_name, items) in queues.items():
+            lanes = max(1, min(mgr.get_account_concurrency(acc_id), items.qsize()))
+            for slot in range(lanes):
+                futures.append(pool.submit(lane, acc_id, acc_name, slot, items))
+        wait(futures)
+
+def sonucu_isle(mgr, item, sonuc):
+    """Applies one drafti_planla_backend result to the watch list and history."""
+    d_key = item['draft_id']
+    d_name = item['name']
+    d_account = item['account_name']
+    target_acc_id = item.get('account_id')
+    target_acc_name = item.get('account_name', 'Bilinmiyor')
+
+    with mgr.watch_list_lock:
         # --- UPDATE LOGIC ---
         if isinstance(sonuc, dict) and 'STOP' in sonuc:
             new_found_list = sonuc.pop("STOP")
             mgr.add_history_entry(d_name, new_found_list, d_account)
-            if d_key in mgr.watch_list:
-                del mgr.watch_list[d_key]
+            mgr.remove_watch_item(d_key)
             
         elif isinstance(sonuc, dict):
             new_key = sonuc['draft_id']
@@ -87,9 +258,11 @@ def gorev(mgr):
             sonuc['max_mile'] = item.get('max_mile')
             sonuc['targets'] = item.get('targets')
 
+            # A copy was created, the cached draft list is outdated
+            mgr.invalidate_draft_cache(drop=False)
+
             if new_key != d_key:
-                if d_key in mgr.watch_list:
-                    del mgr.watch_list[d_key]
-                mgr.watch_list[new_key] = sonuc
+                mgr.remove_watch_item(d_key)
+                mgr.set_watch_item(new_key, sonuc)
             else:
-                mgr.watch_list[d_key] = sonuc
\ No newline at end of file
+                mgr.set_watch_item(d_key, sonuc)
@@ -0,0 +1,153 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from bot.auth import login, switch_account_backend
+
+
+class SessionBusy(TimeoutError):
+    """The account context is held by another sequence (e.g. the scheduler planning a draft)."""
+
+
+class SessionBroker:
+    """
+    Guards the requests.Session of one owner (GlobalManager or AccountSession).
+
+    - account_context(): serializes sequences that depend on the active 2DWorkflow account
+      (switch + list + plan), so the UI thread and the scheduler don't switch under each other.
+    - relogin(): single-flight re-login. Callers that saw login.jsf while another thread was
+      already logging in wait for that attempt instead of clearing the cookies again.
+    - ensure(): proactive re-login when the session cookie is about to expire or the server
+      side session has been idle longer than idle_ttl.
+    - stash_list_page() / take_list_page(): one draft.jsf response prefetched by the cron
+      warm-up, handed to the first list fetch of the next sweep.
+    """
+
+    def __init__(self, owner, idle_ttl=25 * 60, refresh_margin=60, retry_after=30):
+        self.owner = owner
+        self.idle_ttl = idle_ttl  # 2DWorkflow drops idle sessions (servlet default: 30 min)
+        self.refresh_margin = refresh_margin
+        self.retry_after = retry_after  # failed logins are not retried sooner than this
+        self.account_lock = threading.RLock()
+        self.generation = 0  # incremented on every successful login
+        self.logged_in_at = None
+        self.last_activity = None
+        self.last_failure = None
+        self._session = None
+        self._prefetched = None  # (account_id, generation, fetched_at, response)
+        self._prefetch_lock = threading.Lock()
+        self.attach(owner.session)
+
+    def attach(self, session):
+        """Tracks the activity of session (the owner's current session)."""
+        if session is self._session:
+            return
+        self._session = session
+        self.last_activity = None
+        session.hooks["response"].append(self._on_response)
+
+    def _on_response(self, response, *args, **kwargs):
+        if "login.jsf" in response.url:
+            # Sunucu oturumu düşürdü (veya login akışındayız); taze sayılmaz
+            self.last_activity = None
+        elif response.status_code < 400:
+            self.last_activity = time.time()
+
+    def touch(self):
+        """Marks server activity seen outside the requests.Session (e.g. the async httpx client)."""
+        self.last_activity = time.time()
+
+    def expires_at(self):
+        """Epoch seconds after which the session is assumed dead (0: not logged in)."""
+        session = self.owner.session
+        self.attach(session)
+        if not session.cookies or self.last_activity is None:
+            return 0
+        deadline = self.last_activity + self.idle_ttl
+        for cookie in session.cookies:
+            if cookie.expires and "session" in cookie.name.lower():
+                deadline = min(deadline, cookie.expires)
+        return deadline
+
+    def is_fresh(self):
+        return time.time() < self.expires_at() - self.refresh_margin
+
+    @contextmanager
+    def account_context(self, timeout=None):
+        """Holds the account context; raises SessionBusy if it is not free within timeout seconds."""
+        if not self.account_lock.acquire(timeout=-1 if timeout is None else timeout):
+            raise SessionBusy("Oturum şu an başka bir işlem tarafından kullanılıyor, birazdan tekrar deneyin.")
+        try:
+            yield self
+        finally:
+            self.account_lock.release()
+
+    def ensure(self):
+        """Logs in only if the session is missing or about to expire. Returns False if login failed."""
+        if self.is_fresh():
+            return True
+        return self.relogin(self.generation)
+
+    def relogin(self, seen_generation=None):
+        """
+        Logs in again, keeping the active account.
+        seen_generation: self.generation read before the request that hit login.jsf. If another
+        caller has logged in since then, its session is reused.
+        """
+        with self.account_lock:
+            if seen_generation is not None and self.generation != seen_generation and self.is_fresh():
+                return True
+            if self.last_failure is not None and time.time() - self.last_failure < self.retry_after:
+                return False
+
+            account_id = self.owner.current_account_id
+            if self.logged_in_at is not None:
+                self.owner.add_log("🔑 Oturum yenileniyor...", "info")
+            if not login(self.owner):
+                self.last_failure = time.time()
+                return False
+            self.last_failure = None
+            self.generation += 1
+            self.logged_in_at = self.last_activity = time.time()
+
+            # Login her zaman varsayılan hesapla açılır
+            if account_id and self.owner.current_account_id != account_id:
+                switch_account_backend(self.owner, account_id)
+            return True
+
+    def stash_list_page(self, account_id, response):
+        """Keeps a draft.jsf response of account_id for the next take_list_page (used once)."""
+        with self._prefetch_lock:
+            self._prefetched = (account_id, self.generation, time.time(), response)
+
+    def take_list_page(self, account_id, max_age):
+        """The stashed response if it is of account_id, of the current login and younger than max_age seconds."""
+        with self._prefetch_lock:
+            prefetched, self._prefetched = self._prefetched, None
+        if prefetched is None:
+            return None
+        stashed_account, generation, fetched_at, response = prefetched
+        if stashed_account != account_id or generation != self.generation:
+            return None
+        if time.time() - fetched_at > max_age or not self.is_fresh():
+            return None
+        return response
+
+    def reset(self):
+        """Forgets the login state (the owner's session was replaced)."""
+        with self.account_lock:
+            self._session = None
+            self._prefetched = None
+            self.logged_in_at = None
+            self.last_failure = None
+            self.attach(self.owner.session)
+
+
+def get_logged_in(owner, url, **kwargs):
+    """session.get that re-logs in once (single-flight) when 2DWorkflow redirects to login.jsf."""
+    broker = owner.broker
+    seen = broker.generation
+    res = owner.session.get(url, **kwargs)
+    if "login.jsf" in res.url and broker.relogin(seen):
+        res = owner.session.get(url, **kwargs)
+    return res
@@ -0,0 +1,316 @@
+import asyncio
+import json
+import random
+import string
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+
+from bot.constants import BASE_URL, USER_AGENT
+
+SSE_HEADERS = {
+    "Accept": "text/event-stream",
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "Pragma": "no-cache",
+    "User-Agent": USER_AGENT
+}
+
+PLAN_JOB_TYPE = "CREATE_SHIPMENT_PLAN"
+
+# Payload fields that may identify a job / draft in job-status-global events
+_JOB_ID_FIELDS = ("jobId", "id", "uuid")
+_DRAFT_ID_FIELDS = ("draftId", "draftShipmentId", "referenceId")
+
+
+def sse_url_olustur(domain_url):
+    random_str = ''.join(random.choices(string.ascii_lowercase + string.digits, k=11))
+    client_id = f"sw-{random_str}"
+    return f"{domain_url}/api/sse/jobs/session?clientId={client_id}"
+
+
+def job_durumu(payload, job_type=PLAN_JOB_TYPE):
+    """
+    Returns True when the job in payload is finished, False while it is running.
+    Raises RuntimeError when the server reports a failed job.
+    """
+    if payload.get("type") != job_type:
+        return False
+    status = payload.get("status")
+    done = payload.get("done", 0)
+    total = payload.get("total", 0)
+
+    if status == "DONE" or (total > 0 and done == total):
+        return True
+    elif status == "FAILED" or payload.get("errorMessage"):
+        raise RuntimeError(f"Sunucu Hatası: {payload.get('errorMessage')}")
+    return False
+
+
+def plan_job_durumu(event_type, data_str):
+    """
+    Interprets one SSE data line.
+    Returns the payload when the shipment plan job is done, None otherwise.
+    Raises RuntimeError when the server reports a failed job.
+    """
+    if event_type != "job-status-global":
+        return None
+    try:
+        payload = json.loads(data_str)
+    except json.JSONDecodeError:
+        return None
+    return payload if job_durumu(payload) else None
+
+
+def _first_field(payload, fields):
+    for field in fields:
+        value = payload.get(field)
+        if value not in (None, ""):
+            return str(value)
+    return None
+
+
+class JobWaiter:
+    """Handle for one expected job. Resolves with the final job-status payload."""
+
+    def __init__(self, dispatcher, job_type, draft_id, known_jobs):
+        self.dispatcher = dispatcher
+        self.job_type = job_type
+        self.draft_id = str(draft_id) if draft_id is not None else None
+        self.job_id = None
+        self.created_at = time.time()
+        self.future = Future()
+        # Jobs that already existed when we started waiting can't be ours
+        self._known_jobs = known_jobs
+
+    def result(self, timeout=None):
+        return self.future.result(timeout)
+
+    async def wait(self, timeout=None):
+        return await asyncio.wait_for(asyncio.wrap_future(self.future), timeout)
+
+    def cancel(self):
+        self.future.cancel()
+        self.dispatcher._forget(self)
+
+    def _resolve(self, payload=None, error=None):
+        try:
+            if error is not None:
+                self.future.set_exception(error)
+            else:
+                self.future.set_result(payload)
+        except InvalidStateError:
+            pass  # cancelled meanwhile
+
+
+class JobEventDispatcher:
+    """
+    One long-lived /api/sse/jobs/session stream per requests.Session.
+    job-status-global events are read once and routed to JobWaiters by job id,
+    by draft id when the server sends one, or to the oldest unbound waiter
+    (waiters are registered before create_plan is posted, so order matches).
+
+    A dropped or silent stream (nothing, not even a heartbeat comment, for
+    heartbeat_timeout seconds) is reopened with exponential backoff and the
+    last seen event id in Last-Event-ID; pending waiters stay attached to their
+    jobs across reconnects. The reader thread stops after idle_close seconds
+    without waiters.
+    """
+
+    def __init__(self, session, domain_url=BASE_URL, add_log=None, idle_close=60,
+                 heartbeat_timeout=45, max_reconnects=8, backoff_base=0.5, backoff_cap=30):
+        self.session = session
+        self.domain_url = domain_url
+        self.add_log = add_log or (lambda message, type="info": None)
+        self.idle_close = idle_close
+        self.heartbeat_timeout = heartbeat_timeout
+        self.max_reconnects = max_reconnects
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.reconnects = 0
+        self._url = sse_url_olustur(domain_url)  # same clientId across reconnects
+        self._last_event_id = None
+        self._retry_hint = None
+        self._lock = threading.Lock()
+        self._pending = []  # waiting order
+        self._by_job = {}
+        self._known_jobs = set()
+        self._thread = None
+        self._idle_since = time.time()
+
+    # --- Public API ---
+    def expect(self, draft_id=None, job_type=PLAN_JOB_TYPE):
+        """Registers a waiter. Call it BEFORE posting the request that starts the job."""
+        with self._lock:
+            waiter = JobWaiter(self, job_type, draft_id, frozenset(self._known_jobs))
+            self._pending.append(waiter)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="sse-dispatcher", daemon=True)
+                self._thread.start()
+        return waiter
+
+    @property
+    def pending_count(self):
+        with self._lock:
+            return len(self._pending)
+
+    # --- Internals ---
+    def _forget(self, waiter):
+        with self._lock:
+            if waiter in self._pending:
+                self._pending.remove(waiter)
+            if waiter.job_id is not None:
+                self._by_job.pop(waiter.job_id, None)
+            if not self._pending:
+                self._idle_since = time.time()
+
+    def _route(self, payload):
+        """Finds the waiter that owns this event. Caller holds the lock."""
+        job_type = payload.get("type")
+        job_id = _first_field(payload, _JOB_ID_FIELDS)
+        draft_id = _first_field(payload, _DRAFT_ID_FIELDS)
+
+        if job_id is not None and job_id in self._by_job:
+            return self._by_job[job_id]
+
+        candidates = [w for w in self._pending if w.job_id is None and w.job_type == job_type]
+        if job_id is not None:
+            candidates = [w for w in candidates if job_id not in w._known_jobs]
+        if draft_id is not None:
+            by_draft = [w for w in candidates if w.draft_id == draft_id]
+            candidates = by_draft or [w for w in candidates if w.draft_id is None]
+        if not candidates:
+            return None
+
+        waiter = candidates[0]
+        if job_id is not None:
+            waiter.job_id = job_id
+            self._by_job[job_id] = waiter
+        return waiter
+
+    def _dispatch(self, event_type, data_str):
+        if event_type != "job-status-global":
+            return
+        try:
+            payload = json.loads(data_str)
+        except json.JSONDecodeError:
+            return
+
+        with self._lock:
+            job_id = _first_field(payload, _JOB_ID_FIELDS)
+            if job_id is not None:
+                self._known_jobs.add(job_id)
+                if len(self._known_jobs) > 5000:
+                    self._known_jobs.clear()
+            waiter = self._route(payload)
+        if waiter is None:
+            return
+
+        try:
+            finished = job_durumu(payload, waiter.job_type)
+        except RuntimeError as e:
+            waiter._resolve(error=e)
+            self._forget(waiter)
+            return
+        if finished:
+            waiter._resolve(payload)
+            self._forget(waiter)
+
+    def _should_stop(self):
+        with self._lock:
+            if not self._pending and time.time() - self._idle_since > self.idle_close:
+                self._thread = None
+                return True
+            return False
+
+    def _fail_pending(self, error):
+        with self._lock:
+            waiters, self._pending = self._pending, []
+            self._by_job.clear()
+            self._thread = None
+            self._idle_since = time.time()
+        for waiter in waiters:
+            waiter._resolve(error=error)
+
+    def _exit_if_unused(self):
+        with self._lock:
+            if not self._pending:
+                self._thread = None
+                return True
+            return False
+
+    def _backoff(self, attempt):
+        delay = min(self.backoff_cap, self.backoff_base * (2 ** (attempt - 1)))
+        if self._retry_hint is not None:
+            delay = max(delay, self._retry_hint)
+        return delay * random.uniform(0.5, 1.0)
+
+    def _read_stream(self):
+        """Reads one connection until EOF. Returns True if the thread should stop."""
+        headers = dict(SSE_HEADERS)
+        if self._last_event_id is not None:
+            headers["Last-Event-ID"] = self._last_event_id
+
+        with self.session.get(self._url, stream=True, headers=headers, timeout=(10, self.heartbeat_timeout)) as response:
+            response.raise_for_status()
+            if "text/event-stream" not in response.headers.get("Content-Type", "text/event-stream"):
+                raise ConnectionError(f"SSE yerine {response.headers.get('Content-Type')} döndü ({response.url})")
+            current_event_type = None
+
+            for line in response.iter_lines(decode_unicode=True):
+                self._received = True
+                if self._should_stop():
+                    return True
+                if not line or line.startswith(":"):
+                    continue  # heartbeat comment, read timeout already reset
+                if line.startswith("event:"):
+                    current_event_type = line.split(":", 1)[1].strip()
+                elif line.startswith("id:"):
+                    self._last_event_id = line.split(":", 1)[1].strip()
+                elif line.startswith("retry:"):
+                    try:
+                        self._retry_hint = int(line.split(":", 1)[1].strip()) / 1000
+                    except ValueError:
+                        pass
+                elif line.startswith("data:"):
+                    self._dispatch(current_event_type, line.split(":", 1)[1].strip())
+        return False
+
+    def _run(self):
+        self.add_log("📡 SSE Bağlantısı kuruluyor...", "info")
+        attempt = 0
+        while True:
+            self._received = False
+            try:
+                if self._read_stream():
+                    return
+                error = ConnectionError("Sunucu, işlem tamamlanmadan SSE bağlantısını kesti (EOF).")
+            except Exception as e:
+                error = e
+
+            if self._exit_if_unused():
+                return
+
+            # A stream that delivered data resets the backoff
+            attempt = 1 if self._received else attempt + 1
+            if attempt > self.max_reconnects:
+                self._fail_pending(ConnectionError(f"SSE bağlantısı {self.max_reconnects} denemede kurulamadı: {error}"))
+                return
+
+            delay = self._backoff(attempt)
+            self.reconnects += 1
+            self.add_log(f"🔁 SSE yeniden bağlanıyor ({attempt}. deneme, {delay:.1f} sn): {error}", "warning")
+            time.sleep(delay)
+
+
+_dispatchers_lock = threading.Lock()
+
+
+def job_dispatcher(mgr):
+    """Returns the SSE dispatcher bound to mgr.session (created lazily)."""
+    with _dispatchers_lock:
+        dispatcher = mgr.sse_dispatcher
+        if dispatcher is None or dispatcher.session is not mgr.session:
+            dispatcher = JobEventDispatcher(mgr.session, BASE_URL, mgr.add_log, heartbeat_timeout=mgr.sse_heartbeat_timeout)
+            mgr.sse_dispatcher = dispatcher
+        return dispatcher
@@ -0,0 +1,59 @@
+import hashlib
+
+# Trigger planning of the cron-style modes. Instead of every user firing at exactly
+# :00/:15/:30/:45, each user starts at a fixed offset inside mgr.stagger_window after the
+# slot, and the account lanes of a sweep start spread over mgr.stagger_account_s.
+# Offsets come from a hash of the e-mail, so a user keeps its place across restarts.
+
+CRON_SLOTS = {
+    "half_hourly": (0, 30),
+    "quarterly": (0, 15, 30, 45),
+}
+
+
+def stable_fraction(key):
+    """Deterministic value in [0, 1) for key."""
+    digest = hashlib.sha256(key.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") / 2 ** 64
+
+
+def slot_window(mgr):
+    """
+    Seconds after a slot in which the user's sweep may start. With mgr.finish_by (minutes
+    after the slot) the window shrinks so that offset + expected sweep duration + account
+    spread still ends before the deadline.
+    """
+    window = mgr.stagger_window
+    if mgr.finish_by is not None:
+        expected = (mgr.sweep_estimate or 0) + mgr.stagger_account_s
+        window = min(window, max(0, mgr.finish_by * 60 - expected))
+    return window
+
+
+def slot_offset(mgr):
+    """Seconds after every slot at which mgr's sweep is triggered."""
+    slots = CRON_SLOTS[mgr.scheduler_mode]
+    gap = 60 // len(slots) * 60
+    # Bir sonraki slota taşmasın, yoksa aynı kaydırma her slota uygulanamaz
+    return min(int(stable_fraction(mgr.email) * slot_window(mgr)), gap - 1)
+
+
+def cron_trigger_args(mgr):
+    """APScheduler cron arguments of the staggered slots and the offset in seconds."""
+    offset = slot_offset(mgr)
+    minutes = ",".join(str(slot + offset // 60) for slot in CRON_SLOTS[mgr.scheduler_mode])
+    return {"trigger": "cron", "minute": minutes, "second": offset % 60}, offset
+
+
+def account_delay(mgr, account_id):
+    """Seconds an account's lanes wait at the start of a cron sweep (0 in the other modes)."""
+    if mgr.scheduler_mode not in CRON_SLOTS or not mgr.stagger_account_s:
+        return 0
+    return stable_fraction(f"{mgr.email}:{account_id}") * mgr.stagger_account_s
+
+
+def warmup_trigger_args(mgr, offset):
+    """Cron arguments firing mgr.warmup_lead seconds before every staggered slot (offset: slot_offset)."""
+    start = offset - mgr.warmup_lead  # negatif: slottan önceki dakika
+    minutes = ",".join(str((slot + start // 60) % 60) for slot in CRON_SLOTS[mgr.scheduler_mode])
+    return {"trigger": "cron", "minute": minutes, "second": start % 60}
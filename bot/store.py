@@ -0,0 +1,210 @@
+import atexit
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+# Kalıcı depolama: watch_list (found_warehouses dahil) ve history.
+# Manager her değişikliği store'a bildirir; SQLite store bunları bir kuyruğa atar ve
+# ayrı bir yazıcı thread'i toplu commit eder, scheduler thread'i diske hiç beklemez.
+
+HISTORY_LIMIT = 50
+
+
+def _json_default(value):
+    # numpy / pandas skalerleri (np.int64, np.bool_) JSON'a sayı olarak yazılsın
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+def _dumps(value):
+    return json.dumps(value, ensure_ascii=False, default=_json_default)
+
+
+class NullStore:
+    """No persistence (tests, or TWD_STORE=none)."""
+
+    def load(self, owner):
+        return {}, []
+
+    def put_draft(self, owner, key, item): pass
+
+    def delete_draft(self, owner, key): pass
+
+    def replace_watch_list(self, owner, watch_list): pass
+
+    def add_history(self, owner, entry): pass
+
+    def clear_history(self, owner): pass
+
+    def flush(self, timeout=None): return True
+
+    def close(self): pass
+
+
+class SQLiteStore(NullStore):
+    """
+    Embedded SQLite store in WAL mode with a write-behind queue.
+    Mutations return immediately; a single writer thread drains the queue and commits
+    up to batch_size operations per transaction.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS watch_list (
+        owner TEXT NOT NULL,
+        draft_key TEXT NOT NULL,
+        data TEXT NOT NULL,
+        found_warehouses TEXT NOT NULL DEFAULT '[]',
+        updated_at REAL NOT NULL,
+        PRIMARY KEY (owner, draft_key)
+    );
+    CREATE TABLE IF NOT EXISTS history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        owner TEXT NOT NULL,
+        entry TEXT NOT NULL,
+        created_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS history_owner ON history (owner, id);
+    """
+
+    def __init__(self, path, batch_size=200):
+        self.path = path
+        self.batch_size = batch_size
+        self._queue = queue.Queue()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(self.SCHEMA)
+        conn.close()
+
+        self._writer = threading.Thread(target=self._write_loop, name="store-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    # --- Reads (startup only) ---
+    def load(self, owner):
+        """Returns (watch_list, history newest first) of owner. Pending writes are flushed first."""
+        self.flush(timeout=10)
+        conn = self._connect()
+        try:
+            watch_list = {}
+            for key, data, found in conn.execute(
+                    "SELECT draft_key, data, found_warehouses FROM watch_list WHERE owner = ? ORDER BY updated_at",
+                    (owner,)):
+                item = json.loads(data)
+                item["found_warehouses"] = json.loads(found)
+                watch_list[key] = item
+            history = [json.loads(entry) for (entry,) in conn.execute(
+                "SELECT entry FROM history WHERE owner = ? ORDER BY id DESC LIMIT ?", (owner, HISTORY_LIMIT))]
+            return watch_list, history
+        finally:
+            conn.close()
+
+    # --- Writes (queued) ---
+    def put_draft(self, owner, key, item):
+        item = dict(item)
+        found = item.pop("found_warehouses", [])
+        self._queue.put(("put", owner, str(key), _dumps(item), _dumps(found), time.time()))
+
+    def delete_draft(self, owner, key):
+        self._queue.put(("delete", owner, str(key)))
+
+    def replace_watch_list(self, owner, watch_list):
+        self._queue.put(("clear", owner))
+        for key, item in watch_list.items():
+            self.put_draft(owner, key, item)
+
+    def add_history(self, owner, entry):
+        self._queue.put(("history", owner, _dumps(entry), time.time()))
+
+    def clear_history(self, owner):
+        self._queue.put(("clear_history", owner))
+
+    def flush(self, timeout=None):
+        """Waits until queued writes are committed. Returns False on timeout."""
+        done = threading.Event()
+        self._queue.put(("flush", done))
+        return done.wait(timeout)
+
+    def close(self):
+        self.flush(timeout=10)
+
+    def _apply(self, conn, op):
+        kind = op[0]
+        if kind == "put":
+            _, owner, key, data, found, ts = op
+            conn.execute(
+                "INSERT INTO watch_list (owner, draft_key, data, found_warehouses, updated_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (owner, draft_key) DO UPDATE SET data = excluded.data, "
+                "found_warehouses = excluded.found_warehouses, updated_at = excluded.updated_at",
+                (owner, key, data, found, ts))
+        elif kind == "delete":
+            conn.execute("DELETE FROM watch_list WHERE owner = ? AND draft_key = ?", op[1:])
+        elif kind == "clear":
+            conn.execute("DELETE FROM watch_list WHERE owner = ?", op[1:])
+        elif kind == "history":
+            _, owner, entry, ts = op
+            conn.execute("INSERT INTO history (owner, entry, created_at) VALUES (?, ?, ?)", (owner, entry, ts))
+            # Son HISTORY_LIMIT kayıt tutulur, tablo sınırsız büyümez
+            conn.execute(
+                "DELETE FROM history WHERE owner = ? AND id NOT IN "
+                "(SELECT id FROM history WHERE owner = ? ORDER BY id DESC LIMIT ?)",
+                (owner, owner, HISTORY_LIMIT))
+        elif kind == "clear_history":
+            conn.execute("DELETE FROM history WHERE owner = ?", op[1:])
+
+    def _write_loop(self):
+        conn = self._connect()
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            waiters = [op[1] for op in batch if op[0] == "flush"]
+            try:
+                with conn:  # tek transaction
+                    for op in batch:
+                        if op[0] != "flush":
+                            self._apply(conn, op)
+            except sqlite3.Error as e:
+                print(f"❌ Store yazma hatası ({len(batch)} işlem): {e}")
+            for done in waiters:
+                done.set()
+
+
+STORE_BACKENDS = {
+    "sqlite": SQLiteStore,
+    "none": NullStore,
+}
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """
+    Process-wide store, created on first use.
+    TWD_STORE: "sqlite" (default) or "none"; TWD_STORE_PATH: database file (default data/bot_state.db).
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            backend = os.environ.get("TWD_STORE", "sqlite")
+            if backend == "sqlite":
+                _store = SQLiteStore(os.environ.get("TWD_STORE_PATH", os.path.join("data", "bot_state.db")))
+            else:
+                _store = STORE_BACKENDS.get(backend, NullStore)()
+            atexit.register(_store.close)
+        return _store
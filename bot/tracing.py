@@ -0,0 +1,224 @@
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+import json
+import os
+import threading
+import time
+
+# Taslak başına hafif span izleme.
+# Her taslak işlemi bir trace'tir (kök span: "draft"); fazlar ve içlerindeki HTTP çağrıları
+# çocuk span olarak eklenir. Aktif span bir contextvar'da tutulur, bu yüzden asyncio task'ları
+# ve asyncio.to_thread ile açılan thread'ler doğru trace'e yazar. Trace yoksa span() hiçbir şey yapmaz.
+
+_current_span = ContextVar("current_span", default=None)
+
+
+def _new_id(n_bytes):
+    return os.urandom(n_bytes).hex()
+
+
+class Span:
+    __slots__ = ("name", "trace", "span_id", "parent_id", "start", "end", "attrs", "status", "depth")
+
+    def __init__(self, name, trace, parent=None, start=None, attrs=None):
+        self.name = name
+        self.trace = trace
+        self.span_id = _new_id(8)
+        self.parent_id = parent.span_id if parent is not None else None
+        self.depth = parent.depth + 1 if parent is not None else 0
+        self.start = start if start is not None else time.time()
+        self.end = None
+        self.attrs = dict(attrs or {})
+        self.status = "ok"
+
+    def finish(self, end=None):
+        self.end = end if end is not None else time.time()
+
+    @property
+    def duration(self):
+        return (self.end or time.time()) - self.start
+
+
+class Trace:
+    """All spans of one draft run."""
+
+    def __init__(self, key, name, cycle_id):
+        self.key = key
+        self.name = name
+        self.cycle_id = cycle_id
+        self.trace_id = _new_id(16)
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    @property
+    def root(self):
+        return self.spans[0] if self.spans else None
+
+
+@contextmanager
+def span(name, **attrs):
+    """Child span of the active span; a no-op outside a trace."""
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    child = Span(name, parent.trace, parent, attrs=attrs)
+    parent.trace.add(child)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException:
+        child.status = "error"
+        raise
+    finally:
+        child.finish()
+        _current_span.reset(token)
+
+
+def record_http_span(endpoint, method, status, started, elapsed):
+    """HttpMetrics listener: adds a finished HTTP span under the active span."""
+    parent = _current_span.get()
+    if parent is None:
+        return
+    child = Span(f"HTTP {method} {endpoint}", parent.trace, parent, start=started,
+                 attrs={"http.method": method, "http.status_code": status if status is not None else "error"})
+    child.status = "error" if status is None or status >= 500 else "ok"
+    child.finish(started + elapsed)
+    parent.trace.add(child)
+
+
+class OtlpJsonFileExporter:
+    """Appends every finished trace to a file as one OTLP/JSON ExportTraceServiceRequest per line."""
+
+    def __init__(self, path, service_name="2dworkflow-bot"):
+        self.path = path
+        self.service_name = service_name
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _attr(key, value):
+        if isinstance(value, bool):
+            return {"key": key, "value": {"boolValue": value}}
+        if isinstance(value, int):
+            return {"key": key, "value": {"intValue": str(value)}}
+        if isinstance(value, float):
+            return {"key": key, "value": {"doubleValue": value}}
+        return {"key": key, "value": {"stringValue": str(value)}}
+
+    def to_otlp(self, trace):
+        spans = []
+        for s in trace.spans:
+            spans.append({
+                "traceId": trace.trace_id,
+                "spanId": s.span_id,
+                **({"parentSpanId": s.parent_id} if s.parent_id else {}),
+                "name": s.name,
+                "kind": 3 if s.name.startswith("HTTP ") else 1,  # CLIENT / INTERNAL
+                "startTimeUnixNano": str(int(s.start * 1e9)),
+                "endTimeUnixNano": str(int((s.end or s.start) * 1e9)),
+                "attributes": [self._attr(k, v) for k, v in s.attrs.items()],
+                "status": {"code": 2 if s.status == "error" else 1},
+            })
+        return {"resourceSpans": [{
+            "resource": {"attributes": [self._attr("service.name", self.service_name)]},
+            "scopeSpans": [{"scope": {"name": "bot.tracing"}, "spans": spans}],
+        }]}
+
+    def export(self, trace):
+        line = json.dumps(self.to_otlp(trace), ensure_ascii=False)
+        with self._lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+class Tracer:
+    """
+    Keeps the last `per_draft` traces of at most `max_drafts` drafts and groups them by
+    scheduler cycle. Every copy gets a new draft id, so the least recently traced drafts
+    are dropped once max_drafts is reached.
+    """
+
+    def __init__(self, per_draft=20, exporter=None, max_drafts=500):
+        self.per_draft = per_draft
+        self.max_drafts = max_drafts
+        self.exporter = exporter
+        self.cycle_id = None
+        self.traces = {}  # draft key -> deque[Trace]
+        self._lock = threading.Lock()
+
+    def new_cycle(self):
+        self.cycle_id = time.time()
+        return self.cycle_id
+
+    @contextmanager
+    def trace(self, key, name, **attrs):
+        """Root span of one draft run."""
+        trace = Trace(key, name, self.cycle_id)
+        root = Span("draft", trace, attrs={"draft.id": key, "draft.name": name, **attrs})
+        trace.add(root)
+        token = _current_span.set(root)
+        try:
+            yield root
+        except BaseException:
+            root.status = "error"
+            raise
+        finally:
+            root.finish()
+            _current_span.reset(token)
+            self._store(trace)
+
+    def _store(self, trace):
+        with self._lock:
+            history = self.traces.pop(trace.key, None)  # yeniden eklenir: en son izlenen sona geçer
+            if history is None or history.maxlen != self.per_draft:
+                history = deque(history or (), maxlen=self.per_draft)
+            self.traces[trace.key] = history
+            history.append(trace)
+            while len(self.traces) > self.max_drafts:
+                del self.traces[next(iter(self.traces))]
+        if self.exporter is not None:
+            try:
+                self.exporter.export(trace)
+            except OSError as e:
+                print(f"Trace dışa aktarılamadı: {e}")
+
+    def cycles(self):
+        """Cycle ids that have traces, newest first."""
+        with self._lock:
+            ids = {t.cycle_id for history in self.traces.values() for t in history}
+        return sorted((c for c in ids if c is not None), reverse=True)
+
+    def waterfall(self, cycle_id=None):
+        """
+        Spans of one cycle (default: latest) as rows for a waterfall chart:
+        draft, span, depth, start_s / end_s relative to the cycle's first span, duration_ms, status.
+        """
+        if cycle_id is None:
+            cycles = self.cycles()
+            if not cycles:
+                return []
+            cycle_id = cycles[0]
+        with self._lock:
+            traces = [t for history in self.traces.values() for t in history if t.cycle_id == cycle_id]
+        if not traces:
+            return []
+        origin = min(s.start for t in traces for s in t.spans)
+        rows = []
+        for t in sorted(traces, key=lambda t: t.root.start):
+            for s in list(t.spans):
+                rows.append({
+                    "draft": t.name,
+                    "span": ("  " * s.depth) + s.name,
+                    "depth": s.depth,
+                    "start_s": round(s.start - origin, 3),
+                    "end_s": round((s.end or time.time()) - origin, 3),
+                    "duration_ms": round(s.duration * 1000, 1),
+                    "status": s.status,
+                })
+        return rows
@@ -0,0 +1,66 @@
+import socket
+
+from urllib3.connection import HTTPConnection
+from urllib3.util import Retry, make_headers
+
+from bot.metrics import InstrumentedAdapter
+
+# Connection settings of every 2DWorkflow requests.Session (GlobalManager.new_session).
+# - (connect, read) timeout for calls that don't pass their own: a hung socket must not
+#   freeze the scheduler thread (max_instances=1 drops every trigger while it hangs).
+# - Transport retries only for GET/HEAD. JSF POSTs change server state (create_plan,
+#   copy, rename), they are never repeated by the transport.
+# - TCP keep-alive probes so dead pooled connections and a silent SSE stream are noticed.
+
+HTTP_TIMEOUT = (10, 45)
+
+# gzip/deflate always; br / zstd when the brotli / zstandard packages are installed
+ACCEPT_ENCODING = make_headers(accept_encoding=True)["accept-encoding"]
+
+RETRY_STATUSES = (429, 502, 503, 504)
+
+
+def idempotent_retry():
+    return Retry(
+        total=3,
+        connect=3,
+        read=2,
+        status=3,
+        redirect=False,  # redirects are followed by requests itself
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        status_forcelist=RETRY_STATUSES,
+        backoff_factor=0.5,
+        backoff_jitter=0.5,  # eşzamanlı lane'ler aynı anda tekrar denemesin
+        backoff_max=10,
+        respect_retry_after_header=True,
+        raise_on_status=False,  # the last 5xx is returned, callers handle it as before
+    )
+
+
+def _keepalive_socket_options():
+    options = list(HTTPConnection.default_socket_options) + [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+    for name, value in (("TCP_KEEPIDLE", 30), ("TCP_KEEPINTVL", 10), ("TCP_KEEPCNT", 3)):
+        if hasattr(socket, name):  # Linux; macOS / Windows use the OS defaults
+            options.append((socket.IPPROTO_TCP, getattr(socket, name), value))
+    return options
+
+
+KEEPALIVE_SOCKET_OPTIONS = _keepalive_socket_options()
+
+
+def session_adapter(metrics, pool_size, transport=None):
+    """
+    Transport adapter of one session. pool_size: threads using the session at once
+    (+1 for its SSE stream); extra connections are opened and dropped, never waited for.
+    transport: Recorder / Replayer (bot/replay.py), None for the live site.
+    """
+    options = {
+        "timeout": HTTP_TIMEOUT,
+        "max_retries": idempotent_retry(),
+        "pool_connections": 2,  # 2DWorkflow + Teams webhook
+        "pool_maxsize": max(1, pool_size),
+        "socket_options": KEEPALIVE_SOCKET_OPTIONS,
+    }
+    if transport is not None:
+        return transport.adapter(metrics, **options)
+    return InstrumentedAdapter(metrics, **options)
@@ -0,0 +1,52 @@
+import threading
+import time
+
+from bot.auth import switch_account_backend
+from bot.session_broker import SessionBroker
+
+
+class AccountSession:
+    """
+    A GlobalManager view bound to a single 2DWorkflow account.
+    It owns its requests.Session (cookie jar) and account context, so parallel lanes
+    never switch accounts under each other. Logs, watch_list and settings are read
+    from the owning manager.
+    """
+
+    def __init__(self, mgr, account_id, account_name):
+        self._mgr = mgr
+        self.account_id = account_id
+        # Lanes of this account + its SSE stream
+        self.session = mgr.new_session(pool_size=mgr.get_account_concurrency(account_id) + 1)
+        self.available_accounts = []
+        self.current_account_name = account_name
+        self.current_account_id = None
+        self.sse_dispatcher = None
+        self.broker = SessionBroker(self, idle_ttl=mgr.broker.idle_ttl)
+
+    def __getattr__(self, name):
+        return getattr(self._mgr, name)
+
+    def ensure_account(self):
+        """Logs the isolated session in and switches it to its account if needed."""
+        if not self.broker.ensure(): return False
+        if self.account_id and self.current_account_id != self.account_id:
+            if not switch_account_backend(self, self.account_id):
+                return False
+            self.current_account_id = self.account_id
+            time.sleep(2)
+        return True
+
+
+_workers_lock = threading.Lock()
+
+
+def get_account_worker(mgr, account_id, account_name, slot=0):
+    """Returns the cached AccountSession for (account, slot); sessions survive between cycles."""
+    with _workers_lock:
+        key = (account_id, slot)
+        worker = mgr.account_workers.get(key)
+        if worker is None:
+            worker = AccountSession(mgr, account_id, account_name)
+            mgr.account_workers[key] = worker
+        return worker